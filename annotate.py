@@ -0,0 +1,107 @@
+"""
+Gambar annotated (kotak deteksi) untuk foto BEFORE.
+
+Worker deteksi hanya menyimpan koordinat kotak (key "box" di tiap deteksi,
+ternormalisasi 0..1 terhadap gambar). Gambar annotated dirender dari foto
+display yang tersimpan + kotak tersebut, lalu di-cache di RESULT_FOLDER:
+
+- ANNOTATED_IMAGES=lazy (default): dirender saat pertama kali dibuka
+  (/bounty/<id>/annotated)
+- ANNOTATED_IMAGES=background: dirender di thread background setelah job
+  deteksi selesai, di luar jalur deteksi
+- ANNOTATED_IMAGES=off: tidak pernah dirender
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import span
+
+ANNOTATE_MODE = os.environ.get("ANNOTATED_IMAGES", "lazy").lower()
+
+BOX_COLOR = (16, 185, 129)
+
+_render_lock = threading.Lock()
+_rendering = {}  # path -> Lock, supaya satu file tidak dirender dua kali
+_executor = None
+
+
+def annotated_filename(image_filename):
+    # before_123_ab12cd34.jpg -> before_annotated_123_ab12cd34.jpg
+    return image_filename.replace("before_", "before_annotated_", 1)
+
+
+def has_boxes(detections):
+    return bool(detections) and all("box" in d for d in detections)
+
+
+def render(src_path, detections, dst_path):
+    """Gambar kotak deteksi di atas src_path lalu simpan ke dst_path."""
+    from PIL import Image, ImageDraw
+
+    with span("plot"):
+        with Image.open(src_path) as img:
+            img = img.convert("RGB")
+        draw = ImageDraw.Draw(img)
+        w, h = img.size
+        width = max(2, round((w + h) / 600))
+        for det in detections:
+            x1, y1, x2, y2 = det["box"]
+            x1, x2 = x1 * w, x2 * w
+            y1, y2 = y1 * h, y2 * h
+            label = f"{det['label']} {det['confidence'] / 100:.2f}"
+            draw.rectangle((x1, y1, x2, y2), outline=BOX_COLOR, width=width)
+            tw, th = draw.textbbox((0, 0), label)[2:]
+            draw.rectangle((x1, y1 - th - 4, x1 + tw + 4, y1), fill=BOX_COLOR)
+            draw.text((x1 + 2, y1 - th - 2), label, fill=(255, 255, 255))
+
+    # format mengikuti ekstensi dst_path (sama dengan foto upload-nya)
+    tmp = dst_path + ".part"
+    with span("pil_save"):
+        if dst_path.rsplit(".", 1)[-1].lower() == "png":
+            img.save(tmp, "PNG")
+        else:
+            img.save(tmp, "JPEG", quality=85)
+    os.replace(tmp, dst_path)
+
+
+def get_or_render(upload_folder, result_folder, image_filename, detections):
+    """
+    Path gambar annotated (dirender kalau belum ada di cache).
+    Return None kalau tidak bisa dibuat (tidak ada kotak / file sumber).
+    """
+    if ANNOTATE_MODE == "off" or not has_boxes(detections):
+        return None
+    dst_path = os.path.join(result_folder, annotated_filename(image_filename))
+    if os.path.exists(dst_path):
+        return dst_path
+
+    src_path = os.path.join(upload_folder, image_filename)
+    if not os.path.exists(src_path):
+        return None
+
+    with _render_lock:
+        lock = _rendering.setdefault(dst_path, threading.Lock())
+    with lock:
+        if not os.path.exists(dst_path):
+            try:
+                render(src_path, detections, dst_path)
+            except Exception as e:
+                print("[WARN] Gagal membuat gambar annotated:", e)
+                return None
+    with _render_lock:
+        _rendering.pop(dst_path, None)
+    return dst_path
+
+
+def render_in_background(upload_folder, result_folder, image_filename, detections):
+    """Dipanggil worker setelah job BEFORE selesai (mode background)."""
+    global _executor
+    if ANNOTATE_MODE != "background" or not has_boxes(detections):
+        return None
+    with _render_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="annotate")
+    return _executor.submit(
+        get_or_render, upload_folder, result_folder, image_filename, detections
+    )
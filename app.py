@@ -1,8 +1,18 @@
 import os
-from flask import Flask
-from db import init_db
-from routes_auth import init_auth_routes
-from routes_bounty import init_bounty_routes
+
+from startup import timed, format_report
+
+with timed("import flask + routes"):
+    from flask import Flask
+    from db import init_db
+    from routes_auth import init_auth_routes
+    from routes_bounty import init_bounty_routes
+    from jobs import start_detection_workers
+    from notifications import start_notification_dispatcher
+    from metrics import init_metrics
+    from user_context import init_user_context
+    from uploads import UPLOAD_MAX_BYTES
+
 
 def create_app():
     app = Flask(__name__)
@@ -12,20 +22,84 @@ def create_app():
     app.config["UPLOAD_FOLDER"] = os.path.join("static", "upload")
     app.config["RESULT_FOLDER"] = os.path.join("static", "image", "result")
 
+    # jumlah thread worker deteksi YOLO di proses ini. Default 0: deteksi
+    # dijalankan terpisah lewat `python jobs.py` (default INFERENCE_MAX_BATCH
+    # thread, jadi engine batching tetap bisa mengisi batch), proses web
+    # tidak memuat model dan reloader debug aman dipakai. Harganya: worker
+    # membaca + decode ulang file upload dari disk, array hasil decode saat
+    # upload (uploads.take_decoded) hanya bisa dipakai di proses yang sama.
+    # Kalau > 0 (opt-in, misalnya satu proses di satu mesin): worker di
+    # proses ini memakai array itu langsung, tanpa decode kedua kalinya.
+    app.config["DETECTION_WORKERS"] = int(os.environ.get("DETECTION_WORKERS", "0"))
+
+    # DETECTOR_PROCESSES > 0: inference dijalankan di pool proses terpisah,
+    # masing-masing memuat model sendiri dengan budget thread torch
+    # DETECTOR_THREADS_PER_PROCESS (default core dibagi rata) dan opsional
+    # dipin ke core (DETECTOR_PIN_CORES=1)
+    app.config["DETECTOR_PROCESSES"] = int(os.environ.get("DETECTOR_PROCESSES", "0"))
+    threads_per_process = os.environ.get("DETECTOR_THREADS_PER_PROCESS")
+    app.config["DETECTOR_THREADS_PER_PROCESS"] = (
+        int(threads_per_process) if threads_per_process else None
+    )
+    app.config["DETECTOR_PIN_CORES"] = os.environ.get("DETECTOR_PIN_CORES") == "1"
+
+    # MODEL_WARMUP=1: model dimuat + inference dummy di background saat
+    # startup. Default model baru dimuat saat job deteksi pertama, jadi
+    # proses yang hanya melayani halaman biasa tidak memuat torch/model.
+    app.config["MODEL_WARMUP"] = os.environ.get("MODEL_WARMUP") == "1"
+
+    # kalau job deteksi yang belum selesai sudah sebanyak ini,
+    # upload baru ditolak dengan 503 supaya tidak menumpuk
+    app.config["DETECTION_MAX_BACKLOG"] = int(
+        os.environ.get("DETECTION_MAX_BACKLOG", "200")
+    )
+
+    # thread pengirim notifikasi WhatsApp dari outbox (lihat notifications.py)
+    # = batas request bersamaan ke Twilio; 0 = dispatcher dijalankan
+    # terpisah lewat `python notifications.py`
+    app.config["NOTIFY_WORKERS"] = int(os.environ.get("NOTIFY_WORKERS", "2"))
+
+    # batas ukuran body request (foto + field form), lebih dari ini -> 413.
+    # Batas per file dicek lagi di uploads.read_upload
+    app.config["MAX_CONTENT_LENGTH"] = UPLOAD_MAX_BYTES + 1024 * 1024
+
     os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
     os.makedirs(app.config["RESULT_FOLDER"], exist_ok=True)
 
     # inisialisasi DB (buat tabel kalau belum ada)
-    init_db()
+    with timed("init_db"):
+        init_db()
 
     # daftarkan routes (auth + bounty)
-    init_auth_routes(app)
-    init_bounty_routes(app)
+    with timed("register routes"):
+        init_auth_routes(app)
+        init_bounty_routes(app)
+
+    # user login + saldo + riwayat redeem dimuat sekali per request
+    # di flask.g dengan satu koneksi (lihat user_context.py)
+    init_user_context(app)
+
+    # durasi request per route, /metrics, header Server-Timing
+    # (lihat metrics.py; METRICS_ENABLED=0 untuk mematikan)
+    init_metrics(app)
+
+    # worker yang menguras antrian job deteksi
+    with timed("start detection workers"):
+        start_detection_workers(app)
+
+    # dispatcher outbox notifikasi
+    start_notification_dispatcher(app)
 
     return app
 
 
-app = create_app()
+with timed("create_app"):
+    app = create_app()
+
+if os.environ.get("STARTUP_REPORT") == "1":
+    print(format_report())
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    # reloader debug menjalankan modul ini dua kali (proses induk + anak):
+    # dengan worker deteksi di proses ini model akan dimuat dua kali
+    app.run(debug=True, use_reloader=app.config["DETECTION_WORKERS"] == 0)
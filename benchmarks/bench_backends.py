@@ -0,0 +1,59 @@
+"""
+Bandingkan latency per gambar & memori antar backend detector.
+
+    python benchmarks/bench_backends.py ultralytics:best.pt onnx:best.onnx onnx:best.int8.onnx
+
+Tiap backend dijalankan di proses terpisah supaya angka RSS tidak tercampur.
+"""
+import os
+import sys
+import glob
+import time
+import resource
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def run_one(backend, model_path, n=20, imgsz=736):
+    import numpy as np
+    from detectors import load_detector
+
+    paths = sorted(glob.glob(os.path.join(ROOT, "static", "upload", "*.jp*g")))
+    if paths:
+        images = [paths[i % len(paths)] for i in range(n)]
+    else:
+        rng = np.random.default_rng(0)
+        images = [rng.integers(0, 255, (1080, 1440, 3), dtype=np.uint8) for _ in range(n)]
+
+    t0 = time.perf_counter()
+    detector = load_detector(backend, model_path)
+    load_s = time.perf_counter() - t0
+    detector.predict(images[0], imgsz=imgsz, save=False, verbose=False)  # warmup
+
+    latencies = []
+    for img in images:
+        start = time.perf_counter()
+        detector.predict(img, imgsz=imgsz, save=False, verbose=False)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    latencies.sort()
+    print(
+        f"{backend:12s} {os.path.basename(model_path):22s} "
+        f"load {load_s:5.1f}s  p50 {statistics.median(latencies):7.1f}ms  "
+        f"p95 {latencies[int(len(latencies) * 0.95) - 1]:7.1f}ms  max RSS {rss_mb:7.0f}MB"
+    )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--one":
+        backend, model_path = sys.argv[2].split(":", 1)
+        run_one(backend, model_path)
+        sys.exit(0)
+
+    specs = sys.argv[1:] or ["ultralytics:best.pt", "onnx:best.onnx"]
+    for spec in specs:
+        subprocess.run([sys.executable, __file__, "--one", spec], check=False)
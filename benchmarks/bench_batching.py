@@ -0,0 +1,65 @@
+"""
+Bandingkan throughput inference: satu predict per gambar vs engine batching.
+
+    python benchmarks/bench_batching.py [jumlah_gambar] [jumlah_thread]
+
+Gambar diambil dari static/upload (kalau ada), kalau tidak pakai gambar acak.
+"""
+import os
+import sys
+import time
+import glob
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from ml import get_model, BatchingInferenceEngine  # noqa: E402
+
+model = get_model()
+
+
+def load_images(n):
+    paths = sorted(glob.glob(os.path.join("static", "upload", "*.jp*g")))
+    if paths:
+        return [paths[i % len(paths)] for i in range(n)]
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 255, (736, 736, 3), dtype=np.uint8) for _ in range(n)]
+
+
+def bench_sequential(images, imgsz):
+    start = time.perf_counter()
+    for img in images:
+        model.predict(img, imgsz=imgsz, save=False, verbose=False)
+    return len(images) / (time.perf_counter() - start)
+
+
+def bench_batched(images, imgsz, threads, batch_size):
+    engine = BatchingInferenceEngine(
+        get_model, max_batch_size=batch_size, max_wait_ms=20, max_queue=len(images)
+    )
+    engine.predict(images[0], imgsz=imgsz)  # warmup thread batcher
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(lambda img: engine.predict(img, imgsz=imgsz), images))
+    elapsed = time.perf_counter() - start
+    return len(images) / elapsed, engine.stats
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    imgsz = 736
+    images = load_images(n)
+
+    model.predict(images[0], imgsz=imgsz, save=False, verbose=False)  # warmup
+    seq = bench_sequential(images, imgsz)
+    print(f"sekuensial          : {seq:6.2f} img/s")
+    for batch_size in (4, 8, 16):
+        ips, stats = bench_batched(images, imgsz, threads, batch_size)
+        avg = stats["images"] / max(stats["batches"], 1)
+        print(
+            f"batching (B={batch_size:2d})     : {ips:6.2f} img/s "
+            f"(x{ips / seq:.2f}, rata-rata {avg:.1f} gambar/batch)"
+        )
@@ -0,0 +1,156 @@
+"""
+Requests/detik halaman index (/) dan daftar bounty (/bounties) dengan
+koneksi SQLite lama (connect baru tiap query, journal rollback) vs
+pool koneksi WAL di db.py.
+
+    python benchmarks/bench_db.py [jumlah_request] [thread ...]   # default 500 1 4 8
+
+Benchmark memakai salinan waste.db di direktori sementara, diisi
+bounty OPEN acak di sekitar titik pencarian.
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault("DETECTION_WORKERS", "0")
+
+CENTER = (-6.2, 106.8)
+USER_ID = "bench_user"
+
+
+def prepare_db(path, n_bounties=2000, seed=0):
+    shutil.copy(os.path.join(ROOT, "waste.db"), path)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO users (user_id, name, region, phone, password_hash)
+        VALUES (?, 'Bench', 'Bench', '0', '-')
+        """,
+        (USER_ID,),
+    )
+    rng = random.Random(seed)
+    conn.executemany(
+        """
+        INSERT INTO bounties (reporter_id, latitude, longitude, status, location,
+                              before_image, points_reporter, points_cleaner,
+                              created_at)
+        VALUES ('uploader01', ?, ?, 'OPEN', 'Bench', 'bench.jpg', 5, 10,
+                '20250101_000000')
+        """,
+        [
+            (
+                CENTER[0] + rng.uniform(-0.01, 0.01),
+                CENTER[1] + rng.uniform(-0.01, 0.01),
+            )
+            for _ in range(n_bounties)
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+
+def legacy_connection(path):
+    def get_db_connection():
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    return get_db_connection
+
+
+def set_journal_mode(path, mode):
+    conn = sqlite3.connect(path)
+    conn.execute(f"PRAGMA journal_mode={mode}")
+    conn.close()
+
+
+def use_connection_factory(factory):
+    """Ganti get_db_connection di semua modul yang mengimpornya."""
+    import utils
+    import jobs
+    import dedup
+    import routes_auth
+    import routes_bounty
+
+    for module in (utils, jobs, dedup, routes_auth, routes_bounty):
+        module.get_db_connection = factory
+
+
+def run(app, urls, n_requests, n_threads):
+    per_thread = n_requests // n_threads
+    errors = []
+
+    def worker():
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess["user_id"] = USER_ID
+        for i in range(per_thread):
+            resp = client.get(urls[i % len(urls)])
+            if resp.status_code != 200:
+                errors.append(resp.status_code)
+
+    threads = [threading.Thread(target=worker) for _ in range(n_threads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    if errors:
+        print(f"  [WARN] {len(errors)} request gagal (status {errors[0]})")
+    return per_thread * n_threads / elapsed
+
+
+def main(argv):
+    n_requests = int(argv[0]) if argv else 500
+    thread_counts = [int(a) for a in argv[1:]] or [1, 4, 8]
+
+    work = tempfile.mkdtemp()
+    os.chdir(work)
+    path = os.path.join(work, "waste.db")
+    prepare_db(path)
+
+    import db
+
+    db.DB_PATH = path
+    from app import app
+
+    pooled = db.get_db_connection  # pool baru dibuat lagi (mode WAL) setelah ditutup
+    pages = {
+        "index": ["/"],
+        "bounties": [f"/bounties?lat={CENTER[0]}&lon={CENTER[1]}&radius=1000"],
+    }
+
+    print(f"{'halaman':10s} {'thread':>6s} {'lama req/s':>12s} {'pool req/s':>12s} {'speedup':>8s}")
+    for name, urls in pages.items():
+        for n_threads in thread_counts:
+            db.close_all_connections()
+            set_journal_mode(path, "DELETE")
+            use_connection_factory(legacy_connection(path))
+            run(app, urls, 20, 1)  # pemanasan
+            before = run(app, urls, n_requests, n_threads)
+
+            use_connection_factory(pooled)
+            run(app, urls, 20, 1)
+            after = run(app, urls, n_requests, n_threads)
+
+            print(
+                f"{name:10s} {n_threads:6d} {before:12.1f} {after:12.1f} "
+                f"{after / before:7.2f}x"
+            )
+
+    db.close_all_connections()
+    shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,64 @@
+"""
+Bandingkan utils.haversine_m (loop Python) dengan utils.haversine_many (NumPy).
+
+    python benchmarks/bench_haversine.py [n ...]     # default 1000 100000 1000000
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from utils import haversine_m, haversine_many, within_radius  # noqa: E402
+
+# titik acak di sekitar Jakarta
+CENTER = (-6.2, 106.8)
+
+
+def make_points(n, seed=0):
+    rng = np.random.default_rng(seed)
+    lats = CENTER[0] + rng.uniform(-0.05, 0.05, n)
+    lons = CENTER[1] + rng.uniform(-0.05, 0.05, n)
+    return lats, lons
+
+
+def bench_loop(lats, lons, radius_m=100.0):
+    lat_list, lon_list = lats.tolist(), lons.tolist()
+    start = time.perf_counter()
+    found = []
+    for la, lo in zip(lat_list, lon_list):
+        d = haversine_m(CENTER[0], CENTER[1], la, lo)
+        if d <= radius_m:
+            found.append(d)
+    found.sort()
+    return time.perf_counter() - start, len(found)
+
+
+def bench_vector(lats, lons, radius_m=100.0):
+    start = time.perf_counter()
+    _, _, order = within_radius(CENTER[0], CENTER[1], lats, lons, radius_m)
+    return time.perf_counter() - start, len(order)
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [1000, 100000, 1000000]
+    # sanity check: hasil vektor == hasil skalar
+    lats, lons = make_points(100)
+    i = random.randrange(100)
+    assert abs(
+        haversine_many(CENTER[0], CENTER[1], lats, lons)[i]
+        - haversine_m(CENTER[0], CENTER[1], lats[i], lons[i])
+    ) < 1e-6
+
+    print(f"{'n':>9}  {'loop':>10}  {'numpy':>10}  speedup")
+    for n in sizes:
+        lats, lons = make_points(n)
+        t_loop, n_loop = bench_loop(lats, lons)
+        t_vec, n_vec = bench_vector(lats, lons)
+        assert n_loop == n_vec
+        print(
+            f"{n:>9}  {t_loop * 1000:8.1f}ms  {t_vec * 1000:8.1f}ms  x{t_loop / t_vec:.1f}"
+        )
@@ -0,0 +1,94 @@
+"""
+Waktu decode + byte yang disimpan per foto: decode resolusi penuh lalu
+resize ke ukuran input (cara lama, file asli disimpan) vs uploads.preprocess
+(JPEG draft mode + EXIF + salinan display, thumbnail, dan array inference).
+
+    python benchmarks/bench_preprocess.py [megapiksel ...]   # default 3 12 48
+
+Ukuran turunan mengikuti env IMAGE_*_MAX_SIDE (lihat uploads.py).
+"""
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from PIL import Image  # noqa: E402
+
+import uploads  # noqa: E402
+
+
+def make_jpeg(megapixels, seed=0):
+    """Foto sintetis 4:3 dengan tag EXIF orientasi 6 (seperti foto HP portrait)."""
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = width * 3 // 4
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, (height // 16, width // 16, 3), dtype=np.uint8)
+    img = Image.fromarray(small).resize((width, height), Image.BILINEAR)
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=90, exif=exif)
+    return buf.getvalue(), (width, height)
+
+
+def full_decode(data):
+    """Cara lama: decode resolusi penuh, lalu detector me-resize ke imgsz."""
+    with Image.open(io.BytesIO(data)) as img:
+        img = img.convert("RGB")
+    scale = uploads.INFER_MAX_SIDE / max(img.size)
+    small = img.resize(
+        (round(img.width * scale), round(img.height * scale)), Image.BILINEAR
+    )
+    return np.asarray(small)[..., ::-1]
+
+
+def encoded_size(img, ext="jpg"):
+    buf = io.BytesIO()
+    if ext == "png":
+        img.save(buf, "PNG", optimize=True)
+    else:
+        img.save(buf, "JPEG", quality=uploads.JPEG_QUALITY, optimize=True)
+    return buf.tell()
+
+
+def timeit(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def main(argv):
+    sizes = [float(a) for a in argv] or [3, 12, 48]
+    print(
+        f"infer {uploads.INFER_MAX_SIDE}px, display {uploads.DISPLAY_MAX_SIDE}px, "
+        f"thumb {uploads.THUMB_MAX_SIDE}px, JPEG q{uploads.JPEG_QUALITY}"
+    )
+    print(
+        f"{'MP':>5s} {'asli':>11s} {'lama':>12s} {'preprocess':>11s} "
+        f"{'speedup':>8s} {'KB lama':>9s} {'KB baru':>9s} {'array':>11s}"
+    )
+    for mp in sizes:
+        data, (width, height) = make_jpeg(mp)
+        repeat = 3 if mp >= 24 else 5
+
+        t_old, arr_old = timeit(lambda: full_decode(data), repeat)
+        t_new, (display, thumb, arr_new) = timeit(lambda: uploads.preprocess(data), repeat)
+
+        kb_old = len(data) / 1024
+        kb_new = (encoded_size(display) + encoded_size(thumb)) / 1024
+        print(
+            f"{mp:5.0f} {width:5d}x{height:<5d} {t_old * 1000:10.1f}ms {t_new * 1000:9.1f}ms "
+            f"{t_old / t_new:7.1f}x {kb_old:9.0f} {kb_new:9.0f} "
+            f"{arr_new.shape[1]:5d}x{arr_new.shape[0]:<5d}"
+        )
+        del arr_old
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
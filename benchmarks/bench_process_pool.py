@@ -0,0 +1,52 @@
+"""
+Ukur skala throughput DetectorProcessPool terhadap jumlah proses.
+
+    python benchmarks/bench_process_pool.py [jumlah_gambar] [max_proses] [--pin]
+"""
+import os
+import sys
+import glob
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detector_pool import DetectorProcessPool  # noqa: E402
+
+
+def load_images(n):
+    paths = sorted(glob.glob(os.path.join("static", "upload", "*.jp*g")))
+    if not paths:
+        sys.exit("Tidak ada gambar di static/upload untuk benchmark.")
+    return [paths[i % len(paths)] for i in range(n)]
+
+
+def bench(images, num_workers, pin_cores):
+    pool = DetectorProcessPool(num_workers, pin_cores=pin_cores)
+    # warmup: pastikan semua worker sudah memuat model
+    for fut in [pool.submit(images[0]) for _ in range(num_workers)]:
+        fut.result()
+    start = time.perf_counter()
+    for fut in [pool.submit(img) for img in images]:
+        fut.result()
+    elapsed = time.perf_counter() - start
+    pool.shutdown()
+    return len(images) / elapsed, pool.threads_per_worker
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    pin = "--pin" in sys.argv
+    n = int(args[0]) if args else 32
+    max_workers = int(args[1]) if len(args) > 1 else (os.cpu_count() or 1)
+    images = load_images(n)
+
+    base = None
+    workers = 1
+    while workers <= max_workers:
+        ips, threads = bench(images, workers, pin)
+        base = base or ips
+        print(
+            f"{workers:2d} proses x {threads:2d} thread: {ips:6.2f} img/s "
+            f"(x{ips / base:.2f})"
+        )
+        workers *= 2
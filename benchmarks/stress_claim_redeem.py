@@ -0,0 +1,233 @@
+"""
+Stress test claim bounty + redeem poin secara paralel lewat HTTP ke app
+lokal, lalu cek invariant di database:
+
+- setiap bounty hanya bisa di-claim oleh tepat satu cleaner
+- total redeem per user tidak melebihi saldo awal, saldo tidak negatif,
+  dan ledger cocok dengan data sumber (ledger.find_drift)
+
+    python benchmarks/stress_claim_redeem.py [--bounties 20] [--cleaners 20]
+                                             [--redeemers 10] [--redeems 20]
+
+App dijalankan di thread (werkzeug, threaded=True) dengan database baru
+di direktori sementara. Exit 1 kalau ada invariant yang dilanggar.
+"""
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault("DETECTION_WORKERS", "0")
+# semua user login dari 127.0.0.1 dengan hash iterasi kecil (lihat seed):
+# rate limit per IP dilonggarkan dan hash tidak di-rehash ke default
+os.environ.setdefault("LOGIN_MAX_PER_IP", "1000000")
+os.environ.setdefault("PASSWORD_HASH_METHOD", "pbkdf2:sha256:1000")
+
+CENTER = (-6.2, 106.8)
+PASSWORD = "stress-test"
+START_POINTS = 100
+REDEEM_AMOUNT = 30
+
+
+def seed(conn, n_bounties, n_cleaners, n_redeemers):
+    from werkzeug.security import generate_password_hash
+    import ledger
+
+    # hash sekali dengan iterasi kecil, supaya login tidak jadi bottleneck
+    password_hash = generate_password_hash(PASSWORD, method="pbkdf2:sha256:1000")
+    cleaners = [f"cleaner{i:03d}" for i in range(n_cleaners)]
+    redeemers = [f"redeemer{i:03d}" for i in range(n_redeemers)]
+    conn.executemany(
+        """
+        INSERT INTO users (user_id, name, region, phone, password_hash)
+        VALUES (?, ?, 'Stress', '0', ?)
+        """,
+        [(u, u, password_hash) for u in ["reporter"] + cleaners + redeemers],
+    )
+
+    bounty_ids = []
+    for _ in range(n_bounties):
+        cur = conn.execute(
+            """
+            INSERT INTO bounties (reporter_id, latitude, longitude, status,
+                                  points_reporter, points_cleaner, created_at)
+            VALUES ('reporter', ?, ?, 'OPEN', 5, 10, '20250101_000000')
+            """,
+            CENTER,
+        )
+        bounty_ids.append(cur.lastrowid)
+
+    # saldo awal redeemer: satu bounty COMPLETED sebagai reporter
+    for user_id in redeemers:
+        conn.execute(
+            """
+            INSERT INTO bounties (reporter_id, cleaner_id, status,
+                                  points_reporter, points_cleaner, created_at)
+            VALUES (?, 'reporter', 'COMPLETED', ?, 0, '20250101_000000')
+            """,
+            (user_id, START_POINTS),
+        )
+    ledger.rebuild(conn)
+    conn.commit()
+    return bounty_ids, cleaners, redeemers
+
+
+def login(base_url, user_id):
+    session = requests.Session()
+    resp = session.post(
+        f"{base_url}/login",
+        data={"user_id": user_id, "password": PASSWORD},
+        allow_redirects=False,
+    )
+    resp.raise_for_status()
+    return session
+
+
+def claim(base_url, session, bounty_id):
+    resp = session.post(
+        f"{base_url}/bounty/{bounty_id}/claim",
+        params={"lat": CENTER[0], "lon": CENTER[1]},
+        allow_redirects=False,
+    )
+    return resp.status_code == 302 and "/complete" in resp.headers.get("Location", "")
+
+
+def redeem(base_url, session):
+    resp = session.post(
+        f"{base_url}/rewards/redeem",
+        data={
+            "wallet_type": "DANA",
+            "full_name": "Stress",
+            "phone": "0",
+            "amount": str(REDEEM_AMOUNT),
+        },
+        allow_redirects=False,
+    )
+    return resp.status_code
+
+
+def check_invariants(conn, bounty_ids, claim_winners, redeemers):
+    import ledger
+
+    errors = []
+    for bounty_id in bounty_ids:
+        winners = claim_winners.get(bounty_id, [])
+        row = conn.execute(
+            "SELECT status, cleaner_id FROM bounties WHERE id = ?", (bounty_id,)
+        ).fetchone()
+        if len(winners) != 1:
+            errors.append(f"bounty {bounty_id}: {len(winners)} claim berhasil ({winners})")
+        elif row["status"] != "CLAIMED" or row["cleaner_id"] != winners[0]:
+            errors.append(
+                f"bounty {bounty_id}: status {row['status']} cleaner {row['cleaner_id']}, "
+                f"pemenang {winners[0]}"
+            )
+
+    for user_id in redeemers:
+        redeemed = conn.execute(
+            "SELECT COALESCE(SUM(points), 0) AS n FROM reward_redemptions WHERE user_id = ?",
+            (user_id,),
+        ).fetchone()["n"]
+        balance = ledger.get_balance(conn, user_id)
+        if redeemed > START_POINTS:
+            errors.append(f"{user_id}: redeem {redeemed} > saldo awal {START_POINTS}")
+        if balance < 0 or balance != START_POINTS - redeemed:
+            errors.append(f"{user_id}: saldo {balance}, redeem {redeemed}")
+        if START_POINTS - redeemed >= REDEEM_AMOUNT:
+            errors.append(f"{user_id}: masih ada saldo {START_POINTS - redeemed} (redeem ditolak?)")
+
+    for user_id, balance, events, expected in ledger.find_drift(conn):
+        errors.append(f"ledger {user_id}: saldo {balance}, event {events}, sumber {expected}")
+    return errors
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--bounties", type=int, default=20)
+    parser.add_argument("--cleaners", type=int, default=20)
+    parser.add_argument("--redeemers", type=int, default=10)
+    parser.add_argument("--redeems", type=int, default=20, help="request redeem per user")
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args(argv)
+
+    work = tempfile.mkdtemp()
+    os.chdir(work)
+
+    import db
+
+    db.DB_PATH = os.path.join(work, "waste.db")
+    from app import app
+    from werkzeug.serving import make_server
+
+    conn = db.get_db_connection()
+    bounty_ids, cleaners, redeemers = seed(
+        conn, args.bounties, args.cleaners, args.redeemers
+    )
+    conn.close()
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        sessions = dict(
+            zip(
+                cleaners + redeemers,
+                pool.map(lambda u: login(base_url, u), cleaners + redeemers),
+            )
+        )
+
+        claim_tasks = [(b, c) for b in bounty_ids for c in cleaners]
+        redeem_tasks = [u for u in redeemers for _ in range(args.redeems)]
+
+        start = time.perf_counter()
+        claim_futures = [
+            (b, c, pool.submit(claim, base_url, sessions[c], b)) for b, c in claim_tasks
+        ]
+        redeem_futures = [pool.submit(redeem, base_url, sessions[u]) for u in redeem_tasks]
+
+        claim_winners = {}
+        for bounty_id, cleaner, future in claim_futures:
+            if future.result():
+                claim_winners.setdefault(bounty_id, []).append(cleaner)
+        redeem_status = [f.result() for f in redeem_futures]
+        elapsed = time.perf_counter() - start
+
+    server.shutdown()
+
+    n_requests = len(claim_tasks) + len(redeem_tasks)
+    print(
+        f"{len(claim_tasks)} claim + {len(redeem_tasks)} redeem dalam {elapsed:.2f} s "
+        f"({n_requests / elapsed:.0f} req/s, concurrency {args.concurrency})"
+    )
+    bad_status = [s for s in redeem_status if s != 302]
+    if bad_status:
+        print(f"[WARN] {len(bad_status)} redeem dengan status {bad_status[0]}")
+
+    conn = db.get_db_connection()
+    errors = check_invariants(conn, bounty_ids, claim_winners, redeemers)
+    conn.close()
+    db.close_all_connections()
+    shutil.rmtree(work, ignore_errors=True)
+
+    if errors:
+        for error in errors:
+            print("[FAIL]", error)
+        return 1
+    print("Semua invariant terpenuhi.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,540 @@
+"""
+Benchmark suite dengan hasil JSON dan gerbang regresi.
+
+    python benchmarks/suite.py [--only micro,model,adaptive,http] [--quick]
+                               [--out hasil.json] [--baseline baseline.json]
+                               [--threshold 10]
+
+Empat bagian:
+
+- micro : calculate_base_points, haversine_m, haversine_many dan
+          get_total_points_for_user di database berisi --bounties bounty
+          (default 1 juta)
+- model : waktu preprocess / inference / postprocess per gambar untuk
+          beberapa imgsz dan ukuran batch. Kalau model (--model, default
+          DETECTOR_MODEL / best.pt) tidak ada, dipakai model stub: letterbox
+          dan NMS asli (detectors.OnnxDetector), inference diganti output
+          acak, jadi yang terukur hanya overhead di luar model.
+- adaptive : pengaturan per fase (detect_settings.py) dengan dan tanpa
+          pass low-res: ms per gambar, p95, persentase gambar yang perlu
+          pass high-res, dan kesepakatan dengan resolusi penuh (lolos /
+          tidak, dan poin dasar sama). Pakai --images DIR berisi foto asli;
+          tanpa itu dipakai gambar acak (kesepakatan tidak bermakna).
+- http  : app Flask lokal (werkzeug, threaded) di database yang sama,
+          dibebani /submit, /bounties dan /rewards secara paralel
+          (req/s, p50, p95). Worker deteksi tidak dijalankan, /submit hanya
+          sampai job masuk antrian.
+
+Simpan satu run sebagai baseline (--out benchmarks/baseline.json), lalu
+bandingkan run berikutnya dengan --baseline: metrik yang lebih lambat dari
+--threshold persen ditandai REGRESI dan exit code 1. Baseline hanya
+bermakna di mesin yang sama.
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault("DETECTION_WORKERS", "0")
+os.environ.setdefault("DETECTION_MAX_BACKLOG", "1000000")
+# semua user login dari 127.0.0.1 dengan hash iterasi kecil (lihat seed):
+# rate limit per IP dilonggarkan dan hash tidak di-rehash ke default
+os.environ.setdefault("LOGIN_MAX_PER_IP", "1000000")
+os.environ.setdefault("PASSWORD_HASH_METHOD", "pbkdf2:sha256:1000")
+
+import numpy as np  # noqa: E402
+
+CENTER = (-6.2, 106.8)
+PASSWORD = "bench"
+N_USERS = 10_000
+
+
+class Results:
+    """Kumpulan metrik: nama -> {value, unit, better}."""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def add(self, name, value, unit, better="lower"):
+        self.metrics[name] = {"value": round(value, 4), "unit": unit, "better": better}
+        print(f"  {name:52s} {value:12.3f} {unit}")
+
+
+def best_per_call(fn, number, repeat=5):
+    """Waktu terbaik per panggilan (detik) dari `repeat` kali `number` panggilan."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+# ---------- Database ----------
+
+
+def seed_db(path, n_bounties, seed=0):
+    """
+    Database baru berisi N_USERS user dan n_bounties bounty: ~1% OPEN di
+    sekitar CENTER, sisanya tersebar di Indonesia (70% COMPLETED).
+    Saldo ledger diisi langsung dari agregat bounty COMPLETED.
+    """
+    import db
+    from werkzeug.security import generate_password_hash
+
+    db.DB_PATH = path
+    db.init_db()
+    conn = db.get_db_connection()
+
+    # hash dengan iterasi kecil supaya login tidak jadi bottleneck
+    password_hash = generate_password_hash(PASSWORD, method="pbkdf2:sha256:1000")
+    conn.executemany(
+        """
+        INSERT INTO users (user_id, name, region, phone, password_hash)
+        VALUES (?, ?, 'Bench', '0', ?)
+        """,
+        [(f"user{i:05d}", f"User {i}", password_hash) for i in range(N_USERS)],
+    )
+
+    rng = random.Random(seed)
+
+    def rows():
+        for _ in range(n_bounties):
+            reporter = f"user{rng.randrange(N_USERS):05d}"
+            if rng.random() < 0.01:
+                yield (
+                    reporter, None, "OPEN",
+                    CENTER[0] + rng.uniform(-0.01, 0.01),
+                    CENTER[1] + rng.uniform(-0.01, 0.01),
+                )
+                continue
+            lat, lon = rng.uniform(-10, 5), rng.uniform(95, 140)
+            if rng.random() < 0.7:
+                cleaner = f"user{rng.randrange(N_USERS):05d}"
+                yield reporter, cleaner, "COMPLETED", lat, lon
+            else:
+                yield reporter, None, "OPEN", lat, lon
+
+    conn.executemany(
+        """
+        INSERT INTO bounties (reporter_id, cleaner_id, status, latitude, longitude,
+                              location, before_image, points_reporter,
+                              points_cleaner, created_at)
+        VALUES (?, ?, ?, ?, ?, 'Bench', 'bench.jpg', 5, 10, '20250101_000000')
+        """,
+        rows(),
+    )
+    conn.execute(
+        """
+        INSERT INTO user_balances (user_id, balance, updated_at)
+        SELECT user_id, SUM(points), '' FROM (
+            SELECT reporter_id AS user_id, points_reporter AS points
+            FROM bounties WHERE status = 'COMPLETED'
+            UNION ALL
+            SELECT cleaner_id, points_cleaner
+            FROM bounties WHERE status = 'COMPLETED'
+        )
+        GROUP BY user_id
+        """
+    )
+    conn.commit()
+    conn.close()
+
+
+# ---------- Micro ----------
+
+
+def bench_micro(results, n_bounties):
+    from utils import (
+        LABEL_POINTS,
+        calculate_base_points,
+        get_total_points_for_user,
+        haversine_m,
+        haversine_many,
+    )
+
+    labels = list(LABEL_POINTS) + ["unknown"]
+    detections = [{"label": labels[i % len(labels)]} for i in range(20)]
+    t = best_per_call(lambda: calculate_base_points(detections), 20_000)
+    results.add("micro.calculate_base_points[20]", t * 1e6, "us")
+
+    t = best_per_call(lambda: haversine_m(-6.2, 106.8, -6.21, 106.81), 100_000)
+    results.add("micro.haversine_m", t * 1e6, "us")
+
+    rng = np.random.default_rng(0)
+    lats, lons = rng.uniform(-10, 5, n_bounties), rng.uniform(95, 140, n_bounties)
+    t = best_per_call(lambda: haversine_many(-6.2, 106.8, lats, lons), 3)
+    results.add(f"micro.haversine_many[{n_bounties}]", t * 1e3, "ms")
+
+    users = [f"user{i:05d}" for i in random.Random(1).sample(range(N_USERS), 1000)]
+    it = iter(users * 100)
+    t = best_per_call(lambda: get_total_points_for_user(next(it)), 1000, repeat=3)
+    results.add(f"micro.get_total_points_for_user[{n_bounties}]", t * 1e6, "us")
+
+
+# ---------- Model ----------
+
+
+class _StubSession:
+    """Pengganti onnxruntime.InferenceSession: output acak seukuran YOLOv8."""
+
+    def __init__(self, num_classes, seed=0):
+        self.num_classes = num_classes
+        self.rng = np.random.default_rng(seed)
+
+    def run(self, _, feeds):
+        batch = next(iter(feeds.values()))
+        n, _, h, w = batch.shape
+        anchors = sum((h // s) * (w // s) for s in (8, 16, 32))
+        out = np.empty((n, 4 + self.num_classes, anchors), dtype=np.float32)
+        out[:, 0] = self.rng.uniform(0, w, (n, anchors))
+        out[:, 1] = self.rng.uniform(0, h, (n, anchors))
+        out[:, 2:4] = self.rng.uniform(8, 96, (n, 2, anchors))
+        # skor latar di bawah conf pass low-res (detect_settings), seperti model asli
+        out[:, 4:] = self.rng.uniform(0, 0.1, (n, self.num_classes, anchors))
+        # sebagian kecil anchor di atas threshold conf, seperti model asli
+        for i in range(n):
+            hits = self.rng.choice(anchors, 50, replace=False)
+            cls = self.rng.integers(0, self.num_classes, 50)
+            out[i, 4 + cls, hits] = self.rng.uniform(0.3, 0.95, 50)
+        return [out]
+
+
+def stub_detector():
+    from detectors import OnnxDetector
+    from utils import LABEL_POINTS
+
+    model = OnnxDetector.__new__(OnnxDetector)
+    model.names = dict(enumerate(LABEL_POINTS))
+    model.session = _StubSession(len(model.names))
+    model.input_name = "images"
+    model.fixed_imgsz = None
+    model.fixed_batch = None
+    return model
+
+
+def bench_model(results, model_path, backend, imgsizes, batches, repeat):
+    from detectors import load_detector, model_version
+    from utils import parse_detections
+
+    if os.path.exists(model_path):
+        model = load_detector(backend, model_path)
+        tag = model_version(backend, model_path).rsplit(":", 1)[0]
+    else:
+        print(f"  [INFO] {model_path} tidak ada, memakai model stub")
+        model, tag = stub_detector(), "stub"
+
+    # foto HP 4:3, sudah diperkecil uploads.decode_image
+    image = np.random.default_rng(0).integers(0, 255, (552, 736, 3), dtype=np.uint8)
+    for imgsz in imgsizes:
+        for batch in batches:
+            images = [image] * batch
+            model.predict(images, imgsz=imgsz, save=False, verbose=False)  # pemanasan
+            speeds = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                out = model.predict(images, imgsz=imgsz, save=False, verbose=False)
+                for result in out:
+                    parse_detections(result)
+                total = (time.perf_counter() - start) * 1000 / batch
+                speeds.append(dict(out[0].speed, total=total))
+            name = f"model.{tag}.imgsz{imgsz}.batch{batch}"
+            for phase in ("preprocess", "inference", "postprocess", "total"):
+                results.add(f"{name}.{phase}", min(s[phase] for s in speeds), "ms/img")
+
+
+def bench_adaptive(results, model_path, backend, images_dir, n_images):
+    import copy
+
+    from detect_settings import SETTINGS, detect_with_settings
+    from detectors import load_detector
+    from uploads import decode_image
+    from utils import calculate_base_points, parse_detections
+
+    if os.path.exists(model_path):
+        model = load_detector(backend, model_path)
+    else:
+        print(f"  [INFO] {model_path} tidak ada, memakai model stub")
+        model = stub_detector()
+
+    if images_dir:
+        names = sorted(os.listdir(images_dir))[:n_images]
+        images = [decode_image(os.path.join(images_dir, name)) for name in names]
+    else:
+        rng = np.random.default_rng(0)
+        images = [
+            rng.integers(0, 255, (552, 736, 3), dtype=np.uint8) for _ in range(n_images)
+        ]
+
+    def detect(image, imgsz, **options):
+        result = model.predict(image, imgsz=imgsz, save=False, verbose=False, **options)[0]
+        return parse_detections(result)
+
+    for phase, configured in SETTINGS.items():
+        full, adaptive = copy.copy(configured), copy.copy(configured)
+        full.adaptive, adaptive.adaptive = False, True
+        detect_with_settings(detect, images[0], adaptive)  # pemanasan kedua imgsz
+
+        runs = {}
+        for name, settings in (("full", full), ("adaptive", adaptive)):
+            times, outputs = [], []
+            for image in images:
+                start = time.perf_counter()
+                outputs.append(detect_with_settings(detect, image, settings))
+                times.append((time.perf_counter() - start) * 1000)
+            runs[name] = outputs
+            prefix = f"adaptive.{phase}.{name}"
+            results.add(f"{prefix}.ms_per_img", float(np.mean(times)), "ms")
+            results.add(f"{prefix}.p95", float(np.percentile(times, 95)), "ms")
+
+        pairs = list(zip(runs["full"], runs["adaptive"]))
+        # pass resolusi penuh: borderline atau cek ulang low-res yang kosong
+        high = sum(outcome in ("high", "clean_check") for _, (_, outcome) in pairs)
+        same_pass = sum(bool(f) == bool(a) for (f, _), (a, _) in pairs)
+        prefix = f"adaptive.{phase}"
+        results.add(f"{prefix}.highres_pct", high / len(pairs) * 100, "%")
+        results.add(f"{prefix}.same_pass_pct", same_pass / len(pairs) * 100, "%", "higher")
+        if phase == "BEFORE":
+            # poin hanya dihitung dari foto BEFORE
+            same_points = sum(
+                calculate_base_points(f) == calculate_base_points(a)
+                for (f, _), (a, _) in pairs
+            )
+            results.add(
+                f"{prefix}.same_points_pct", same_points / len(pairs) * 100, "%", "higher"
+            )
+
+
+# ---------- HTTP ----------
+
+
+def _jpeg(seed):
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, (48, 64, 3), dtype=np.uint8)
+    img = Image.fromarray(small).resize((1024, 768), Image.BILINEAR)
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=85)
+    return buf.getvalue()
+
+
+def bench_http(results, n_requests, concurrency):
+    import requests
+    from werkzeug.serving import make_server
+
+    import db
+    from app import app
+
+    # path absolut: file upload ditulis di thread background yang bisa
+    # selesai setelah suite kembali ke direktori awal
+    for key in ("UPLOAD_FOLDER", "RESULT_FOLDER"):
+        app.config[key] = os.path.abspath(app.config[key])
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    local = threading.local()
+
+    def session():
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+            user_id = f"user{threading.get_ident() % N_USERS:05d}"
+            local.session.post(
+                f"{base_url}/login",
+                data={"user_id": user_id, "password": PASSWORD},
+                allow_redirects=False,
+            ).raise_for_status()
+        return local.session
+
+    uploads = [_jpeg(i) for i in range(n_requests)]
+
+    def submit(i):
+        return session().post(
+            f"{base_url}/submit",
+            data={"latitude": str(CENTER[0]), "longitude": str(CENTER[1])},
+            files={"file": (f"bench{i}.jpg", uploads[i], "image/jpeg")},
+            allow_redirects=False,
+        )
+
+    def bounties(i):
+        return session().get(
+            f"{base_url}/bounties",
+            params={"lat": CENTER[0], "lon": CENTER[1], "radius": 1000},
+            allow_redirects=False,
+        )
+
+    def rewards(i):
+        return session().get(f"{base_url}/rewards", allow_redirects=False)
+
+    endpoints = [
+        ("submit", submit, 302),
+        ("bounties", bounties, 200),
+        ("rewards", rewards, 200),
+    ]
+    with ThreadPoolExecutor(concurrency) as pool:
+        for name, fn, expected in endpoints:
+            list(pool.map(fn, range(min(concurrency, n_requests))))  # pemanasan + login
+
+            def timed(i, fn=fn):
+                start = time.perf_counter()
+                resp = fn(i)
+                return time.perf_counter() - start, resp.status_code
+
+            start = time.perf_counter()
+            out = list(pool.map(timed, range(n_requests)))
+            elapsed = time.perf_counter() - start
+
+            bad = [status for _, status in out if status != expected]
+            if bad:
+                print(f"  [WARN] /{name}: {len(bad)} request dengan status {bad[0]}")
+            latencies = np.array([t for t, _ in out]) * 1000
+            results.add(f"http.{name}.req_per_s", n_requests / elapsed, "req/s", "higher")
+            results.add(f"http.{name}.p50", float(np.percentile(latencies, 50)), "ms")
+            results.add(f"http.{name}.p95", float(np.percentile(latencies, 95)), "ms")
+
+    server.shutdown()
+    db.close_all_connections()
+
+
+# ---------- Perbandingan ----------
+
+
+def compare(current, baseline, threshold):
+    """
+    Return list (nama, lama, baru, perubahan %, regresi?) untuk metrik yang ada
+    di kedua run. Perubahan positif = lebih lambat / lebih buruk.
+    """
+    rows = []
+    for name, new in current["metrics"].items():
+        old = baseline["metrics"].get(name)
+        if not old or old["unit"] != new["unit"] or not old["value"]:
+            continue
+        change = (new["value"] - old["value"]) / old["value"] * 100
+        if new["better"] == "higher":
+            change = -change
+        rows.append((name, old["value"], new["value"], change, change > threshold))
+    return rows
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--only", default="micro,model,adaptive,http", help="bagian yang dijalankan"
+    )
+    parser.add_argument("--quick", action="store_true", help="versi kecil untuk uji cepat")
+    parser.add_argument("--bounties", type=int, help="jumlah bounty di database (default 1 juta)")
+    parser.add_argument("--model", help="path model (default DETECTOR_MODEL / best.pt)")
+    parser.add_argument("--backend", help="ultralytics / onnx (default DETECTOR_BACKEND)")
+    parser.add_argument("--imgsz", default="320,640,736")
+    parser.add_argument("--batch", default="1,4,8")
+    parser.add_argument("--images", help="folder foto untuk bagian adaptive")
+    parser.add_argument("--requests", type=int, help="request per endpoint (default 500)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--out", help="simpan hasil ke file JSON")
+    parser.add_argument("--baseline", help="file JSON hasil run sebelumnya")
+    parser.add_argument("--threshold", type=float, default=10.0, help="batas regresi (%%)")
+    args = parser.parse_args(argv)
+
+    parts = set(args.only.split(","))
+    n_bounties = args.bounties or (100_000 if args.quick else 1_000_000)
+    n_requests = args.requests or (100 if args.quick else 500)
+    imgsizes = [int(x) for x in args.imgsz.split(",")]
+    batches = [int(x) for x in args.batch.split(",")]
+
+    from detectors import resolve_backend
+
+    # path model relatif terhadap direktori awal (suite berjalan di direktori sementara)
+    backend, model_path = resolve_backend(args.backend, args.model)
+    model_path = os.path.abspath(model_path)
+    images_dir = os.path.abspath(args.images) if args.images else None
+
+    results = Results()
+    work = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    os.chdir(work)
+    try:
+        if parts & {"micro", "http"}:
+            start = time.perf_counter()
+            seed_db(os.path.join(work, "waste.db"), n_bounties)
+            print(f"[INFO] Database {n_bounties} bounty ({time.perf_counter() - start:.1f} detik)")
+        if "micro" in parts:
+            print("micro")
+            bench_micro(results, n_bounties)
+        if "model" in parts:
+            print("model")
+            bench_model(
+                results, model_path, backend, imgsizes, batches,
+                repeat=3 if args.quick else 10,
+            )
+        if "adaptive" in parts:
+            print("adaptive")
+            bench_adaptive(
+                results, model_path, backend, images_dir, 20 if args.quick else 100
+            )
+        if "http" in parts:
+            print("http")
+            bench_http(results, n_requests, args.concurrency)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "bounties": n_bounties,
+            "requests": n_requests,
+            "concurrency": args.concurrency,
+        },
+        "metrics": results.metrics,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[INFO] Hasil disimpan ke {args.out}")
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    for key in ("cpu_count", "bounties", "requests", "concurrency"):
+        if baseline["meta"].get(key) != report["meta"][key]:
+            print(
+                f"[WARN] {key} berbeda dari baseline "
+                f"({baseline['meta'].get(key)} vs {report['meta'][key]})"
+            )
+    rows = compare(report, baseline, args.threshold)
+    print()
+    print(f"{'metrik':52s} {'baseline':>10s} {'sekarang':>10s} {'ubah':>8s}")
+    for name, old, new, change, regressed in rows:
+        mark = "  REGRESI" if regressed else ""
+        print(f"{name:52s} {old:10.3f} {new:10.3f} {change:+7.1f}%{mark}")
+    regressions = [row for row in rows if row[4]]
+    if regressions:
+        print(f"[FAIL] {len(regressions)} metrik lebih lambat > {args.threshold:g}%")
+        return 1
+    print(f"Tidak ada regresi > {args.threshold:g}% ({len(rows)} metrik dibandingkan).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
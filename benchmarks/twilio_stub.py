@@ -0,0 +1,141 @@
+"""
+Stub lokal REST API Messages Twilio untuk menguji dispatcher notifikasi
+(notifications.py) tanpa mengirim WhatsApp sungguhan.
+
+    python benchmarks/twilio_stub.py [--port 8099] [--latency-ms 200]
+                                     [--fail-rate 0.1] [--rate-limit 5]
+
+lalu jalankan app / dispatcher dengan
+
+    TWILIO_API_BASE=http://127.0.0.1:8099 TWILIO_ACCOUNT_SID=AC123 \
+    TWILIO_AUTH_TOKEN=x TWILIO_WHATSAPP_FROM=whatsapp:+14155238886
+
+- POST /2010-04-01/Accounts/<sid>/Messages.json -> 201 {"sid": ...}
+  setelah --latency-ms; --fail-rate bagian request dijawab 500, dan lebih
+  dari --rate-limit request per detik dijawab 429 + Retry-After: 1
+- GET /messages -> JSON semua pesan yang diterima (untuk dicek)
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from urllib.parse import parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubState:
+    def __init__(self, latency_ms=0, fail_rate=0.0, rate_limit=0):
+        self.latency = latency_ms / 1000
+        self.fail_rate = fail_rate
+        self.rate_limit = rate_limit
+        self.messages = []
+        self.counts = {"201": 0, "429": 0, "500": 0}
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._window = []  # waktu request yang diterima dalam 1 detik terakhir
+        self._lock = threading.Lock()
+
+    def begin(self):
+        """Return status HTTP untuk request ini (201, 429 atau 500)."""
+        with self._lock:
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+            now = time.monotonic()
+            self._window = [t for t in self._window if t > now - 1]
+            if self.rate_limit and len(self._window) >= self.rate_limit:
+                status = 429
+            else:
+                self._window.append(now)
+                status = 500 if random.random() < self.fail_rate else 201
+            self.counts[str(status)] += 1
+        return status
+
+    def end(self):
+        with self._lock:
+            self._in_flight -= 1
+
+
+def make_server(port=0, latency_ms=0, fail_rate=0.0, rate_limit=0):
+    """ThreadingHTTPServer di 127.0.0.1 (port 0 = port bebas); state di server.state."""
+    state = StubState(latency_ms, fail_rate, rate_limit)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, seperti api.twilio.com
+
+        def _reply(self, status, payload, headers=()):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path != "/messages":
+                return self._reply(404, {"message": "not found"})
+            with state._lock:
+                messages = list(state.messages)
+            self._reply(200, messages)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", "0"))
+            form = parse_qs(self.rfile.read(length).decode())
+            if not self.path.endswith("/Messages.json"):
+                return self._reply(404, {"message": "not found"})
+            if not self.headers.get("Authorization", "").startswith("Basic "):
+                return self._reply(401, {"message": "authenticate"})
+
+            status = state.begin()
+            try:
+                if status == 429:
+                    return self._reply(
+                        429, {"code": 20429, "message": "Too Many Requests"},
+                        [("Retry-After", "1")],
+                    )
+                time.sleep(state.latency)
+                if status == 500:
+                    return self._reply(500, {"message": "stub: gagal acak"})
+                sid = f"SM{len(state.messages):032x}"
+                with state._lock:
+                    state.messages.append({
+                        "sid": sid,
+                        "from": form.get("From", [""])[0],
+                        "to": form.get("To", [""])[0],
+                        "body": form.get("Body", [""])[0],
+                        "ts": time.time(),
+                    })
+                self._reply(201, {"sid": sid, "status": "queued"})
+            finally:
+                state.end()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    server.state = state
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=int, default=200)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="bagian request yang dijawab 500")
+    parser.add_argument("--rate-limit", type=int, default=0, help="request per detik, lebih -> 429")
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.latency_ms, args.fail_rate, args.rate_limit)
+    print(f"Stub Twilio di http://127.0.0.1:{server.server_port} (Ctrl+C untuk berhenti)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        state = server.state
+        print(f"diterima: {state.counts}, maks bersamaan: {state.max_in_flight}")
+
+
+if __name__ == "__main__":
+    main()
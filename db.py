@@ -1,21 +1,171 @@
+import os
+import queue
 import sqlite3
+import threading
+from time import perf_counter
+
+import metrics
 
 DB_PATH = "waste.db"
 
+# pengaturan koneksi (bisa diubah lewat env)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "16"))
+DB_BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_CACHE_SIZE_KB = int(os.environ.get("DB_CACHE_SIZE_KB", "20000"))
+DB_MMAP_SIZE = int(os.environ.get("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_STATEMENT_CACHE = int(os.environ.get("DB_STATEMENT_CACHE", "256"))
 
-def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+_pools = {}
+_pools_lock = threading.Lock()
 
 
-def init_db():
-    conn = get_db_connection()
+class TimedCursor(sqlite3.Cursor):
+    """
+    Cursor yang mencatat waktu query ke metrics: execute (tahap db) dan
+    fetchall (tahap db_fetch). fetchone tidak dicatat, isinya satu baris.
+    """
+
+    # tanpa context manager metrics.span: ini dipanggil di setiap query
+    def execute(self, sql, parameters=()):
+        start = perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            metrics.record_span("db", perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            metrics.record_span("db", perf_counter() - start)
+
+    def fetchall(self):
+        start = perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            metrics.record_span("db_fetch", perf_counter() - start)
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    Koneksi sqlite3 biasa, tapi close() mengembalikannya ke pool
+    (transaksi yang belum di-commit di-rollback, sama seperti close() asli).
+    Query lewat conn.execute / executemany dicatat di metrics.
+    """
+
+    _pooled = False
+    _pool = None
+
+    if metrics.ENABLED:
+
+        def execute(self, sql, parameters=()):
+            return self.cursor(TimedCursor).execute(sql, parameters)
+
+        def executemany(self, sql, seq_of_parameters):
+            return self.cursor(TimedCursor).executemany(sql, seq_of_parameters)
+
+    def close(self):
+        if not self._pooled:
+            return super().close()
+        pool, self._pool = self._pool, None
+        if pool is None:
+            return  # sudah dikembalikan ke pool
+        try:
+            if self.in_transaction:
+                self.rollback()
+        except sqlite3.Error:
+            self._pooled = False
+            return super().close()
+        pool.release(self)
+
 
-    # # Tambah kolom reason jika belum ada
-    # conn.execute("ALTER TABLE reward_redemptions ADD COLUMN reason TEXT DEFAULT NULL")
+class ConnectionPool:
+    """Pool koneksi untuk satu file database, dipakai bergantian antar thread."""
 
+    def __init__(self, path, size=DB_POOL_SIZE):
+        self.path = path
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._wal_ready = False
 
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=DB_BUSY_TIMEOUT_MS / 1000,
+            factory=PooledConnection,
+            cached_statements=DB_STATEMENT_CACHE,
+            check_same_thread=False,  # satu thread dalam satu waktu, lewat pool
+        )
+        conn.row_factory = sqlite3.Row
+        conn._pooled = True
+        if not self._wal_ready:
+            # journal_mode tersimpan di file DB, cukup sekali
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._wal_ready = True
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
 
-    conn.commit()
+    def acquire(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        conn._pool = self
+        return conn
+
+    def release(self, conn):
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            sqlite3.Connection.close(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            sqlite3.Connection.close(conn)
+
+
+def _get_pool():
+    pool = _pools.get(DB_PATH)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(DB_PATH)
+            if pool is None:
+                pool = _pools[DB_PATH] = ConnectionPool(DB_PATH)
+    return pool
+
+
+def get_db_connection():
+    """
+    Ambil koneksi dari pool (mode WAL, synchronous=NORMAL, mmap, cache,
+    busy timeout). Pemakaian sama seperti sebelumnya: conn.close()
+    mengembalikan koneksi ke pool.
+    """
+    metrics.note_db_connection()
+    return _get_pool().acquire()
+
+
+def close_all_connections():
+    """Tutup semua koneksi idle (misalnya sebelum file DB dipindah/di-backup)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close_all()
+
+
+def init_db():
+    """Buat / perbarui skema database (lihat migrations.py)."""
+    from migrations import migrate
+
+    conn = get_db_connection()
+    migrate(conn)
     conn.close()
@@ -0,0 +1,297 @@
+"""
+Penyimpanan upload berbasis hash konten + cache hasil deteksi.
+
+- Upload di-hash (sha256). File yang sama persis tidak ditulis ulang,
+  cukup memakai file yang sudah ada.
+- Hasil deteksi di-cache per (sha256, versi model, imgsz) di SQLite,
+  dengan batas jumlah entri (LRU), jadi upload ulang tidak perlu inference.
+- Perceptual hash (dHash 64-bit) dipakai untuk menandai foto yang
+  hampir sama dengan foto bounty lain sebagai kemungkinan fraud.
+"""
+import io
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+from db import get_db_connection
+from metrics import span
+from uploads import write_pending
+
+TIME_FORMAT = "%Y%m%d_%H%M%S"
+
+# jumlah maksimum entri cache deteksi (LRU, dihapus yang paling lama tidak dipakai)
+CACHE_MAX_ENTRIES = int(os.environ.get("DETECTION_CACHE_MAX_ENTRIES", "50000"))
+
+# jarak Hamming dHash maksimum yang dianggap "foto yang sama".
+# dHash dipecah jadi 4 band 16-bit; jarak <= 3 dijamin punya minimal satu
+# band yang sama persis, jadi pencarian kandidat cukup lewat index band.
+PHASH_MAX_DISTANCE = 3
+
+_prune_lock = threading.Lock()
+_inserts_since_prune = 0
+
+
+def _now():
+    return datetime.now().strftime(TIME_FORMAT)
+
+
+def sha256_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def perceptual_hash(image):
+    """
+    dHash 64-bit dari path / bytes gambar, sebagai int.
+    JPEG didecode dengan draft mode (skala kecil) supaya murah.
+    """
+    from PIL import Image
+
+    if isinstance(image, (bytes, bytearray)):
+        image = io.BytesIO(image)
+    with Image.open(image) as img:
+        img.draft("L", (64, 64))
+        small = img.convert("L").resize((9, 8), Image.BILINEAR)
+        pixels = list(small.getdata())
+
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value
+
+
+def _bands(phash):
+    return [(phash >> shift) & 0xFFFF for shift in (48, 32, 16, 0)]
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+# ---------- Penyimpanan upload ----------
+
+
+def _write_file(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def save_upload(conn, data, prefix, ext, upload_folder, sha=None, write=None):
+    """
+    Simpan upload kalau kontennya belum pernah disimpan.
+    Return (filename, sha256). Kalau sudah ada, file lama yang dipakai.
+    `write(path, data)` bisa diganti (misalnya uploads.store_async).
+    Commit dilakukan pemanggil.
+    """
+    sha = sha or sha256_bytes(data)
+    row = conn.execute(
+        "SELECT filename FROM stored_images WHERE sha256 = ?", (sha,)
+    ).fetchone()
+    if row:
+        path = os.path.join(upload_folder, row["filename"])
+        # file yang masih ditulis di background juga dianggap sudah ada
+        if os.path.exists(path) or write_pending(path):
+            return row["filename"], sha
+
+    timestamp = datetime.now().strftime(TIME_FORMAT)
+    filename = f"{prefix}_{timestamp}_{sha[:8]}.{ext}"
+    with span("upload_save"):
+        (write or _write_file)(os.path.join(upload_folder, filename), data)
+
+    # file lama hilang dari disk: hanya nama file yang diganti, phash dan
+    # first_bounty_id (riwayat duplikat) tetap
+    conn.execute(
+        """
+        INSERT INTO stored_images (sha256, filename, created_at)
+        VALUES (?, ?, ?)
+        ON CONFLICT(sha256) DO UPDATE SET filename = excluded.filename
+        """,
+        (sha, filename, _now()),
+    )
+    return filename, sha
+
+
+def claim_image_for_bounty(conn, sha, bounty_id):
+    """Catat bounty pertama yang memakai gambar ini (untuk deteksi fraud)."""
+    conn.execute(
+        """
+        UPDATE stored_images SET first_bounty_id = ?
+        WHERE sha256 = ? AND first_bounty_id IS NULL
+        """,
+        (bounty_id, sha),
+    )
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# ---------- Cache deteksi ----------
+
+
+def get_cached_detections(sha, model_version, imgsz):
+    """Return dict {detections} atau None kalau belum ada."""
+    conn = get_db_connection()
+    row = conn.execute(
+        """
+        SELECT detections_json FROM detection_cache
+        WHERE sha256 = ? AND model_version = ? AND imgsz = ?
+        """,
+        (sha, model_version, imgsz),
+    ).fetchone()
+    if row:
+        conn.execute(
+            """
+            UPDATE detection_cache SET last_used_at = ?, hits = hits + 1
+            WHERE sha256 = ? AND model_version = ? AND imgsz = ?
+            """,
+            (_now(), sha, model_version, imgsz),
+        )
+        conn.commit()
+    conn.close()
+    if not row:
+        return None
+    return {"detections": json.loads(row["detections_json"])}
+
+
+def put_cached_detections(sha, model_version, imgsz, detections):
+    global _inserts_since_prune
+
+    conn = get_db_connection()
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO detection_cache
+            (sha256, model_version, imgsz, detections_json,
+             created_at, last_used_at, hits)
+        VALUES (?, ?, ?, ?, ?, ?, 0)
+        """,
+        (
+            sha,
+            model_version,
+            imgsz,
+            json.dumps(detections, ensure_ascii=False),
+            _now(),
+            _now(),
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+    # prune tidak perlu tiap insert
+    with _prune_lock:
+        _inserts_since_prune += 1
+        if _inserts_since_prune < 100:
+            return
+        _inserts_since_prune = 0
+    prune_cache()
+
+
+def prune_cache(max_entries=None):
+    """Hapus entri cache yang paling lama tidak dipakai sampai <= max_entries."""
+    max_entries = CACHE_MAX_ENTRIES if max_entries is None else max_entries
+    conn = get_db_connection()
+    total = conn.execute("SELECT COUNT(*) AS n FROM detection_cache").fetchone()["n"]
+    removed = 0
+    if total > max_entries:
+        cur = conn.execute(
+            """
+            DELETE FROM detection_cache WHERE rowid IN (
+                SELECT rowid FROM detection_cache
+                ORDER BY last_used_at
+                LIMIT ?
+            )
+            """,
+            (total - max_entries,),
+        )
+        removed = cur.rowcount
+        conn.commit()
+    conn.close()
+    return removed
+
+
+# ---------- Deteksi duplikat / fraud ----------
+
+
+def check_duplicates(image_path, sha, bounty_id, user_id, phase):
+    """
+    Hitung perceptual hash gambar (sekali per sha), lalu cari gambar bounty
+    lain yang sama persis atau hampir sama. Setiap temuan dicatat di
+    fraud_flags. Return list flag yang dibuat.
+    """
+    conn = get_db_connection()
+    row = conn.execute(
+        "SELECT phash, first_bounty_id FROM stored_images WHERE sha256 = ?", (sha,)
+    ).fetchone()
+
+    if row and row["phash"] is not None:
+        phash = int(row["phash"], 16)
+    else:
+        phash = perceptual_hash(image_path)
+        b0, b1, b2, b3 = _bands(phash)
+        conn.execute(
+            """
+            UPDATE stored_images
+            SET phash = ?, phash_b0 = ?, phash_b1 = ?, phash_b2 = ?, phash_b3 = ?
+            WHERE sha256 = ?
+            """,
+            (f"{phash:016x}", b0, b1, b2, b3, sha),
+        )
+
+    flags = []
+
+    # file sama persis sudah pernah dipakai bounty lain
+    if row and row["first_bounty_id"] not in (None, bounty_id):
+        flags.append(("EXACT", sha, row["first_bounty_id"], 0))
+
+    b0, b1, b2, b3 = _bands(phash)
+    candidates = conn.execute(
+        """
+        SELECT sha256, phash, first_bounty_id FROM stored_images
+        WHERE sha256 != ?
+          AND (phash_b0 = ? OR phash_b1 = ? OR phash_b2 = ? OR phash_b3 = ?)
+        """,
+        (sha, b0, b1, b2, b3),
+    ).fetchall()
+    for cand in candidates:
+        if cand["first_bounty_id"] in (None, bounty_id):
+            continue
+        distance = hamming(phash, int(cand["phash"], 16))
+        if distance <= PHASH_MAX_DISTANCE:
+            flags.append(("PERCEPTUAL", cand["sha256"], cand["first_bounty_id"], distance))
+
+    for kind, matched_sha, matched_bounty_id, distance in flags:
+        conn.execute(
+            """
+            INSERT INTO fraud_flags
+                (bounty_id, user_id, phase, kind, sha256, matched_sha256,
+                 matched_bounty_id, distance, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                bounty_id,
+                user_id,
+                phase,
+                kind,
+                sha,
+                matched_sha,
+                matched_bounty_id,
+                distance,
+                _now(),
+            ),
+        )
+        print(
+            f"[WARN] Kemungkinan fraud ({kind}): bounty {bounty_id} "
+            f"mirip bounty {matched_bounty_id} (jarak {distance})"
+        )
+
+    conn.commit()
+    conn.close()
+    return flags
@@ -0,0 +1,161 @@
+"""
+Pengaturan detector per fase (BEFORE / AFTER) dan mode adaptif.
+
+Tiap fase punya resolusi, threshold confidence, jumlah deteksi maksimum
+dan filter kelas sendiri, diatur lewat environment variable:
+
+    DETECT_<FASE>_IMGSZ       resolusi input model (default 736)
+    DETECT_<FASE>_CONF        threshold confidence 0..1 (default 0.25)
+    DETECT_<FASE>_MAX_DET     jumlah deteksi maksimum (default 300)
+    DETECT_<FASE>_CLASSES     id kelas dipisah koma (default semua kelas)
+    DETECT_<FASE>_ADAPTIVE    1 = pass low-res dulu (default: AFTER saja)
+    DETECT_<FASE>_LOW_IMGSZ   resolusi pass low-res (default 416)
+    DETECT_<FASE>_SURE_CONF   deteksi low-res >= ini dianggap pasti (default 0.5)
+
+Gambar upload sudah diperkecil ke IMAGE_INFER_MAX_SIDE (uploads.py), jadi
+IMGSZ di atas nilai itu tidak menambah detail.
+
+Mode adaptif: pass pertama di LOW_IMGSZ dengan conf diturunkan setengah.
+Hanya temuan yang pasti boleh menghentikan deteksi lebih awal:
+
+- AFTER dan ada deteksi >= SURE_CONF -> pasti masih ada sampah, selesai
+  (AFTER hanya butuh tahu ada / tidak ada sampah)
+- ada deteksi, semuanya >= SURE_CONF -> hasil low-res dipakai
+- tidak ada deteksi sama sekali      -> ulang di IMGSZ dengan CONF biasa:
+  AFTER yang bersih menyelesaikan bounty dan membayar poin, jadi tidak
+  boleh diputuskan dari pass resolusi rendah
+- selain itu (borderline)            -> ulang di IMGSZ dengan CONF biasa
+
+Persentase job yang perlu pass high-res tercatat di metrik
+adaptive_detect_total{phase, outcome}; akurasi dibanding resolusi penuh
+diukur di benchmarks/suite.py (bagian adaptive).
+"""
+import os
+
+import metrics
+
+DEFAULT_IMGSZ = 736
+
+# pass low-res memakai conf / LOW_CONF_DIVISOR supaya kandidat lemah ikut terlihat
+LOW_CONF_DIVISOR = 2
+
+
+def _env(phase, name, default):
+    return os.environ.get(f"DETECT_{phase}_{name}", default)
+
+
+class DetectSettings:
+    """Argumen predict satu fase + parameter mode adaptif."""
+
+    def __init__(
+        self,
+        imgsz=DEFAULT_IMGSZ,
+        conf=0.25,
+        max_det=300,
+        classes=None,
+        adaptive=False,
+        low_imgsz=416,
+        sure_conf=0.5,
+        early_exit=False,
+    ):
+        self.imgsz = imgsz
+        self.conf = conf
+        self.max_det = max_det
+        # tuple supaya bisa jadi kunci grup batch (ml.BatchingInferenceEngine)
+        self.classes = tuple(classes) if classes else None
+        self.adaptive = adaptive
+        self.low_imgsz = low_imgsz
+        self.sure_conf = sure_conf
+        self.early_exit = early_exit
+
+    @classmethod
+    def from_env(cls, phase, adaptive=False):
+        classes = _env(phase, "CLASSES", "")
+        return cls(
+            imgsz=int(_env(phase, "IMGSZ", str(DEFAULT_IMGSZ))),
+            conf=float(_env(phase, "CONF", "0.25")),
+            max_det=int(_env(phase, "MAX_DET", "300")),
+            classes=[int(c) for c in classes.split(",") if c.strip()],
+            adaptive=_env(phase, "ADAPTIVE", "1" if adaptive else "0") == "1",
+            low_imgsz=int(_env(phase, "LOW_IMGSZ", "416")),
+            sure_conf=float(_env(phase, "SURE_CONF", "0.5")),
+            early_exit=phase == "AFTER",
+        )
+
+    def predict_args(self, low=False):
+        """Keyword untuk detect(): imgsz, conf, max_det, classes."""
+        args = {
+            "imgsz": self.low_imgsz if low else self.imgsz,
+            "conf": self.conf / LOW_CONF_DIVISOR if low else self.conf,
+            "max_det": self.max_det,
+        }
+        if self.classes:
+            args["classes"] = self.classes
+        return args
+
+    def cache_version(self, model_version):
+        """
+        Kunci versi untuk cache deteksi (dedup.get_cached_detections):
+        hasil dengan conf / kelas / mode berbeda tidak boleh tertukar.
+        """
+        tag = f"{model_version}|conf={self.conf}|max={self.max_det}"
+        if self.classes:
+            tag += "|cls=" + ",".join(map(str, self.classes))
+        if self.adaptive:
+            tag += f"|adaptive={self.low_imgsz}/{self.sure_conf}"
+        return tag
+
+    def imgsizes(self):
+        return {self.imgsz, self.low_imgsz} if self.adaptive else {self.imgsz}
+
+
+SETTINGS = {
+    "BEFORE": DetectSettings.from_env("BEFORE"),
+    "AFTER": DetectSettings.from_env("AFTER", adaptive=True),
+}
+
+
+def settings_for(phase):
+    return SETTINGS[phase]
+
+
+def warmup_imgsizes():
+    """Semua resolusi yang dipakai, supaya warmup menyiapkan semuanya."""
+    return sorted(set().union(*(s.imgsizes() for s in SETTINGS.values())))
+
+
+def detect_with_settings(detect, image, settings):
+    """
+    Jalankan detect(image, **predict_args) sesuai settings, dengan pass
+    low-res dulu kalau mode adaptif aktif.
+    Return (detections, outcome); outcome "full", "early_exit", "low",
+    "clean_check" (low-res kosong, dicek ulang di resolusi penuh) atau
+    "high" (low-res borderline, diulang di resolusi penuh).
+    """
+    if not settings.adaptive:
+        return detect(image, **settings.predict_args()), "full"
+
+    detections = detect(image, **settings.predict_args(low=True))
+    if not detections:
+        return detect(image, **settings.predict_args()), "clean_check"
+
+    sure_pct = settings.sure_conf * 100
+    sure = [d for d in detections if d["confidence"] >= sure_pct]
+    if settings.early_exit and sure:
+        return sure, "early_exit"
+    if len(sure) == len(detections):
+        return detections, "low"
+
+    return detect(image, **settings.predict_args()), "high"
+
+
+def detect_phase(detect, image, phase):
+    """detect_with_settings untuk satu fase + catat outcome-nya di metrik."""
+    detections, outcome = detect_with_settings(detect, image, settings_for(phase))
+    metrics.inc("adaptive_detect_total", phase=phase, outcome=outcome)
+    return detections
+
+
+metrics.describe(
+    "adaptive_detect_total", "Job deteksi per fase dan hasil pass low-res / high-res"
+)
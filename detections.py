@@ -0,0 +1,129 @@
+"""
+Tabel `detections`: satu baris per kotak deteksi (bounty, fase BEFORE/AFTER,
+class id, label, confidence, kotak xyxy ternormalisasi 0..1, versi model).
+
+Ditulis worker deteksi (executemany, di transaksi yang sama dengan update
+bounty). Statistik label, hitung ulang poin dan render ulang gambar
+annotated cukup query SQL ber-index, tanpa parse labels_json atau
+menjalankan model lagi.
+
+    python detections.py stats      # jumlah deteksi per label
+"""
+import sys
+
+from utils import LABEL_POINTS, DEFAULT_LABEL_POINTS
+
+
+def save_detections(conn, bounty_id, phase, detections, model_version, job_id=None):
+    """
+    Ganti deteksi (bounty, fase) dengan hasil terbaru. Memakai koneksi
+    pemanggil; commit oleh pemanggil.
+    """
+    conn.execute(
+        "DELETE FROM detections WHERE bounty_id = ? AND phase = ?", (bounty_id, phase)
+    )
+    conn.executemany(
+        """
+        INSERT INTO detections
+            (bounty_id, phase, job_id, class_id, label, confidence,
+             x1, y1, x2, y2, model_version)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        [
+            (
+                bounty_id,
+                phase,
+                job_id,
+                det.get("class_id"),
+                det["label"],
+                det["confidence"] / 100,
+                *(det.get("box") or (None, None, None, None)),
+                model_version,
+            )
+            for det in detections
+        ],
+    )
+
+
+LOAD_DETECTIONS_SQL = """
+    SELECT class_id, label, confidence, x1, y1, x2, y2
+    FROM detections
+    WHERE bounty_id = ? AND phase = ?
+    ORDER BY id
+"""
+
+
+def load_detections(conn, bounty_id, phase="BEFORE"):
+    """Deteksi satu bounty dalam format utils.parse_detections."""
+    rows = conn.execute(LOAD_DETECTIONS_SQL, (bounty_id, phase)).fetchall()
+    detections = []
+    for row in rows:
+        det = {
+            "label": row["label"],
+            "confidence": round(row["confidence"] * 100, 2),
+            "class_id": row["class_id"],
+        }
+        if row["x1"] is not None:
+            det["box"] = [row["x1"], row["y1"], row["x2"], row["y2"]]
+        detections.append(det)
+    return detections
+
+
+def label_counts_query(phase="BEFORE", bounty_status=None):
+    """(sql, params) jumlah + rata-rata confidence per label."""
+    sql = """
+        SELECT d.label, COUNT(*) AS n, AVG(d.confidence) * 100 AS avg_conf
+        FROM detections d
+    """
+    params = [phase]
+    if bounty_status:
+        sql += " JOIN bounties b ON b.id = d.bounty_id AND b.status = ?"
+        params.insert(0, bounty_status)
+    sql += " WHERE d.phase = ? GROUP BY d.label"
+    return sql, params
+
+
+def label_counts(conn, phase="BEFORE", bounty_status=None):
+    """List (label, jumlah, rata-rata confidence %) urut dari yang terbanyak."""
+    # urut di Python: jumlah label sedikit, ORDER BY n butuh sort tambahan
+    rows = [
+        (r["label"], r["n"], round(r["avg_conf"], 2))
+        for r in conn.execute(*label_counts_query(phase, bounty_status))
+    ]
+    return sorted(rows, key=lambda row: row[1], reverse=True)
+
+
+def base_points_by_bounty(conn, bounty_ids=None):
+    """
+    Poin dasar (utils.calculate_base_points) per bounty dari deteksi BEFORE,
+    dihitung di SQL. Return dict {bounty_id: poin}.
+    """
+    values = ", ".join("(?, ?)" for _ in LABEL_POINTS)
+    params = [v for item in LABEL_POINTS.items() for v in item]
+    sql = f"""
+        WITH label_points(label, points) AS (VALUES {values})
+        SELECT d.bounty_id, SUM(COALESCE(p.points, ?)) AS points
+        FROM detections d
+        LEFT JOIN label_points p ON p.label = d.label
+        WHERE d.phase = 'BEFORE'
+    """
+    params.append(DEFAULT_LABEL_POINTS)
+    if bounty_ids is not None:
+        sql += f" AND d.bounty_id IN ({', '.join('?' for _ in bounty_ids)})"
+        params.extend(bounty_ids)
+    sql += " GROUP BY d.bounty_id"
+    return {r["bounty_id"]: r["points"] for r in conn.execute(sql, params)}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "stats":
+        sys.exit("Pemakaian: python detections.py stats")
+
+    from db import get_db_connection, init_db
+
+    init_db()
+    conn = get_db_connection()
+    print(f"{'label':24s} {'jumlah':>8s} {'conf %':>8s}")
+    for label, n, avg_conf in label_counts(conn):
+        print(f"{label:24s} {n:8d} {avg_conf:8.2f}")
+    conn.close()
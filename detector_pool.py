@@ -0,0 +1,155 @@
+"""
+Pool proses detector YOLO.
+
+Tiap proses worker memuat model (backend sesuai DETECTOR_BACKEND) satu kali,
+memakai budget thread sendiri (torch.set_num_threads / intra-op onnxruntime)
+dan opsional dipin ke core tertentu, jadi beberapa worker tidak saling berebut GIL maupun thread intra-op.
+Sisi Flask cukup mengirim path gambar (atau bytes) dan menerima detections.
+"""
+import os
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+
+# model milik proses worker (diisi oleh _init_worker)
+_worker_model = None
+
+
+def _init_worker(backend, model_path, num_threads, pin_cores, counter):
+    global _worker_model
+
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+
+    # harus diset sebelum torch di-import
+    os.environ["OMP_NUM_THREADS"] = str(num_threads)
+    os.environ["MKL_NUM_THREADS"] = str(num_threads)
+
+    if pin_cores and hasattr(os, "sched_setaffinity"):
+        ncpu = os.cpu_count() or 1
+        first = (index * num_threads) % ncpu
+        cores = {(first + i) % ncpu for i in range(num_threads)}
+        os.sched_setaffinity(0, cores)
+
+    from detectors import load_detector
+
+    backend = (backend or os.environ.get("DETECTOR_BACKEND", "ultralytics")).lower()
+    if backend == "ultralytics":
+        import torch
+
+        torch.set_num_threads(num_threads)
+    _worker_model = load_detector(backend, model_path, num_threads=num_threads)
+
+
+def _load_image(image):
+    """
+    path / bytes -> array BGR lewat uploads.decode_image (orientasi EXIF +
+    diperkecil ke INFER_MAX_SIDE), sama untuk jalur satu gambar dan batch;
+    array dianggap sudah didecode.
+    """
+    if isinstance(image, (bytearray, memoryview)):
+        image = bytes(image)
+    if isinstance(image, (str, bytes)):
+        from uploads import decode_image
+
+        return decode_image(image)
+    return image
+
+
+def _worker_detect(image, imgsz, options):
+    from utils import parse_detections
+
+    result = _worker_model.predict(
+        _load_image(image), imgsz=imgsz, save=False, verbose=False, **options
+    )[0]
+    return parse_detections(result)
+
+
+def _worker_detect_batch(images, imgsz, options):
+    """
+    Decode + predict satu batch (path file / bytes / array). Decode dilakukan
+    di proses worker, jadi yang dikirim antar proses cukup path-nya.
+    Return list (detections, error) sesuai urutan images.
+    """
+    from utils import parse_detections
+
+    outcomes, arrays, index = [None] * len(images), [], []
+    for i, image in enumerate(images):
+        try:
+            arrays.append(_load_image(image))
+            index.append(i)
+        except Exception as e:
+            outcomes[i] = (None, f"decode gagal: {e}")
+    if arrays:
+        results = _worker_model.predict(
+            arrays, imgsz=imgsz, save=False, verbose=False, **options
+        )
+        for i, result in zip(index, results):
+            outcomes[i] = (parse_detections(result), None)
+    return outcomes
+
+
+class DetectorProcessPool:
+    """
+    ProcessPoolExecutor berisi `num_workers` proses detector.
+    threads_per_worker default = jumlah core dibagi rata ke semua worker.
+    """
+
+    def __init__(
+        self,
+        num_workers,
+        threads_per_worker=None,
+        pin_cores=False,
+        backend=None,
+        model_path=None,
+    ):
+        ncpu = os.cpu_count() or 1
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker or max(1, ncpu // num_workers)
+        # spawn: jangan mewarisi state torch / thread dari proses Flask
+        ctx = mp.get_context("spawn")
+        self._executor = ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(
+                backend,
+                model_path,
+                self.threads_per_worker,
+                pin_cores,
+                ctx.Value("i", 0),
+            ),
+        )
+
+    def submit(self, image, imgsz=736, **options):
+        """
+        image boleh path file atau bytes; return Future list deteksi.
+        options (conf, max_det, classes) diteruskan ke model.predict.
+        """
+        metrics.inc("model_calls_total", source="process_pool")
+        metrics.inc("model_images_total", source="process_pool")
+        return self._executor.submit(_worker_detect, image, imgsz, options)
+
+    def detect(self, image, imgsz=736, **options):
+        return self.submit(image, imgsz, **options).result()
+
+    def submit_batch(self, images, imgsz=736, **options):
+        """Satu batch ke satu worker; return Future list (detections, error)."""
+        metrics.inc("model_calls_total", source="process_pool")
+        metrics.inc("model_images_total", len(images), source="process_pool")
+        return self._executor.submit(_worker_detect_batch, images, imgsz, options)
+
+    def warmup(self, imgsizes=(736,)):
+        """Paksa semua proses worker start dan memuat model sekarang."""
+        import numpy as np
+
+        futures = []
+        for imgsz in imgsizes:
+            dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+            futures += [self.submit(dummy, imgsz) for _ in range(self.num_workers)]
+        return futures
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
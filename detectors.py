@@ -0,0 +1,277 @@
+"""
+Backend detector yang bisa dipilih lewat konfigurasi.
+
+- "ultralytics" : YOLO dari ultralytics (PyTorch), default.
+- "onnx"        : model hasil export_model.py dijalankan dengan onnxruntime
+                  di CPU, tanpa torch/ultralytics. Letterbox dan NMS
+                  dikerjakan sendiri dengan numpy. Opsional:
+                  pip install -r requirements-onnx.txt
+
+Semua backend punya method `predict(source, imgsz=..., save=False, ...)`
+dan mengembalikan list hasil dengan atribut `boxes` (cls, conf, xyxy),
+`names` dan `orig_shape` seperti ultralytics, jadi utils.parse_detections
+tetap bisa dipakai. Gambar annotated dirender dari kotak tersimpan
+(annotate.py), bukan oleh backend.
+
+Konfigurasi via environment variable:
+  - DETECTOR_BACKEND        (ultralytics | onnx, default ultralytics)
+  - DETECTOR_MODEL          (default best.pt / best.onnx)
+  - DETECTOR_ONNX_PROVIDERS (default CPUExecutionProvider, dipisah koma;
+                             misal OpenVINOExecutionProvider,CPUExecutionProvider)
+"""
+import os
+import ast
+import time
+
+import numpy as np
+
+DEFAULT_MODELS = {
+    "ultralytics": "best.pt",
+    "onnx": "best.onnx",
+}
+
+
+_model_versions = {}
+
+
+def resolve_backend(backend=None, model_path=None):
+    """Return (backend, model_path) setelah default & environment diterapkan."""
+    backend = (backend or os.environ.get("DETECTOR_BACKEND", "ultralytics")).lower()
+    if backend not in DEFAULT_MODELS:
+        raise ValueError(f"DETECTOR_BACKEND tidak dikenal: {backend}")
+    model_path = model_path or os.environ.get("DETECTOR_MODEL") or DEFAULT_MODELS[backend]
+    return backend, model_path
+
+
+def model_version(backend=None, model_path=None):
+    """
+    Identitas model untuk cache hasil deteksi: backend + nama file + sha256
+    isi file (12 karakter). Dihitung sekali per proses, tanpa memuat model.
+    """
+    backend, model_path = resolve_backend(backend, model_path)
+    key = (backend, model_path)
+    if key not in _model_versions:
+        import hashlib
+
+        h = hashlib.sha256()
+        if os.path.isdir(model_path):
+            files = sorted(
+                os.path.join(root, name)
+                for root, _, names in os.walk(model_path)
+                for name in names
+            )
+        else:
+            files = [model_path]
+        for path in files:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+        name = os.path.basename(os.path.normpath(model_path))
+        _model_versions[key] = f"{backend}:{name}:{h.hexdigest()[:12]}"
+    return _model_versions[key]
+
+
+def load_detector(backend=None, model_path=None, num_threads=None):
+    """
+    Buat detector sesuai backend yang dikonfigurasi.
+    num_threads hanya dipakai backend onnx (intra-op threads);
+    untuk ultralytics atur lewat torch.set_num_threads.
+    """
+    backend, model_path = resolve_backend(backend, model_path)
+
+    if backend == "onnx":
+        providers = os.environ.get("DETECTOR_ONNX_PROVIDERS", "CPUExecutionProvider")
+        return OnnxDetector(
+            model_path, providers=providers.split(","), num_threads=num_threads
+        )
+
+    from ultralytics import YOLO
+
+    return YOLO(model_path)
+
+
+# ---------- Backend ONNX Runtime ----------
+
+
+class _Boxes:
+    """Subset dari ultralytics Boxes: cls, conf, xyxy (numpy, punya .tolist())."""
+
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+
+    def __len__(self):
+        return len(self.conf)
+
+
+class OnnxResult:
+    def __init__(self, orig_img, xyxy, conf, cls, names):
+        self.orig_shape = orig_img.shape[:2]
+        self.boxes = _Boxes(xyxy, conf, cls)
+        self.names = names
+        self.speed = {}  # diisi OnnxDetector.predict (ms per gambar)
+
+
+def _read_image(source):
+    """path -> array BGR; array dianggap sudah BGR (konvensi ultralytics/cv2)."""
+    if isinstance(source, np.ndarray):
+        return source
+    from PIL import Image
+
+    with Image.open(source) as img:
+        return np.asarray(img.convert("RGB"))[..., ::-1]
+
+
+def letterbox(img, imgsz, color=114):
+    """
+    Resize dengan rasio tetap lalu pad ke imgsz x imgsz (seperti YOLO).
+    Return (img, ratio, (pad_x, pad_y)).
+    """
+    from PIL import Image
+
+    h, w = img.shape[:2]
+    ratio = min(imgsz / h, imgsz / w)
+    new_w, new_h = round(w * ratio), round(h * ratio)
+    if (new_w, new_h) != (w, h):
+        resized = Image.fromarray(np.ascontiguousarray(img)).resize(
+            (new_w, new_h), Image.BILINEAR
+        )
+        img = np.asarray(resized)
+    pad_x = (imgsz - new_w) / 2
+    pad_y = (imgsz - new_h) / 2
+    top, left = int(round(pad_y - 0.1)), int(round(pad_x - 0.1))
+    out = np.full((imgsz, imgsz, 3), color, dtype=np.uint8)
+    out[top : top + new_h, left : left + new_w] = img
+    return out, ratio, (left, top)
+
+
+def nms(boxes, scores, iou_threshold):
+    """Non-maximum suppression sederhana (numpy), return index yang dipertahankan."""
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        xx1 = np.maximum(x1[i], x1[order[1:]])
+        yy1 = np.maximum(y1[i], y1[order[1:]])
+        xx2 = np.minimum(x2[i], x2[order[1:]])
+        yy2 = np.minimum(y2[i], y2[order[1:]])
+        inter = (xx2 - xx1).clip(0) * (yy2 - yy1).clip(0)
+        iou = inter / (areas[i] + areas[order[1:]] - inter + 1e-9)
+        order = order[1:][iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+class OnnxDetector:
+    """
+    Model YOLOv8 (export ONNX) dijalankan dengan onnxruntime.
+    Output model: (batch, 4 + jumlah_kelas, jumlah_anchor) dengan box cx,cy,w,h.
+    """
+
+    def __init__(self, model_path, providers=("CPUExecutionProvider",), num_threads=None):
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            opts.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(
+            model_path, sess_options=opts, providers=list(providers)
+        )
+        self.input_name = self.session.get_inputs()[0].name
+        input_shape = self.session.get_inputs()[0].shape
+        # model static: imgsz dikunci sesuai ukuran export
+        self.fixed_imgsz = input_shape[2] if isinstance(input_shape[2], int) else None
+        self.fixed_batch = input_shape[0] if isinstance(input_shape[0], int) else None
+
+        meta = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(meta["names"]) if "names" in meta else {}
+
+    def predict(
+        self,
+        source,
+        imgsz=640,
+        conf=0.25,
+        iou=0.7,
+        max_det=300,
+        classes=None,
+        save=False,
+        verbose=False,
+        **kwargs,
+    ):
+        t0 = time.perf_counter()
+        sources = source if isinstance(source, list) else [source]
+        imgsz = self.fixed_imgsz or imgsz
+        images = [_read_image(s) for s in sources]
+
+        batch, metas = [], []
+        for img in images:
+            lb, ratio, pad = letterbox(img, imgsz)
+            # BGR -> RGB, HWC -> CHW, 0..1
+            batch.append(lb[..., ::-1].transpose(2, 0, 1))
+            metas.append((ratio, pad))
+        batch = np.ascontiguousarray(np.stack(batch), dtype=np.float32) / 255.0
+        t1 = time.perf_counter()
+
+        if self.fixed_batch == 1 and len(images) > 1:
+            outputs = np.concatenate(
+                [self.session.run(None, {self.input_name: b[None]})[0] for b in batch]
+            )
+        else:
+            outputs = self.session.run(None, {self.input_name: batch})[0]
+        t2 = time.perf_counter()
+
+        results = [
+            self._postprocess(out, img, ratio, pad, conf, iou, max_det, classes)
+            for out, img, (ratio, pad) in zip(outputs, images, metas)
+        ]
+        t3 = time.perf_counter()
+
+        # ms per gambar, sama seperti Results.speed di ultralytics
+        speed = {
+            "preprocess": (t1 - t0) * 1000 / len(images),
+            "inference": (t2 - t1) * 1000 / len(images),
+            "postprocess": (t3 - t2) * 1000 / len(images),
+        }
+        for result in results:
+            result.speed = speed
+        return results
+
+    def _postprocess(self, out, img, ratio, pad, conf, iou, max_det, classes):
+        preds = out.T  # (anchor, 4 + nc)
+        scores_all = preds[:, 4:]
+        cls = scores_all.argmax(axis=1)
+        scores = scores_all[np.arange(len(cls)), cls]
+
+        mask = scores >= conf
+        if classes is not None:
+            mask &= np.isin(cls, classes)
+        preds, scores, cls = preds[mask], scores[mask], cls[mask]
+
+        cx, cy, w, h = preds[:, 0], preds[:, 1], preds[:, 2], preds[:, 3]
+        boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+
+        if len(boxes):
+            # NMS per kelas: geser box tiap kelas supaya tidak saling tumpang
+            offset = cls[:, None].astype(np.float32) * 7680.0
+            keep = nms(boxes + offset, scores, iou)[:max_det]
+            boxes, scores, cls = boxes[keep], scores[keep], cls[keep]
+
+        # kembalikan ke koordinat gambar asli
+        boxes[:, [0, 2]] -= pad[0]
+        boxes[:, [1, 3]] -= pad[1]
+        boxes /= ratio
+        h0, w0 = img.shape[:2]
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, w0)
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, h0)
+
+        return OnnxResult(
+            img,
+            boxes.astype(np.float32),
+            scores.astype(np.float32),
+            cls.astype(np.float32),
+            self.names,
+        )
@@ -0,0 +1,57 @@
+"""
+Export best.pt ke format runtime lain (dijalankan offline, sekali per model).
+
+    python export_model.py                 # best.pt -> best.onnx
+    python export_model.py --int8          # + best.int8.onnx (quantisasi dinamis)
+    python export_model.py --openvino      # + best_openvino_model/
+    python export_model.py --imgsz 736 --weights best.pt
+
+--int8 dan backend onnx butuh onnxruntime (pip install -r requirements-onnx.txt).
+Setelah itu jalankan app dengan DETECTOR_BACKEND=onnx
+(dan DETECTOR_MODEL=best.int8.onnx kalau mau versi int8).
+Model OpenVINO dipakai lewat backend ultralytics:
+DETECTOR_MODEL=best_openvino_model/.
+"""
+import argparse
+
+
+def export_onnx(weights, imgsz, dynamic=True):
+    from ultralytics import YOLO
+
+    # dynamic: ukuran batch & imgsz boleh berubah (dipakai engine batching)
+    return YOLO(weights).export(
+        format="onnx", imgsz=imgsz, dynamic=dynamic, simplify=True
+    )
+
+
+def quantize_int8(onnx_path):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    out_path = onnx_path.rsplit(".", 1)[0] + ".int8.onnx"
+    quantize_dynamic(onnx_path, out_path, weight_type=QuantType.QUInt8)
+    return out_path
+
+
+def export_openvino(weights, imgsz):
+    from ultralytics import YOLO
+
+    return YOLO(weights).export(format="openvino", imgsz=imgsz)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export model YOLO untuk backend non-PyTorch")
+    parser.add_argument("--weights", default="best.pt")
+    parser.add_argument("--imgsz", type=int, default=736)
+    parser.add_argument("--static", action="store_true", help="batch & imgsz tetap")
+    parser.add_argument("--int8", action="store_true", help="buat juga versi int8")
+    parser.add_argument("--openvino", action="store_true", help="export juga ke OpenVINO IR")
+    args = parser.parse_args()
+
+    onnx_path = export_onnx(args.weights, args.imgsz, dynamic=not args.static)
+    print("ONNX     :", onnx_path)
+
+    if args.int8:
+        print("ONNX int8:", quantize_int8(onnx_path))
+
+    if args.openvino:
+        print("OpenVINO :", export_openvino(args.weights, args.imgsz))
@@ -0,0 +1,127 @@
+"""
+Pencarian bounty OPEN di sekitar sebuah titik.
+
+Koordinat bounty OPEN disimpan di virtual table R*Tree `bounty_geo`
+(dirawat oleh trigger di tabel bounties, lihat migrations.py). Query cukup
+mengambil kandidat di dalam bounding box radius, lalu jarak persisnya
+dihitung (haversine vektor, utils.within_radius) hanya untuk kandidat tersebut.
+Kalau SQLite tidak punya modul R*Tree, bounding box difilter langsung
+di kolom latitude/longitude tabel bounties.
+"""
+import math
+
+from utils import within_radius
+
+EARTH_RADIUS_M = 6371000.0
+
+# radius maksimum yang boleh diminta dari halaman /bounties
+MAX_RADIUS_M = 5000.0
+
+_has_geo_index = None
+
+
+def bounding_box(lat, lon, radius_m):
+    """
+    Kotak (min_lat, max_lat, min_lon, max_lon) yang memuat lingkaran radius_m.
+    (Tidak menangani lingkaran yang melewati garis 180°.)
+    """
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    coslat = math.cos(math.radians(lat))
+    if coslat < 1e-9:
+        dlon = 180.0
+    else:
+        dlon = min(180.0, math.degrees(radius_m / (EARTH_RADIUS_M * coslat)))
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon
+
+
+def has_geo_index(conn):
+    global _has_geo_index
+    if _has_geo_index is None:
+        row = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'bounty_geo'"
+        ).fetchone()
+        _has_geo_index = row is not None
+    return _has_geo_index
+
+
+# CROSS JOIN: paksa R*Tree dibaca duluan. Tanpa ini planner bisa
+# memilih index status lalu mencocokkan semua bounty OPEN satu per satu
+GEO_CANDIDATES_SQL = """
+    SELECT b.*, u.name AS reporter_name
+    FROM bounty_geo g
+    CROSS JOIN bounties b ON b.id = g.id
+    JOIN users u ON b.reporter_id = u.user_id
+    WHERE g.max_lat >= ? AND g.min_lat <= ?
+      AND g.max_lon >= ? AND g.min_lon <= ?
+      AND b.status = 'OPEN' AND b.reporter_id != ?
+"""
+
+# tanpa R*Tree (SQLite tanpa modul rtree)
+BOX_CANDIDATES_SQL = """
+    SELECT b.*, u.name AS reporter_name
+    FROM bounties b
+    JOIN users u ON b.reporter_id = u.user_id
+    WHERE b.status = 'OPEN' AND b.reporter_id != ?
+      AND b.latitude BETWEEN ? AND ?
+      AND b.longitude BETWEEN ? AND ?
+"""
+
+
+def _candidates(conn, lat, lon, radius_m, exclude_reporter):
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_m)
+    if has_geo_index(conn):
+        return conn.execute(
+            GEO_CANDIDATES_SQL,
+            (min_lat, max_lat, min_lon, max_lon, exclude_reporter or ""),
+        ).fetchall()
+
+    return conn.execute(
+        BOX_CANDIDATES_SQL,
+        (exclude_reporter or "", min_lat, max_lat, min_lon, max_lon),
+    ).fetchall()
+
+
+def nearby_open_bounties(
+    conn, lat, lon, radius_m=100.0, exclude_reporter=None, limit=None, offset=0
+):
+    """
+    Bounty OPEN dalam radius_m dari (lat, lon), urut dari yang terdekat.
+    Return (list dict dengan key distance_m untuk halaman ini, total dalam radius).
+    """
+    rows = _candidates(conn, lat, lon, radius_m, exclude_reporter)
+    if not rows:
+        return [], 0
+
+    distances, _, order = within_radius(
+        lat,
+        lon,
+        [r["latitude"] for r in rows],
+        [r["longitude"] for r in rows],
+        radius_m,
+    )
+
+    total = len(order)
+    end = None if limit is None else offset + limit
+    results = []
+    for i in order[offset:end]:
+        d = dict(rows[i])
+        d["distance_m"] = float(distances[i])
+        results.append(d)
+    return results, total
+
+
+def k_nearest_open_bounties(
+    conn, lat, lon, k, exclude_reporter=None, start_radius_m=100.0, max_radius_m=50000.0
+):
+    """
+    k bounty OPEN terdekat. Radius pencarian dilipatgandakan sampai
+    ketemu k bounty (atau mencapai max_radius_m).
+    """
+    radius_m = start_radius_m
+    while True:
+        rows, total = nearby_open_bounties(
+            conn, lat, lon, radius_m, exclude_reporter, limit=k
+        )
+        if total >= k or radius_m >= max_radius_m:
+            return rows
+        radius_m = min(radius_m * 2, max_radius_m)
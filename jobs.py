@@ -0,0 +1,514 @@
+"""
+Antrian job deteksi YOLO.
+
+Request /submit dan /bounty/<id>/complete hanya menyimpan file + membuat
+baris di tabel detection_jobs. Worker (thread di proses Flask, atau proses
+terpisah via `python jobs.py`) mengambil job satu per satu, menjalankan
+model, lalu memperbarui status bounty. Client mem-polling /jobs/<id>.
+"""
+import os
+import json
+import time
+import threading
+from datetime import datetime, timedelta
+
+from annotate import ANNOTATE_MODE, annotated_filename, has_boxes, render_in_background
+from db import get_db_connection, init_db
+from dedup import (
+    check_duplicates,
+    file_sha256,
+    get_cached_detections,
+    put_cached_detections,
+)
+from detect_settings import detect_phase, settings_for, warmup_imgsizes
+from detections import save_detections
+from detectors import model_version
+from ledger import record_bounty_completed
+from metrics import register_gauge, span
+from uploads import keep_decoded, take_decoded, wait_written
+from utils import calculate_base_points
+
+TIME_FORMAT = "%Y%m%d_%H%M%S"
+
+# job yang gagal (exception) dicoba ulang sampai batas ini,
+# percobaan ke-n setelah jeda RETRY_DELAY_SECONDS * n
+MAX_ATTEMPTS = 3
+RETRY_DELAY_SECONDS = 5
+
+# worker di proses lain bisa mengambil job sebelum proses web selesai
+# menulis file upload (uploads.store_async): job dikembalikan ke antrian
+# tiap UPLOAD_RETRY_SECONDS tanpa menghitung attempt, sampai job berumur
+# UPLOAD_WAIT_SECONDS
+UPLOAD_RETRY_SECONDS = 1
+UPLOAD_WAIT_SECONDS = 60
+
+# job RUNNING lebih lama dari ini dianggap worker-nya mati
+STALE_AFTER_SECONDS = 300
+
+# dibangunkan setiap ada job baru supaya worker di proses yang sama
+# tidak perlu menunggu interval polling
+_new_job_event = threading.Event()
+
+
+def _now():
+    return datetime.now().strftime(TIME_FORMAT)
+
+
+def _after(seconds):
+    return (datetime.now() + timedelta(seconds=seconds)).strftime(TIME_FORMAT)
+
+
+def enqueue_detection_job(
+    conn, bounty_id, user_id, phase, image_filename, image_sha256=None
+):
+    """
+    Masukkan job deteksi ke antrian. Memakai koneksi pemanggil supaya
+    bisa satu transaksi dengan INSERT/UPDATE bounty; commit oleh pemanggil.
+    """
+    cur = conn.execute(
+        """
+        INSERT INTO detection_jobs
+            (bounty_id, user_id, phase, image_filename, image_sha256,
+             status, created_at, next_attempt_at)
+        VALUES (?, ?, ?, ?, ?, 'QUEUED', ?, ?)
+        """,
+        (bounty_id, user_id, phase, image_filename, image_sha256, _now(), _now()),
+    )
+    _new_job_event.set()
+    return cur.lastrowid
+
+
+PENDING_JOBS_SQL = """
+    SELECT COUNT(*) AS n FROM detection_jobs
+    WHERE status IN ('QUEUED', 'RUNNING')
+"""
+
+CLAIM_JOB_SQL = """
+    SELECT * FROM detection_jobs
+    WHERE status = 'QUEUED' AND next_attempt_at <= ?
+    ORDER BY id
+    LIMIT 1
+"""
+
+
+def count_pending_jobs():
+    """Jumlah job yang belum selesai (QUEUED + RUNNING)."""
+    conn = get_db_connection()
+    row = conn.execute(PENDING_JOBS_SQL).fetchone()
+    conn.close()
+    return row["n"]
+
+
+register_gauge(
+    "detection_jobs_pending", "Job deteksi QUEUED + RUNNING", count_pending_jobs
+)
+
+
+def get_job(job_id):
+    conn = get_db_connection()
+    row = conn.execute(
+        "SELECT * FROM detection_jobs WHERE id = ?", (job_id,)
+    ).fetchone()
+    conn.close()
+    return row
+
+
+def job_result(job):
+    """Isi result_json job sebagai dict (kosong kalau belum selesai)."""
+    if not job or not job["result_json"]:
+        return {}
+    return json.loads(job["result_json"])
+
+
+def claim_next_job():
+    """
+    Ambil satu job QUEUED yang sudah jatuh tempo dan tandai RUNNING secara
+    atomik (BEGIN IMMEDIATE supaya dua worker tidak mengambil job yang sama).
+    """
+    conn = get_db_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        job = conn.execute(CLAIM_JOB_SQL, (_now(),)).fetchone()
+        if job:
+            conn.execute(
+                """
+                UPDATE detection_jobs
+                SET status = 'RUNNING', started_at = ?, attempts = attempts + 1
+                WHERE id = ?
+                """,
+                (_now(), job["id"]),
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+    if not job:
+        return None
+    return get_job(job["id"])
+
+
+def requeue_stale_jobs(stale_after=STALE_AFTER_SECONDS):
+    """Kembalikan job RUNNING yang macet (worker crash) ke antrian."""
+    cutoff = (datetime.now() - timedelta(seconds=stale_after)).strftime(TIME_FORMAT)
+    conn = get_db_connection()
+    cur = conn.execute(
+        """
+        UPDATE detection_jobs
+        SET status = 'QUEUED', started_at = NULL
+        WHERE status = 'RUNNING' AND started_at < ?
+        """,
+        (cutoff,),
+    )
+    conn.commit()
+    conn.close()
+    return cur.rowcount
+
+
+def _finish_before(conn, job, detections, annotated_image):
+    if not detections:
+        conn.execute(
+            """
+            UPDATE bounties SET status = 'REJECTED', num_objects = 0
+            WHERE id = ? AND status = 'PENDING_DETECTION'
+            """,
+            (job["bounty_id"],),
+        )
+        return {"detections": [], "passed": False}
+
+    base_points = calculate_base_points(detections)
+    points_reporter = base_points
+    points_cleaner = base_points * 2
+
+    conn.execute(
+        """
+        UPDATE bounties
+        SET status = 'OPEN', num_objects = ?, points_reporter = ?,
+            points_cleaner = ?
+        WHERE id = ? AND status = 'PENDING_DETECTION'
+        """,
+        (len(detections), points_reporter, points_cleaner, job["bounty_id"]),
+    )
+    return {
+        "detections": detections,
+        "passed": True,
+        "points_reporter": points_reporter,
+        "points_cleaner": points_cleaner,
+        "annotated_image": annotated_image,
+    }
+
+
+def _finish_after(conn, job, detections):
+    # AFTER lolos hanya kalau tidak ada sampah yang terdeteksi
+    if detections:
+        return {"detections": detections, "passed": False}
+
+    cur = conn.execute(
+        """
+        UPDATE bounties
+        SET after_image = ?, status = 'COMPLETED', completed_at = ?
+        WHERE id = ? AND status = 'CLAIMED' AND cleaner_id = ?
+        """,
+        (job["image_filename"], _now(), job["bounty_id"], job["user_id"]),
+    )
+    if cur.rowcount != 1:
+        return {"detections": [], "passed": False}
+
+    # poin reporter & cleaner masuk ledger di transaksi yang sama
+    record_bounty_completed(conn, job["bounty_id"])
+    return {"detections": [], "passed": True}
+
+
+def process_job(job, upload_folder, result_folder, detect=None):
+    """
+    Jalankan deteksi untuk satu job lalu simpan hasilnya.
+    `detect` default ml.run_detection (engine batching di proses ini);
+    bisa diganti DetectorProcessPool.detect.
+    """
+    # InferenceQueueFull hanya dilempar oleh engine batching in-process
+    queue_full = ()
+    if detect is None:
+        from ml import run_detection as detect, InferenceQueueFull
+
+        queue_full = (InferenceQueueFull,)
+
+    image_path = os.path.join(upload_folder, job["image_filename"])
+
+    # file upload ditulis di background (uploads.store_async); kalau worker
+    # di proses lain mengambil job sebelum file selesai ditulis, coba lagi nanti
+    with span("wait_upload"):
+        wait_written(image_path)
+    if not os.path.exists(image_path):
+        created = datetime.strptime(job["created_at"], TIME_FORMAT)
+        if datetime.now() - created < timedelta(seconds=UPLOAD_WAIT_SECONDS):
+            _requeue_job(job, delay=UPLOAD_RETRY_SECONDS)
+        else:
+            _fail_job(job, f"file upload {job['image_filename']} tidak ditemukan", final=True)
+        return
+
+    # gambar yang sama persis + model & pengaturan fase yang sama -> pakai hasil cache
+    sha = job["image_sha256"] or file_sha256(image_path)
+    version = model_version()
+    settings = settings_for(job["phase"])
+    cache_version = settings.cache_version(version)
+    cached = get_cached_detections(sha, cache_version, settings.imgsz)
+
+    if cached is not None:
+        detections = cached["detections"]
+    else:
+        # array hasil decode saat upload (proses yang sama), kalau tidak ada
+        # detector membaca file dari disk
+        image = take_decoded(sha)
+        try:
+            # imgsz / conf / max_det / kelas per fase, pass low-res dulu kalau
+            # mode adaptif aktif (detect_settings.py); gambar annotated tidak
+            # dibuat di sini (lihat annotate.py)
+            with span("detect"):
+                detections = detect_phase(
+                    detect, image_path if image is None else image, job["phase"]
+                )
+        except queue_full:
+            # engine sedang penuh: kembalikan ke antrian tanpa menghitung attempt
+            _requeue_job(job)
+            time.sleep(0.5)
+            return
+        except Exception as e:
+            _fail_job(job, str(e))
+            return
+        put_cached_detections(sha, cache_version, settings.imgsz, detections)
+
+    try:
+        with span("dedup_check"):
+            check_duplicates(image_path, sha, job["bounty_id"], job["user_id"], job["phase"])
+    except Exception as e:
+        print("[WARN] Gagal memeriksa duplikat gambar:", e)
+
+    annotated = None
+    if job["phase"] == "BEFORE" and ANNOTATE_MODE != "off" and has_boxes(detections):
+        annotated = annotated_filename(job["image_filename"])
+
+    conn = get_db_connection()
+    save_detections(conn, job["bounty_id"], job["phase"], detections, version, job["id"])
+    if job["phase"] == "BEFORE":
+        outcome = _finish_before(conn, job, detections, annotated)
+    else:
+        outcome = _finish_after(conn, job, detections)
+
+    conn.execute(
+        """
+        UPDATE detection_jobs
+        SET status = 'DONE', result_json = ?, error = NULL, finished_at = ?
+        WHERE id = ?
+        """,
+        (json.dumps(outcome, ensure_ascii=False), _now(), job["id"]),
+    )
+    conn.commit()
+    conn.close()
+
+    if annotated and outcome["passed"]:
+        render_in_background(upload_folder, result_folder, job["image_filename"], detections)
+
+
+def _requeue_job(job, delay=0):
+    """Kembalikan job ke antrian tanpa menghitung attempt."""
+    conn = get_db_connection()
+    conn.execute(
+        """
+        UPDATE detection_jobs
+        SET status = 'QUEUED', started_at = NULL, attempts = attempts - 1,
+            next_attempt_at = ?
+        WHERE id = ?
+        """,
+        (_after(delay), job["id"]),
+    )
+    conn.commit()
+    conn.close()
+
+
+def _fail_job(job, error, final=False):
+    print(f"[WARN] Job deteksi {job['id']} gagal:", error)
+    conn = get_db_connection()
+    if not final and job["attempts"] < MAX_ATTEMPTS:
+        conn.execute(
+            """
+            UPDATE detection_jobs
+            SET status = 'QUEUED', error = ?, next_attempt_at = ?
+            WHERE id = ?
+            """,
+            (error, _after(RETRY_DELAY_SECONDS * job["attempts"]), job["id"]),
+        )
+    else:
+        conn.execute(
+            """
+            UPDATE detection_jobs
+            SET status = 'FAILED', error = ?, finished_at = ?
+            WHERE id = ?
+            """,
+            (error, _now(), job["id"]),
+        )
+        # bounty BEFORE yang tidak bisa dideteksi jangan menggantung selamanya
+        if job["phase"] == "BEFORE":
+            conn.execute(
+                """
+                UPDATE bounties SET status = 'REJECTED'
+                WHERE id = ? AND status = 'PENDING_DETECTION'
+                """,
+                (job["bounty_id"],),
+            )
+    conn.commit()
+    conn.close()
+
+
+class DetectionWorkerPool:
+    """
+    Sekumpulan thread yang menguras tabel detection_jobs.
+    Tiap worker mengambil job secara atomik, jadi beberapa pool
+    (beberapa proses) boleh berjalan bersamaan.
+    """
+
+    def __init__(
+        self,
+        upload_folder,
+        result_folder,
+        num_workers=1,
+        poll_interval=1.0,
+        detect=None,
+    ):
+        self.upload_folder = upload_folder
+        self.result_folder = result_folder
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+        self.detect = detect
+        self._stop = threading.Event()
+        self._threads = []
+        self._stale_lock = threading.Lock()
+        self._last_stale_check = 0.0
+
+    def start(self):
+        self._requeue_stale()
+        # upload yang diterima proses ini didecode sekali, dipakai langsung worker
+        keep_decoded()
+        for i in range(self.num_workers):
+            t = threading.Thread(
+                target=self._run, name=f"detection-worker-{i}", daemon=True
+            )
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        _new_job_event.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def _requeue_stale(self):
+        """
+        requeue_stale_jobs paling sering sekali per STALE_AFTER_SECONDS per pool,
+        supaya job milik thread / proses yang mati tidak menunggu restart.
+        """
+        now = time.monotonic()
+        with self._stale_lock:
+            if self._last_stale_check and now - self._last_stale_check < STALE_AFTER_SECONDS:
+                return
+            self._last_stale_check = now
+        n = requeue_stale_jobs()
+        if n:
+            print(f"[WARN] {n} job deteksi macet dikembalikan ke antrian")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._requeue_stale()
+            job = claim_next_job()
+            if job is None:
+                _new_job_event.wait(self.poll_interval)
+                _new_job_event.clear()
+                continue
+            try:
+                with span("detection_job"):
+                    process_job(job, self.upload_folder, self.result_folder, self.detect)
+            except Exception as e:
+                # jangan sampai thread worker mati karena satu job
+                _fail_job(job, str(e))
+
+
+def _make_detector_pool(num_processes, threads_per_process=None, pin_cores=False):
+    """Pool proses detector kalau num_processes > 0, selain itu None (engine)."""
+    if num_processes <= 0:
+        return None
+    from detector_pool import DetectorProcessPool
+
+    return DetectorProcessPool(
+        num_processes,
+        threads_per_worker=threads_per_process,
+        pin_cores=pin_cores,
+    )
+
+
+def _start_workers(upload_folder, result_folder, num_workers, detector_pool, warmup):
+    if warmup:
+        # load model + inference dummy di belakang layar, bukan di job pertama
+        if detector_pool:
+            detector_pool.warmup(warmup_imgsizes())
+        else:
+            import ml
+
+            ml.warmup(warmup_imgsizes(), background=True)
+
+    pool = DetectionWorkerPool(
+        upload_folder,
+        result_folder,
+        num_workers=num_workers,
+        detect=detector_pool.detect if detector_pool else None,
+    )
+    pool.start()
+    return pool
+
+
+def start_detection_workers(app):
+    """Jalankan worker di proses Flask kalau DETECTION_WORKERS > 0."""
+    num_workers = app.config.get("DETECTION_WORKERS", 0)
+    if num_workers <= 0:
+        return None
+    detector_pool = _make_detector_pool(
+        app.config.get("DETECTOR_PROCESSES", 0),
+        app.config.get("DETECTOR_THREADS_PER_PROCESS"),
+        app.config.get("DETECTOR_PIN_CORES", False),
+    )
+    return _start_workers(
+        app.config["UPLOAD_FOLDER"],
+        app.config["RESULT_FOLDER"],
+        num_workers,
+        detector_pool,
+        app.config.get("MODEL_WARMUP", False),
+    )
+
+
+if __name__ == "__main__":
+    # worker terpisah dari web server:
+    #   python jobs.py [jumlah_worker] [jumlah_proses_detector]
+    # default jumlah worker = ukuran batch engine (INFERENCE_MAX_BATCH), supaya
+    # job yang mengantri bisa digabung dalam satu batch
+    import sys
+
+    from ml import engine
+
+    num_workers = int(sys.argv[1]) if len(sys.argv) > 1 else engine.max_batch_size
+    num_processes = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+
+    init_db()
+    pool = _start_workers(
+        os.path.join("static", "upload"),
+        os.path.join("static", "image", "result"),
+        max(num_workers, num_processes),
+        _make_detector_pool(
+            num_processes,
+            pin_cores=os.environ.get("DETECTOR_PIN_CORES") == "1",
+        ),
+        warmup=True,
+    )
+    print(f"Detection worker berjalan ({pool.num_workers} thread). Ctrl+C untuk berhenti.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pool.stop()
@@ -0,0 +1,256 @@
+"""
+Ledger poin: setiap perubahan saldo dicatat di point_events (append-only)
+dan saldo per user disimpan di user_balances, jadi membaca saldo cukup
+satu lookup primary key (bukan SUM seluruh tabel bounties).
+
+Event ditulis memakai koneksi pemanggil, di transaksi yang sama dengan
+perubahan sumbernya (bounty COMPLETED, insert redeem, refund FAILED).
+
+    python ledger.py reconcile          # laporkan selisih ledger vs data sumber
+    python ledger.py reconcile --fix    # bangun ulang ledger dari data sumber
+"""
+import sys
+from datetime import datetime
+
+# status redeem yang mengurangi saldo (sama seperti perhitungan lama)
+REDEEMED_STATUSES = ("PENDING", "APPROVED", "PAID")
+
+
+def _now():
+    return datetime.utcnow().isoformat()
+
+
+def record_event(conn, user_id, delta, kind, ref_id):
+    """
+    Tambah satu event dan perbarui saldo. Idempoten per (kind, ref_id, user_id):
+    event yang sama tidak akan dihitung dua kali. Return True kalau tercatat.
+    """
+    if not user_id or not delta:
+        return False
+    cur = conn.execute(
+        """
+        INSERT OR IGNORE INTO point_events (user_id, delta, kind, ref_id, created_at)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (user_id, delta, kind, ref_id, _now()),
+    )
+    if cur.rowcount != 1:
+        return False
+    conn.execute(
+        """
+        INSERT INTO user_balances (user_id, balance, updated_at)
+        VALUES (?, ?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET
+            balance = balance + excluded.balance,
+            updated_at = excluded.updated_at
+        """,
+        (user_id, delta, _now()),
+    )
+    return True
+
+
+def record_events(conn, events):
+    """
+    Versi massal record_event untuk list (user_id, delta, kind, ref_id):
+    executemany, idempoten sama (event yang sudah tercatat dilewati).
+    Return jumlah event yang tercatat.
+    """
+    pending = {}
+    for user_id, delta, kind, ref_id in events:
+        if user_id and delta:
+            pending.setdefault((kind, ref_id, user_id), delta)
+    keys = list(pending)
+    for i in range(0, len(keys), 300):
+        chunk = keys[i : i + 300]
+        values = ", ".join("(?, ?, ?)" for _ in chunk)
+        for row in conn.execute(
+            f"""
+            SELECT kind, ref_id, user_id FROM point_events
+            WHERE (kind, ref_id, user_id) IN (VALUES {values})
+            """,
+            [v for key in chunk for v in key],
+        ):
+            pending.pop((row["kind"], row["ref_id"], row["user_id"]), None)
+    if not pending:
+        return 0
+
+    now = _now()
+    conn.executemany(
+        """
+        INSERT INTO point_events (user_id, delta, kind, ref_id, created_at)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        [(user_id, delta, kind, ref_id, now) for (kind, ref_id, user_id), delta in pending.items()],
+    )
+    deltas = {}
+    for (_, _, user_id), delta in pending.items():
+        deltas[user_id] = deltas.get(user_id, 0) + delta
+    conn.executemany(
+        """
+        INSERT INTO user_balances (user_id, balance, updated_at)
+        VALUES (?, ?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET
+            balance = balance + excluded.balance,
+            updated_at = excluded.updated_at
+        """,
+        [(user_id, delta, now) for user_id, delta in deltas.items()],
+    )
+    return len(pending)
+
+
+def record_bounty_completed(conn, bounty_id):
+    """Poin reporter & cleaner untuk bounty yang baru COMPLETED."""
+    bounty = conn.execute(
+        """
+        SELECT reporter_id, cleaner_id, points_reporter, points_cleaner
+        FROM bounties WHERE id = ?
+        """,
+        (bounty_id,),
+    ).fetchone()
+    if not bounty:
+        return
+    record_event(
+        conn, bounty["reporter_id"], bounty["points_reporter"], "BOUNTY_REPORTER", bounty_id
+    )
+    record_event(
+        conn, bounty["cleaner_id"], bounty["points_cleaner"], "BOUNTY_CLEANER", bounty_id
+    )
+
+
+def record_redemption(conn, redemption_id, user_id, points):
+    record_event(conn, user_id, -points, "REDEEM", redemption_id)
+
+
+def record_redemption_refund(conn, redemption_id, user_id, points):
+    """Redeem PENDING -> FAILED: poin dikembalikan."""
+    record_event(conn, user_id, points, "REDEEM_REFUND", redemption_id)
+
+
+def record_redemption_reinstated(conn, redemption_id, user_id, points):
+    """Redeem FAILED -> PAID: poin yang sudah dikembalikan dipotong lagi."""
+    record_event(conn, user_id, -points, "REDEEM_REINSTATE", redemption_id)
+
+
+BALANCE_SQL = "SELECT balance FROM user_balances WHERE user_id = ?"
+
+
+def get_balance(conn, user_id):
+    row = conn.execute(BALANCE_SQL, (user_id,)).fetchone()
+    return row["balance"] if row else 0
+
+
+# ---------- Rekonsiliasi ----------
+
+
+def expected_balances(conn):
+    """Saldo per user dihitung dari tabel sumber (bounties + reward_redemptions)."""
+    balances = {}
+    for row in conn.execute(
+        """
+        SELECT reporter_id, cleaner_id, points_reporter, points_cleaner
+        FROM bounties WHERE status = 'COMPLETED'
+        """
+    ):
+        if row["reporter_id"]:
+            balances[row["reporter_id"]] = (
+                balances.get(row["reporter_id"], 0) + (row["points_reporter"] or 0)
+            )
+        if row["cleaner_id"]:
+            balances[row["cleaner_id"]] = (
+                balances.get(row["cleaner_id"], 0) + (row["points_cleaner"] or 0)
+            )
+
+    placeholders = ",".join("?" for _ in REDEEMED_STATUSES)
+    for row in conn.execute(
+        f"""
+        SELECT user_id, SUM(points) AS redeemed
+        FROM reward_redemptions
+        WHERE status IN ({placeholders})
+        GROUP BY user_id
+        """,
+        REDEEMED_STATUSES,
+    ):
+        balances[row["user_id"]] = balances.get(row["user_id"], 0) - row["redeemed"]
+    return balances
+
+
+def rebuild(conn):
+    """
+    Kosongkan ledger lalu isi ulang dari tabel sumber.
+    Dipakai saat ledger pertama kali dibuat dan oleh `reconcile --fix`.
+    """
+    conn.execute("DELETE FROM point_events")
+    conn.execute("DELETE FROM user_balances")
+
+    for row in conn.execute(
+        "SELECT id FROM bounties WHERE status = 'COMPLETED'"
+    ).fetchall():
+        record_bounty_completed(conn, row["id"])
+
+    for row in conn.execute(
+        "SELECT id, user_id, points, status FROM reward_redemptions"
+    ).fetchall():
+        record_redemption(conn, row["id"], row["user_id"], row["points"])
+        if row["status"] not in REDEEMED_STATUSES:
+            record_redemption_refund(conn, row["id"], row["user_id"], row["points"])
+
+
+def find_drift(conn):
+    """
+    Bandingkan user_balances dengan (a) jumlah point_events dan (b) data sumber.
+    Return list (user_id, saldo_ledger, jumlah_event, saldo_sumber) yang tidak cocok.
+    """
+    ledger = {
+        r["user_id"]: r["balance"]
+        for r in conn.execute("SELECT user_id, balance FROM user_balances")
+    }
+    events = {
+        r["user_id"]: r["total"]
+        for r in conn.execute(
+            "SELECT user_id, SUM(delta) AS total FROM point_events GROUP BY user_id"
+        )
+    }
+    expected = expected_balances(conn)
+
+    drift = []
+    for user_id in sorted(set(ledger) | set(events) | set(expected)):
+        values = (
+            ledger.get(user_id, 0),
+            events.get(user_id, 0),
+            expected.get(user_id, 0),
+        )
+        if len(set(values)) > 1:
+            drift.append((user_id,) + values)
+    return drift
+
+
+def reconcile(fix=False):
+    from db import get_db_connection
+
+    conn = get_db_connection()
+    drift = find_drift(conn)
+    if drift and fix:
+        rebuild(conn)
+        conn.commit()
+    conn.close()
+    return drift
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "reconcile":
+        sys.exit("Pemakaian: python ledger.py reconcile [--fix]")
+
+    from db import init_db
+
+    init_db()
+    fix = "--fix" in sys.argv
+    drift = reconcile(fix=fix)
+    if not drift:
+        print("Ledger cocok dengan data sumber.")
+        sys.exit(0)
+
+    print(f"{'user_id':20s} {'saldo':>10s} {'event':>10s} {'sumber':>10s}")
+    for user_id, balance, events, expected in drift:
+        print(f"{user_id:20s} {balance:>10d} {events:>10d} {expected:>10d}")
+    print(f"{len(drift)} user tidak cocok." + (" Ledger sudah dibangun ulang." if fix else ""))
+    sys.exit(0 if fix else 1)
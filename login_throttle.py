@@ -0,0 +1,151 @@
+"""
+Rate limit percobaan login, dicek SEBELUM password di-hash.
+
+Sliding window per user_id dan per IP klien: dalam LOGIN_WINDOW_SECONDS
+(default 300) terakhir paling banyak LOGIN_MAX_PER_USER (default 5)
+percobaan per user_id dan LOGIN_MAX_PER_IP (default 30) per IP. Login yang
+berhasil menghapus jejak user_id-nya.
+
+- Jejak percobaan disimpan di tabel login_attempts (migrasi 12), jadi
+  batasnya berlaku untuk semua proses / worker. Cek + catat dalam satu
+  transaksi BEGIN IMMEDIATE supaya request paralel tidak lolos bersamaan.
+- Di memori tiap proses: key yang sudah diblokir diingat sampai waktu
+  bebasnya, jadi serangan ke key yang sama ditolak tanpa query database.
+- hashing_slot(): paling banyak LOGIN_HASH_CONCURRENCY (default 2) hash
+  password bersamaan per proses (login dan registrasi); sisanya menunggu
+  sebentar lalu ditolak.
+
+Alamat IP diambil dari request.remote_addr; di belakang reverse proxy app
+perlu dibungkus werkzeug ProxyFix supaya alamat klien yang asli terpakai.
+Penolakan tercatat di metrik login_rejected_total{reason}.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from metrics import describe, inc
+
+WINDOW_SECONDS = float(os.environ.get("LOGIN_WINDOW_SECONDS", "300"))
+MAX_PER_USER = int(os.environ.get("LOGIN_MAX_PER_USER", "5"))
+MAX_PER_IP = int(os.environ.get("LOGIN_MAX_PER_IP", "30"))
+HASH_CONCURRENCY = int(os.environ.get("LOGIN_HASH_CONCURRENCY", "2"))
+HASH_WAIT_SECONDS = float(os.environ.get("LOGIN_HASH_WAIT_SECONDS", "2"))
+
+# jumlah key terblokir yang diingat di memori per proses
+BLOCKED_CACHE_SIZE = 10000
+
+_lock = threading.Lock()
+_blocked = OrderedDict()  # key -> unix time bebas
+_last_cleanup = 0.0
+
+_hash_slots = threading.BoundedSemaphore(max(1, HASH_CONCURRENCY))
+
+COUNT_ATTEMPTS_SQL = """
+    SELECT COUNT(*), MIN(ts) FROM login_attempts
+    WHERE key = ? AND ts > ?
+"""
+PRUNE_ATTEMPTS_SQL = "DELETE FROM login_attempts WHERE ts <= ?"
+
+describe("login_rejected_total", "Percobaan login yang ditolak sebelum hash password")
+describe("login_attempts_total", "Percobaan login yang sampai ke cek password")
+
+
+def _blocked_for(key, now):
+    with _lock:
+        until = _blocked.get(key)
+        if until is None:
+            return None
+        if until <= now:
+            del _blocked[key]
+            return None
+        return until - now
+
+
+def _block(key, until):
+    with _lock:
+        _blocked[key] = until
+        _blocked.move_to_end(key)
+        while len(_blocked) > BLOCKED_CACHE_SIZE:
+            _blocked.popitem(last=False)
+
+
+def _limits(user_id, ip):
+    """List (reason, key, batas) untuk satu percobaan login."""
+    return [
+        ("user", f"user:{user_id}", MAX_PER_USER),
+        ("ip", f"ip:{ip}", MAX_PER_IP),
+    ]
+
+
+def check_login_attempt(conn, user_id, ip):
+    """
+    Cek batas lalu catat percobaan ini. Return None kalau boleh lanjut,
+    atau (reason, detik sampai boleh mencoba lagi) kalau ditolak.
+    Percobaan yang ditolak tidak dicatat (tidak memperpanjang blokir).
+    """
+    now = time.time()
+    limits = _limits(user_id, ip)
+
+    for reason, key, _ in limits:
+        retry_after = _blocked_for(key, now)
+        if retry_after is not None:
+            inc("login_rejected_total", reason=reason)
+            return reason, retry_after
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for reason, key, limit in limits:
+            count, oldest = conn.execute(
+                COUNT_ATTEMPTS_SQL, (key, now - WINDOW_SECONDS)
+            ).fetchone()
+            if count >= limit:
+                conn.rollback()
+                until = oldest + WINDOW_SECONDS
+                _block(key, until)
+                inc("login_rejected_total", reason=reason)
+                return reason, until - now
+        conn.executemany(
+            "INSERT INTO login_attempts (key, ts) VALUES (?, ?)",
+            [(key, now) for _, key, _ in limits],
+        )
+        _cleanup(conn, now)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return None
+
+
+def _cleanup(conn, now):
+    """Hapus jejak yang sudah di luar window, paling sering sekali per window per proses."""
+    global _last_cleanup
+    if now - _last_cleanup < WINDOW_SECONDS:
+        return
+    _last_cleanup = now
+    conn.execute(PRUNE_ATTEMPTS_SQL, (now - WINDOW_SECONDS,))
+
+
+def login_succeeded(conn, user_id):
+    """Hapus jejak percobaan user_id setelah login berhasil (commit oleh pemanggil)."""
+    key = f"user:{user_id}"
+    conn.execute("DELETE FROM login_attempts WHERE key = ?", (key,))
+    with _lock:
+        _blocked.pop(key, None)
+
+
+@contextmanager
+def hashing_slot():
+    """
+    with hashing_slot() as ok: ...  -- ok False kalau slot hash di proses ini
+    penuh lebih dari HASH_WAIT_SECONDS (percobaan login harus ditolak).
+    """
+    acquired = _hash_slots.acquire(timeout=HASH_WAIT_SECONDS)
+    if not acquired:
+        inc("login_rejected_total", reason="busy")
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            _hash_slots.release()
@@ -0,0 +1,286 @@
+"""
+Instrumentasi ringan: span timer, histogram + counter gaya Prometheus.
+
+- span("tahap"): context manager; durasinya masuk histogram
+  stage_duration_seconds{route, stage}. Di dalam request, durasi per tahap
+  dijumlahkan dulu lalu dicatat sekali saat request selesai (total waktu
+  tahap itu per request) dan ditampilkan di header Server-Timing.
+- Setiap query lewat get_db_connection dicatat sebagai tahap "db"
+  (execute) dan "db_fetch" (fetchall), lihat db.TimedCursor.
+- init_metrics(app): histogram http_request_duration_seconds{route, method,
+  status}, endpoint /metrics (format teks Prometheus) dan header
+  Server-Timing kalau METRICS_SERVER_TIMING=1.
+- register_gauge(): nilai yang dihitung saat /metrics dibaca (kedalaman
+  antrian, dsb).
+
+Kode di luar request (thread upload-writer, worker deteksi) tercatat dengan
+route "background". METRICS_ENABLED=0 mematikan semuanya (span jadi no-op).
+Di dalam request span / query hanya dijumlahkan di thread-local (1-3 us),
+histogram diperbarui sekali per request dengan satu lock; totalnya sekitar
+10 us per request, di bawah 1% waktu request lewat HTTP.
+"""
+import os
+import time
+import threading
+from bisect import bisect_left
+
+ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+SERVER_TIMING = os.environ.get("METRICS_SERVER_TIMING") == "1"
+
+# batas atas bucket histogram (detik)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+BACKGROUND = "background"
+
+_lock = threading.Lock()
+_histograms = {}  # (nama, label) -> [jumlah per bucket ..., +Inf, total detik]
+_counters = {}  # (nama, label) -> nilai
+_gauges = {}  # nama -> fungsi tanpa argumen
+_help = {
+    "http_request_duration_seconds": "Durasi request HTTP per route",
+    "stage_duration_seconds": "Durasi tahap (span) per route",
+    "db_connections_total": "Koneksi diambil dari pool (get_db_connection)",
+    "model_calls_total": "Panggilan predict model",
+    "model_images_total": "Gambar yang dikirim ke model",
+}
+
+
+class _RequestState(threading.local):
+    # default di level class: getattr yang gagal di threading.local mahal
+    route = None
+    spans = None  # tahap -> (total detik, jumlah), hanya di dalam request
+    connections = 0
+    start = None
+
+
+_local = _RequestState()
+
+
+def describe(name, text):
+    _help[name] = text
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _add(key, seconds):
+    # dipanggil dengan _lock dipegang
+    hist = _histograms.get(key)
+    if hist is None:
+        hist = _histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+    hist[bisect_left(BUCKETS, seconds)] += 1
+    hist[-1] += seconds
+
+
+def _observe(key, seconds):
+    with _lock:
+        _add(key, seconds)
+
+
+def observe(name, seconds, **labels):
+    """Tambah satu observasi (detik) ke histogram."""
+    _observe(_key(name, labels), seconds)
+
+
+def inc(name, value=1, **labels):
+    if not ENABLED:
+        return
+    key = _key(name, labels) if labels else (name, ())
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def register_gauge(name, text, func):
+    """func() dipanggil setiap /metrics dibaca; exception diabaikan."""
+    _gauges[name] = func
+    _help[name] = text
+
+
+# ---------- Span ----------
+
+
+def current_route():
+    return _local.route or BACKGROUND
+
+
+def record_span(stage, seconds):
+    spans = _local.spans
+    if spans is None:
+        # di luar request: langsung ke histogram
+        _observe(("stage_duration_seconds", (("route", BACKGROUND), ("stage", stage))), seconds)
+        return
+    entry = spans.get(stage)
+    if entry is None:
+        spans[stage] = [seconds, 1]
+    else:
+        entry[0] += seconds
+        entry[1] += 1
+
+
+def _record_request(method, route, status, total, spans, connections):
+    """Durasi request + total per tahap + jumlah koneksi, sekali ambil lock."""
+    with _lock:
+        _add(
+            (
+                "http_request_duration_seconds",
+                (("method", method), ("route", route), ("status", status)),
+            ),
+            total,
+        )
+        for stage, (seconds, _) in spans.items():
+            _add(("stage_duration_seconds", (("route", route), ("stage", stage))), seconds)
+        if connections:
+            key = ("db_connections_total", ())
+            _counters[key] = _counters.get(key, 0) + connections
+
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record_span(self.stage, time.perf_counter() - self.start)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(stage):
+    """with span("decode"): ..."""
+    return _Span(stage) if ENABLED else _NO_SPAN
+
+
+def note_db_connection():
+    """Dipanggil get_db_connection: hitung koneksi (total dan per request)."""
+    if _local.spans is not None:
+        _local.connections += 1
+    elif ENABLED:
+        inc("db_connections_total")
+
+
+# ---------- Flask ----------
+
+
+def _server_timing(spans, connections, total):
+    parts = []
+    for stage, (seconds, count) in spans.items():
+        entry = f"{stage};dur={seconds * 1000:.2f}"
+        if stage == "db":
+            entry += f';desc="{count} query, {connections} koneksi"'
+        parts.append(entry)
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+def _format_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    text = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in items
+    )
+    return "{" + text + "}"
+
+
+def render():
+    """Semua metrik dalam format teks Prometheus."""
+    with _lock:
+        histograms = {k: list(v) for k, v in _histograms.items()}
+        counters = dict(_counters)
+
+    lines = []
+    seen = set()
+
+    def header(name, kind):
+        if name not in seen:
+            seen.add(name)
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), hist in sorted(histograms.items()):
+        header(name, "histogram")
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ("+Inf",), hist[:-1]):
+            cumulative += count
+            lines.append(
+                f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}"
+            )
+        lines.append(f"{name}_sum{_format_labels(labels)} {hist[-1]:.6f}")
+        lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+
+    for (name, labels), value in sorted(counters.items()):
+        header(name, "counter")
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+
+    for name, func in sorted(_gauges.items()):
+        try:
+            value = func()
+        except Exception as e:
+            print(f"[WARN] Gagal membaca metrik {name}:", e)
+            continue
+        header(name, "gauge")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def init_metrics(app):
+    """Pasang pencatat durasi request, endpoint /metrics dan Server-Timing."""
+    from flask import Response, request
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics_endpoint():
+        return Response(render(), mimetype="text/plain; version=0.0.4")
+
+    if not ENABLED:
+        return
+
+    @app.before_request
+    def _start_request():
+        rule = request.url_rule
+        _local.route = rule.rule if rule is not None else "unmatched"
+        _local.spans = {}
+        _local.connections = 0
+        _local.start = time.perf_counter()
+
+    @app.after_request
+    def _finish_request(response):
+        start = _local.start
+        if start is None:
+            return response
+        total = time.perf_counter() - start
+        _record_request(
+            request.method,
+            _local.route,
+            response.status_code,
+            total,
+            _local.spans,
+            _local.connections,
+        )
+        if SERVER_TIMING:
+            response.headers["Server-Timing"] = _server_timing(
+                _local.spans, _local.connections, total
+            )
+        return response
+
+    @app.teardown_request
+    def _clear_request(exc):
+        _local.route = _local.spans = _local.start = None
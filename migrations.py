@@ -0,0 +1,841 @@
+"""
+Migrasi skema database berversi.
+
+Versi skema disimpan di `PRAGMA user_version`. db.init_db() memanggil
+migrate(), yang menjalankan migrasi yang belum diterapkan secara berurutan,
+masing-masing dalam satu transaksi.
+
+    python migrations.py            # jalankan migrasi + tampilkan versi
+    python migrations.py check      # EXPLAIN QUERY PLAN query penting,
+                                    # exit 1 kalau ada yang full scan
+
+Migrasi baru ditambahkan di akhir MIGRATIONS; jangan ubah migrasi lama.
+"""
+import sys
+import sqlite3
+
+
+def _table_exists(conn, name):
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone()
+    return row is not None
+
+
+def _add_column(conn, table, column, decl):
+    columns = [r[1] for r in conn.execute(f"PRAGMA table_info({table})")]
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def _sortable(expr):
+    """
+    Ekspresi SQL yang mengubah timestamp `%Y%m%d_%H%M%S` (bounty) maupun ISO
+    (redeem, `datetime.isoformat()`) menjadi 'YYYY-MM-DD HH:MM:SS'.
+    """
+    return f"""
+        CASE
+            WHEN {expr} GLOB '[0-9][0-9][0-9][0-9][0-9][0-9][0-9][0-9]_[0-9][0-9][0-9][0-9][0-9][0-9]'
+            THEN substr({expr}, 1, 4) || '-' || substr({expr}, 5, 2) || '-'
+                 || substr({expr}, 7, 2) || ' ' || substr({expr}, 10, 2) || ':'
+                 || substr({expr}, 12, 2) || ':' || substr({expr}, 14, 2)
+            ELSE datetime({expr})
+        END
+    """
+
+
+# ---------- Migrasi ----------
+
+
+def _m001_base_tables(conn):
+    """Tabel dasar (sebelumnya dibuat manual di waste.db)."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            birth_date TEXT,
+            region TEXT,
+            phone TEXT,
+            password_hash TEXT,
+            email TEXT,
+            is_phone_verified INTEGER DEFAULT 1,
+            role TEXT
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS bounties (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            reporter_id TEXT NOT NULL,
+            cleaner_id TEXT,
+            location TEXT,
+            created_at TEXT,
+            claimed_at TEXT,
+            completed_at TEXT,
+            before_image TEXT,
+            after_image TEXT,
+            status TEXT,              -- OPEN, CLAIMED, COMPLETED
+            num_objects INTEGER,
+            points_reporter INTEGER,
+            points_cleaner INTEGER,
+            labels_json TEXT,
+            latitude REAL,
+            longitude REAL,
+            FOREIGN KEY(reporter_id) REFERENCES users(user_id),
+            FOREIGN KEY(cleaner_id) REFERENCES users(user_id)
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS reward_redemptions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            wallet_type TEXT NOT NULL,
+            full_name TEXT NOT NULL,
+            phone TEXT NOT NULL,
+            points INTEGER NOT NULL,       -- jumlah poin yang diredeem
+            amount INTEGER NOT NULL,       -- jumlah rupiah (saat ini = points)
+            status TEXT NOT NULL DEFAULT 'PENDING',
+            requested_at TEXT NOT NULL,
+            reason TEXT DEFAULT NULL,
+            FOREIGN KEY(user_id) REFERENCES users(user_id)
+        )
+        """
+    )
+    _add_column(conn, "reward_redemptions", "reason", "TEXT DEFAULT NULL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS uploads (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            location TEXT,
+            timestamp TEXT,
+            filename TEXT,
+            result_image TEXT,
+            num_objects INTEGER,
+            points INTEGER,
+            labels_json TEXT
+        )
+        """
+    )
+
+
+def _m002_detection_tables(conn):
+    # antrian job deteksi YOLO (BEFORE / AFTER), dikerjakan oleh worker
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS detection_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bounty_id INTEGER NOT NULL,
+            user_id TEXT NOT NULL,
+            phase TEXT NOT NULL,            -- BEFORE, AFTER
+            image_filename TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'QUEUED',  -- QUEUED, RUNNING, DONE, FAILED
+            attempts INTEGER NOT NULL DEFAULT 0,
+            result_json TEXT,
+            error TEXT,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT,
+            FOREIGN KEY(bounty_id) REFERENCES bounties(id)
+        )
+        """
+    )
+
+    # file upload berbasis hash konten (lihat dedup.py)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS stored_images (
+            sha256 TEXT PRIMARY KEY,
+            filename TEXT NOT NULL,
+            phash TEXT,                     -- dHash 64-bit (hex)
+            phash_b0 INTEGER,               -- 4 band 16-bit untuk cari kandidat mirip
+            phash_b1 INTEGER,
+            phash_b2 INTEGER,
+            phash_b3 INTEGER,
+            first_bounty_id INTEGER,
+            created_at TEXT NOT NULL
+        )
+        """
+    )
+    for band in range(4):
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_stored_images_phash_b{band} "
+            f"ON stored_images(phash_b{band})"
+        )
+
+    # cache hasil deteksi per (gambar, versi model, imgsz), dibatasi LRU
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS detection_cache (
+            sha256 TEXT NOT NULL,
+            model_version TEXT NOT NULL,
+            imgsz INTEGER NOT NULL,
+            detections_json TEXT NOT NULL,
+            annotated_image TEXT,
+            created_at TEXT NOT NULL,
+            last_used_at TEXT NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (sha256, model_version, imgsz)
+        )
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_detection_cache_last_used "
+        "ON detection_cache(last_used_at)"
+    )
+
+    # foto yang sama / hampir sama dengan bounty lain (kemungkinan fraud)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS fraud_flags (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bounty_id INTEGER NOT NULL,
+            user_id TEXT NOT NULL,
+            phase TEXT NOT NULL,            -- BEFORE, AFTER
+            kind TEXT NOT NULL,             -- EXACT, PERCEPTUAL
+            sha256 TEXT NOT NULL,
+            matched_sha256 TEXT NOT NULL,
+            matched_bounty_id INTEGER,
+            distance INTEGER NOT NULL,
+            created_at TEXT NOT NULL
+        )
+        """
+    )
+
+
+def _m003_geo_index(conn):
+    """
+    Index spasial R*Tree untuk bounty OPEN (dipakai geo.py).
+    Isinya dirawat trigger: bounty masuk index saat status OPEN dan keluar
+    saat status berubah / dihapus. Kalau SQLite tidak punya modul R*Tree,
+    geo.py memakai filter bounding box biasa.
+    """
+    if _table_exists(conn, "bounty_geo"):
+        return
+
+    try:
+        conn.execute(
+            """
+            CREATE VIRTUAL TABLE bounty_geo USING rtree(
+                id, min_lat, max_lat, min_lon, max_lon
+            )
+            """
+        )
+    except sqlite3.OperationalError as e:
+        print("[WARN] R*Tree tidak tersedia, pencarian bounty tanpa index spasial:", e)
+        return
+
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS bounty_geo_insert AFTER INSERT ON bounties
+        WHEN new.status = 'OPEN'
+             AND new.latitude IS NOT NULL AND new.longitude IS NOT NULL
+        BEGIN
+            INSERT OR REPLACE INTO bounty_geo
+            VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS bounty_geo_update
+        AFTER UPDATE OF status, latitude, longitude ON bounties
+        BEGIN
+            DELETE FROM bounty_geo WHERE id = old.id;
+            INSERT INTO bounty_geo
+            SELECT new.id, new.latitude, new.latitude, new.longitude, new.longitude
+            WHERE new.status = 'OPEN'
+              AND new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS bounty_geo_delete AFTER DELETE ON bounties
+        BEGIN
+            DELETE FROM bounty_geo WHERE id = old.id;
+        END
+        """
+    )
+    conn.execute(
+        """
+        INSERT INTO bounty_geo
+        SELECT id, latitude, latitude, longitude, longitude
+        FROM bounties
+        WHERE status = 'OPEN' AND latitude IS NOT NULL AND longitude IS NOT NULL
+        """
+    )
+
+
+def _m004_ledger(conn):
+    """
+    Ledger poin (lihat ledger.py). Saat tabel baru dibuat, isinya dibangun
+    dari bounty COMPLETED dan riwayat redeem yang sudah ada.
+    """
+    if _table_exists(conn, "point_events"):
+        return
+
+    conn.execute(
+        """
+        CREATE TABLE point_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            delta INTEGER NOT NULL,
+            kind TEXT NOT NULL,     -- BOUNTY_REPORTER, BOUNTY_CLEANER, REDEEM,
+                                    -- REDEEM_REFUND, REDEEM_REINSTATE
+            ref_id INTEGER NOT NULL,  -- id bounty / id reward_redemptions
+            created_at TEXT NOT NULL,
+            UNIQUE (kind, ref_id, user_id)
+        )
+        """
+    )
+    conn.execute("CREATE INDEX idx_point_events_user ON point_events(user_id)")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_balances (
+            user_id TEXT PRIMARY KEY,
+            balance INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT
+        )
+        """
+    )
+
+    # isi awal dari data sumber, ditulis langsung di SQL supaya hasil migrasi
+    # ini tidak ikut berubah kalau ledger.py berubah
+    from datetime import datetime
+
+    now = datetime.utcnow().isoformat()
+    conn.execute(
+        """
+        INSERT OR IGNORE INTO point_events (user_id, delta, kind, ref_id, created_at)
+        SELECT reporter_id, points_reporter, 'BOUNTY_REPORTER', id, ?
+        FROM bounties
+        WHERE status = 'COMPLETED' AND reporter_id IS NOT NULL AND reporter_id != ''
+          AND points_reporter IS NOT NULL AND points_reporter != 0
+        """,
+        (now,),
+    )
+    conn.execute(
+        """
+        INSERT OR IGNORE INTO point_events (user_id, delta, kind, ref_id, created_at)
+        SELECT cleaner_id, points_cleaner, 'BOUNTY_CLEANER', id, ?
+        FROM bounties
+        WHERE status = 'COMPLETED' AND cleaner_id IS NOT NULL AND cleaner_id != ''
+          AND points_cleaner IS NOT NULL AND points_cleaner != 0
+        """,
+        (now,),
+    )
+    conn.execute(
+        """
+        INSERT OR IGNORE INTO point_events (user_id, delta, kind, ref_id, created_at)
+        SELECT user_id, -points, 'REDEEM', id, ?
+        FROM reward_redemptions
+        WHERE user_id IS NOT NULL AND user_id != '' AND points != 0
+        """,
+        (now,),
+    )
+    # redeem yang tidak lagi PENDING / APPROVED / PAID: poin dikembalikan
+    conn.execute(
+        """
+        INSERT OR IGNORE INTO point_events (user_id, delta, kind, ref_id, created_at)
+        SELECT user_id, points, 'REDEEM_REFUND', id, ?
+        FROM reward_redemptions
+        WHERE user_id IS NOT NULL AND user_id != '' AND points != 0
+          AND status NOT IN ('PENDING', 'APPROVED', 'PAID')
+        """,
+        (now,),
+    )
+    conn.execute(
+        """
+        INSERT INTO user_balances (user_id, balance, updated_at)
+        SELECT user_id, SUM(delta), ? FROM point_events GROUP BY user_id
+        """,
+        (now,),
+    )
+
+
+def _m005_sortable_timestamps_and_indexes(conn):
+    """
+    Kolom *_ts berformat 'YYYY-MM-DD HH:MM:SS' (diisi trigger dari kolom
+    timestamp aslinya) supaya ORDER BY bisa memakai index, lalu index untuk
+    query yang sering dipakai.
+    """
+    for column in ("created_ts", "claimed_ts", "completed_ts"):
+        _add_column(conn, "bounties", column, "TEXT")
+    _add_column(conn, "reward_redemptions", "requested_ts", "TEXT")
+
+    bounty_ts = f"""
+        created_ts = {_sortable('created_at')},
+        claimed_ts = {_sortable('claimed_at')},
+        completed_ts = {_sortable('completed_at')}
+    """
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS bounties_ts_insert AFTER INSERT ON bounties
+        BEGIN
+            UPDATE bounties SET {bounty_ts} WHERE id = new.id;
+        END
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS bounties_ts_update
+        AFTER UPDATE OF created_at, claimed_at, completed_at ON bounties
+        BEGIN
+            UPDATE bounties SET {bounty_ts} WHERE id = new.id;
+        END
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS reward_redemptions_ts_insert
+        AFTER INSERT ON reward_redemptions
+        BEGIN
+            UPDATE reward_redemptions SET requested_ts = {_sortable('requested_at')}
+            WHERE id = new.id;
+        END
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS reward_redemptions_ts_update
+        AFTER UPDATE OF requested_at ON reward_redemptions
+        BEGIN
+            UPDATE reward_redemptions SET requested_ts = {_sortable('requested_at')}
+            WHERE id = new.id;
+        END
+        """
+    )
+    conn.execute(f"UPDATE bounties SET {bounty_ts}")
+    conn.execute(
+        f"UPDATE reward_redemptions SET requested_ts = {_sortable('requested_at')}"
+    )
+
+    for sql in (
+        # bounty milik reporter / cleaner per status
+        "CREATE INDEX IF NOT EXISTS idx_bounties_status_reporter "
+        "ON bounties(status, reporter_id)",
+        "CREATE INDEX IF NOT EXISTS idx_bounties_status_cleaner "
+        "ON bounties(status, cleaner_id, claimed_ts)",
+        # riwayat redeem user (halaman reward) + SUM poin per status (ledger)
+        "CREATE INDEX IF NOT EXISTS idx_reward_redemptions_user_status "
+        "ON reward_redemptions(user_id, status, points)",
+        "CREATE INDEX IF NOT EXISTS idx_reward_redemptions_user_requested "
+        "ON reward_redemptions(user_id, requested_ts)",
+        # daftar redeem admin
+        "CREATE INDEX IF NOT EXISTS idx_reward_redemptions_requested "
+        "ON reward_redemptions(requested_ts)",
+        # antrian job deteksi
+        "CREATE INDEX IF NOT EXISTS idx_detection_jobs_status "
+        "ON detection_jobs(status, id)",
+    ):
+        conn.execute(sql)
+
+
+def _m006_job_image_sha(conn):
+    """sha256 gambar disimpan di job, supaya worker tidak perlu hash ulang file."""
+    _add_column(conn, "detection_jobs", "image_sha256", "TEXT")
+
+
+def _m007_detections(conn):
+    """
+    Satu baris per kotak deteksi (lihat detections.py). Bounty lama diisi
+    dari labels_json (tanpa class id / versi model).
+    """
+    import json
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS detections (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bounty_id INTEGER NOT NULL,
+            phase TEXT NOT NULL,            -- BEFORE, AFTER
+            job_id INTEGER,
+            class_id INTEGER,
+            label TEXT NOT NULL,
+            confidence REAL NOT NULL,       -- 0..1
+            x1 REAL, y1 REAL, x2 REAL, y2 REAL,  -- ternormalisasi 0..1
+            model_version TEXT NOT NULL,
+            FOREIGN KEY(bounty_id) REFERENCES bounties(id)
+        )
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_detections_bounty "
+        "ON detections(bounty_id, phase)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_detections_label "
+        "ON detections(phase, label, confidence)"
+    )
+
+    rows = []
+    for bounty in conn.execute(
+        "SELECT id, labels_json FROM bounties WHERE labels_json IS NOT NULL "
+        "AND labels_json NOT IN ('', '[]')"
+    ).fetchall():
+        try:
+            labels = json.loads(bounty[1])
+        except ValueError:
+            continue
+        for det in labels:
+            box = det.get("box") or (None, None, None, None)
+            rows.append(
+                (
+                    bounty[0],
+                    det.get("class_id"),
+                    det["label"],
+                    det.get("confidence", 0) / 100,
+                    *box,
+                )
+            )
+    conn.executemany(
+        """
+        INSERT INTO detections
+            (bounty_id, phase, class_id, label, confidence, x1, y1, x2, y2,
+             model_version)
+        VALUES (?, 'BEFORE', ?, ?, ?, ?, ?, ?, ?, 'legacy')
+        """,
+        rows,
+    )
+
+
+def _m008_rescore(conn):
+    """Checkpoint + hasil re-scoring offline per versi model (lihat rescore.py)."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS rescore_runs (
+            model_version TEXT PRIMARY KEY,
+            backend TEXT NOT NULL,
+            model_path TEXT NOT NULL,
+            imgsz INTEGER NOT NULL,
+            started_at TEXT NOT NULL,
+            finished_at TEXT
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS rescore_results (
+            model_version TEXT NOT NULL,
+            bounty_id INTEGER NOT NULL,
+            phase TEXT NOT NULL,            -- BEFORE, AFTER
+            image_filename TEXT NOT NULL,
+            status TEXT NOT NULL,           -- DONE, MISSING, ERROR
+            detections_json TEXT,
+            num_objects INTEGER,
+            points INTEGER,
+            error TEXT,
+            scored_at TEXT NOT NULL,
+            PRIMARY KEY (model_version, bounty_id, phase)
+        )
+        """
+    )
+
+
+def _m009_redemption_summary(conn):
+    """
+    Ringkasan redeem per (hari, status, e-wallet), dijaga trigger, supaya
+    halaman admin bisa menampilkan jumlah tanpa COUNT(*) ke seluruh tabel
+    (lihat redemptions.py). Ditambah index untuk filter + keyset pagination.
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS redemption_summary (
+            day TEXT NOT NULL,              -- 'YYYY-MM-DD' dari requested_at
+            status TEXT NOT NULL,
+            wallet_type TEXT NOT NULL,
+            n INTEGER NOT NULL,
+            points INTEGER NOT NULL,
+            PRIMARY KEY (day, status, wallet_type)
+        ) WITHOUT ROWID
+        """
+    )
+
+    def add(row, sign):
+        return f"""
+            INSERT INTO redemption_summary (day, status, wallet_type, n, points)
+            VALUES (COALESCE(substr({_sortable(row + '.requested_at')}, 1, 10), ''),
+                    {row}.status, {row}.wallet_type, {sign}1, {sign}{row}.points)
+            ON CONFLICT (day, status, wallet_type) DO UPDATE
+            SET n = n + excluded.n, points = points + excluded.points;
+        """
+
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS reward_redemptions_summary_insert
+        AFTER INSERT ON reward_redemptions
+        BEGIN
+            {add('new', '+')}
+        END
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS reward_redemptions_summary_update
+        AFTER UPDATE OF status, wallet_type, points, requested_at ON reward_redemptions
+        BEGIN
+            {add('old', '-')}
+            {add('new', '+')}
+        END
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS reward_redemptions_summary_delete
+        AFTER DELETE ON reward_redemptions
+        BEGIN
+            {add('old', '-')}
+        END
+        """
+    )
+    conn.execute("DELETE FROM redemption_summary")
+    conn.execute(
+        """
+        INSERT INTO redemption_summary (day, status, wallet_type, n, points)
+        SELECT COALESCE(substr(requested_ts, 1, 10), ''), status, wallet_type,
+               COUNT(*), SUM(points)
+        FROM reward_redemptions
+        GROUP BY 1, 2, 3
+        """
+    )
+
+    for sql in (
+        # filter status / e-wallet di daftar redeem admin, urut requested_ts
+        "CREATE INDEX IF NOT EXISTS idx_reward_redemptions_status_requested "
+        "ON reward_redemptions(status, requested_ts)",
+        "CREATE INDEX IF NOT EXISTS idx_reward_redemptions_wallet_requested "
+        "ON reward_redemptions(wallet_type, requested_ts)",
+    ):
+        conn.execute(sql)
+
+
+def _m010_payout_batches(conn):
+    """Batch pembayaran redeem per e-wallet (lihat payouts.py)."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS payout_batches (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            wallet_type TEXT NOT NULL,
+            created_by TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            num_items INTEGER NOT NULL,
+            total_amount INTEGER NOT NULL,
+            applied_at TEXT,                -- terakhir file rekonsiliasi diterapkan
+            num_paid INTEGER NOT NULL DEFAULT 0,
+            num_failed INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    _add_column(conn, "reward_redemptions", "payout_batch_id", "INTEGER")
+    for sql in (
+        # redeem PENDING per e-wallet yang belum masuk batch
+        "CREATE INDEX IF NOT EXISTS idx_reward_redemptions_payout "
+        "ON reward_redemptions(status, wallet_type, payout_batch_id)",
+        "CREATE INDEX IF NOT EXISTS idx_reward_redemptions_batch "
+        "ON reward_redemptions(payout_batch_id, status)",
+    ):
+        conn.execute(sql)
+
+
+def _m011_notifications(conn):
+    """Outbox notifikasi (WhatsApp), dikirim dispatcher di notifications.py."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel TEXT NOT NULL,          -- whatsapp
+            recipient TEXT NOT NULL,
+            body TEXT NOT NULL,
+            kind TEXT,                      -- REGISTER, ...
+            status TEXT NOT NULL,           -- QUEUED, SENDING, SENT, FAILED, SKIPPED
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at TEXT NOT NULL,
+            last_error TEXT,
+            provider_id TEXT,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            sent_at TEXT
+        )
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_notifications_status_next "
+        "ON notifications(status, next_attempt_at)"
+    )
+
+
+def _m012_login_attempts(conn):
+    """Jejak percobaan login untuk rate limiter sliding window (login_throttle.py)."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS login_attempts (
+            key TEXT NOT NULL,              -- user:<user_id> / ip:<alamat>
+            ts REAL NOT NULL                -- unix time
+        )
+        """
+    )
+    for sql in (
+        "CREATE INDEX IF NOT EXISTS idx_login_attempts_key_ts ON login_attempts(key, ts)",
+        # hapus jejak kedaluwarsa
+        "CREATE INDEX IF NOT EXISTS idx_login_attempts_ts ON login_attempts(ts)",
+    ):
+        conn.execute(sql)
+
+
+def _m013_job_next_attempt(conn):
+    """
+    Job deteksi yang dicoba ulang (gagal / file upload belum ada) baru
+    diambil lagi setelah next_attempt_at. Baris lama: '' = langsung.
+    """
+    _add_column(conn, "detection_jobs", "next_attempt_at", "TEXT NOT NULL DEFAULT ''")
+
+
+MIGRATIONS = [
+    (1, "base tables", _m001_base_tables),
+    (2, "detection tables", _m002_detection_tables),
+    (3, "geo index", _m003_geo_index),
+    (4, "points ledger", _m004_ledger),
+    (5, "sortable timestamps + indexes", _m005_sortable_timestamps_and_indexes),
+    (6, "detection job image sha256", _m006_job_image_sha),
+    (7, "detections table", _m007_detections),
+    (8, "rescore checkpoint", _m008_rescore),
+    (9, "redemption summary", _m009_redemption_summary),
+    (10, "payout batches", _m010_payout_batches),
+    (11, "notification outbox", _m011_notifications),
+    (12, "login attempts", _m012_login_attempts),
+    (13, "detection job retry delay", _m013_job_next_attempt),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """
+    Jalankan migrasi yang belum diterapkan. Tiap migrasi satu transaksi
+    (BEGIN IMMEDIATE, jadi proses lain yang memanggil init_db bersamaan
+    menunggu lalu melihat versi terbaru). Return list versi yang dijalankan.
+    """
+    applied = []
+    for version, name, func in MIGRATIONS:
+        if schema_version(conn) >= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            func(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"[INFO] Migrasi {version} ({name}) diterapkan")
+        applied.append(version)
+    return applied
+
+
+# ---------- Cek query plan ----------
+
+def hot_queries(conn):
+    """
+    {nama: (sql, params contoh)} query yang sering dijalankan. SQL-nya
+    diambil dari modul yang menjalankannya, jadi yang dicek selalu query
+    yang sama dengan yang dipakai app.
+    """
+    from detections import LOAD_DETECTIONS_SQL, label_counts_query
+    from geo import BOX_CANDIDATES_SQL, GEO_CANDIDATES_SQL
+    from jobs import CLAIM_JOB_SQL, PENDING_JOBS_SQL
+    from ledger import BALANCE_SQL
+    from login_throttle import COUNT_ATTEMPTS_SQL, PRUNE_ATTEMPTS_SQL
+    from notifications import CLAIM_MESSAGE_SQL, PENDING_MESSAGES_SQL
+    from redemptions import counts_query, page_query, parse_filters
+    from rescore import DONE_RESULTS_SQL
+    from routes_bounty import MY_CLAIMED_SQL
+    from user_context import RECENT_REDEMPTIONS, RECENT_REDEMPTIONS_SQL
+
+    cursor = ("2025-01-01 00:00:00", 1)
+    by_status = parse_filters(
+        {"status": "PENDING", "date_from": "2025-01-01", "date_to": "2025-01-31"}
+    )
+    by_wallet = parse_filters({"wallet": "DANA"})
+    box = (0.0, 1.0, 0.0, 1.0)
+
+    queries = {
+        "riwayat redeem user": (RECENT_REDEMPTIONS_SQL, ("u", RECENT_REDEMPTIONS)),
+        "daftar redeem admin": page_query(parse_filters({}), before=cursor),
+        "daftar redeem admin per status": page_query(by_status),
+        "daftar redeem admin per e-wallet": page_query(by_wallet, after=cursor),
+        "jumlah redeem per status": counts_query(by_status),
+        "bounty CLAIMED milik cleaner": (MY_CLAIMED_SQL, ("u",)),
+        "bounty OPEN tanpa R*Tree": (BOX_CANDIDATES_SQL, ("u",) + box),
+        "saldo user": (BALANCE_SQL, ("u",)),
+        "ambil job QUEUED": (CLAIM_JOB_SQL, ("20250101_000000",)),
+        "deteksi satu bounty": (LOAD_DETECTIONS_SQL, (1, "BEFORE")),
+        "statistik label": label_counts_query("BEFORE"),
+        "hitung job pending": (PENDING_JOBS_SQL, ()),
+        "ambil notifikasi yang jatuh tempo": (CLAIM_MESSAGE_SQL, ("20250101_000000",)),
+        "hitung notifikasi pending": (PENDING_MESSAGES_SQL, ()),
+        "checkpoint rescore": (DONE_RESULTS_SQL, ("v", 1, 100)),
+        "hitung percobaan login dalam window": (COUNT_ATTEMPTS_SQL, ("user:x", 0.0)),
+        "hapus percobaan login kedaluwarsa": (PRUNE_ATTEMPTS_SQL, (0.0,)),
+    }
+    if _table_exists(conn, "bounty_geo"):
+        queries["bounty OPEN lewat R*Tree"] = (GEO_CANDIDATES_SQL, box + ("u",))
+    return queries
+
+
+def _plan_problems(plan):
+    """Baris plan yang berarti full scan tabel atau sort tanpa index."""
+    problems = []
+    for row in plan:
+        detail = row[3]
+        if detail.startswith("SCAN") and not any(
+            ok in detail for ok in ("USING INDEX", "USING COVERING INDEX", "VIRTUAL TABLE")
+        ):
+            problems.append(detail)
+        elif "USE TEMP B-TREE" in detail:
+            problems.append(detail)
+    return problems
+
+
+def check_query_plans(conn):
+    """Return dict {nama query: [masalah]} untuk query yang tidak memakai index."""
+    failures = {}
+    for name, (sql, params) in hot_queries(conn).items():
+        plan = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+        problems = _plan_problems(plan)
+        if problems:
+            failures[name] = problems
+    return failures
+
+
+if __name__ == "__main__":
+    from db import get_db_connection, init_db
+
+    init_db()
+    conn = get_db_connection()
+    print(f"Versi skema: {schema_version(conn)} (terbaru {LATEST_VERSION})")
+
+    if len(sys.argv) > 1 and sys.argv[1] == "check":
+        failures = check_query_plans(conn)
+        num_queries = len(hot_queries(conn))
+        conn.close()
+        for name, problems in failures.items():
+            print(f"[FAIL] {name}:")
+            for detail in problems:
+                print(f"    {detail}")
+        if failures:
+            sys.exit(1)
+        print(f"Semua {num_queries} query memakai index.")
+    else:
+        conn.close()
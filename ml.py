@@ -1,4 +1,184 @@
-from ultralytics import YOLO
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
 
-# Model YOLO global, di-import satu kali
-model = YOLO("best.pt")
+import metrics
+from detectors import load_detector
+from startup import timed
+from utils import parse_detections
+
+# Model global, dimuat sekali saat pertama dipakai (lihat get_model).
+# Backend (ultralytics / onnx) dipilih lewat DETECTOR_BACKEND, lihat detectors.py
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """
+    Model per proses, dimuat malas (lazy) dan thread-safe.
+    Import ml.py tidak lagi memuat torch/ultralytics maupun best.pt.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                with timed("load model detector"):
+                    _model = load_detector()
+    return _model
+
+
+def warmup(imgsizes=(736,), background=True):
+    """
+    Muat model dan jalankan satu inference dummy per imgsz supaya request
+    pertama tidak menanggung biaya load + inisialisasi runtime.
+    """
+
+    def _run():
+        import numpy as np
+
+        model = get_model()
+        for imgsz in imgsizes:
+            with timed(f"warmup inference imgsz={imgsz}"):
+                model.predict(
+                    np.zeros((imgsz, imgsz, 3), dtype=np.uint8),
+                    imgsz=imgsz,
+                    save=False,
+                    verbose=False,
+                )
+
+    if not background:
+        _run()
+        return None
+    t = threading.Thread(target=_run, name="model-warmup", daemon=True)
+    t.start()
+    return t
+
+
+class InferenceQueueFull(Exception):
+    """Antrian inference penuh; pemanggil sebaiknya menolak / mencoba lagi nanti."""
+
+
+class BatchingInferenceEngine:
+    """
+    Micro-batching di sekitar satu model per proses.
+
+    Request dari banyak thread dikumpulkan paling lama `max_wait_ms`
+    atau sampai `max_batch_size` gambar, lalu dijalankan sebagai satu
+    `predict` ber-batch. Hanya thread batcher yang memanggil model,
+    jadi predictor ultralytics tidak pernah dipakai paralel.
+    """
+
+    def __init__(self, model_loader, max_batch_size=8, max_wait_ms=10, max_queue=64):
+        # callable yang mengembalikan model, dipanggil di thread batcher
+        self.model_loader = model_loader
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {"batches": 0, "images": 0, "rejected": 0}
+
+    def submit(self, image, imgsz=736, **options):
+        """
+        Masukkan satu gambar ke antrian, return Future berisi hasil YOLO.
+        options (conf, max_det, classes) diteruskan ke model.predict.
+        """
+        self._ensure_started()
+        fut = Future()
+        # satu predict hanya bisa memakai satu imgsz + options
+        key = (imgsz, tuple(sorted(options.items())))
+        try:
+            self._queue.put_nowait((image, key, fut))
+        except queue.Full:
+            self.stats["rejected"] += 1
+            raise InferenceQueueFull(
+                f"antrian inference penuh ({self._queue.maxsize} gambar)"
+            )
+        return fut
+
+    def predict(self, image, imgsz=736, timeout=None, **options):
+        return self.submit(image, imgsz, **options).result(timeout)
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="inference-batcher", daemon=True
+                )
+                self._thread.start()
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+
+            groups = {}
+            for image, key, fut in batch:
+                if fut.set_running_or_notify_cancel():
+                    groups.setdefault(key, []).append((image, fut))
+
+            for key, items in groups.items():
+                self._run_batch(key, items)
+
+    def _run_batch(self, key, items):
+        imgsz, options = key
+        images = [image for image, _ in items]
+        try:
+            model = self.model_loader()
+            with metrics.span("inference"):
+                results = model.predict(
+                    images, imgsz=imgsz, save=False, verbose=False, **dict(options)
+                )
+            metrics.inc("model_calls_total", source="batching")
+            metrics.inc("model_images_total", len(images), source="batching")
+        except Exception as e:
+            for _, fut in items:
+                fut.set_exception(e)
+            return
+
+        self.stats["batches"] += 1
+        self.stats["images"] += len(items)
+        for (_, fut), result in zip(items, results):
+            fut.set_result(result)
+
+
+# Batas antrian & ukuran batch bisa diatur lewat environment variable
+engine = BatchingInferenceEngine(
+    get_model,
+    max_batch_size=int(os.environ.get("INFERENCE_MAX_BATCH", "8")),
+    max_wait_ms=float(os.environ.get("INFERENCE_MAX_WAIT_MS", "10")),
+    max_queue=int(os.environ.get("INFERENCE_MAX_QUEUE", "64")),
+)
+metrics.register_gauge(
+    "inference_queue_depth", "Gambar menunggu di engine batching", engine.queue_depth
+)
+
+
+def run_detection(image_path, imgsz=736, **options):
+    """
+    Jalankan YOLO pada satu gambar lewat engine batching; return list deteksi.
+    Gambar annotated dibuat terpisah dari kotak tersimpan (annotate.py).
+    options: conf, max_det, classes (lihat detect_settings.py).
+    Melempar InferenceQueueFull kalau antrian penuh.
+    """
+    result = engine.predict(image_path, imgsz=imgsz, **options)
+    return parse_detections(result)
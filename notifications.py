@@ -0,0 +1,387 @@
+"""
+Outbox notifikasi WhatsApp.
+
+Request (registrasi, nanti juga bounty diklaim / selesai) cukup memanggil
+enqueue_whatsapp(conn, phone, text) di transaksinya sendiri. Dispatcher
+(thread di proses Flask, atau proses terpisah via `python notifications.py`)
+mengirim pesan lewat REST API Twilio:
+
+- satu requests.Session dipakai ulang oleh semua thread (koneksi keep-alive)
+- NOTIFY_WORKERS thread pengirim = batas request bersamaan ke Twilio
+- rate limit NOTIFY_RATE_PER_SEC pesan per detik (default 5)
+- gagal sementara (jaringan, HTTP 429, 5xx) dicoba lagi dengan backoff
+  eksponensial + jitter sampai NOTIFY_MAX_ATTEMPTS kali; 4xx lain langsung
+  FAILED
+- Twilio belum dikonfigurasi (TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN,
+  TWILIO_WHATSAPP_FROM): pesan ditandai SKIPPED, tidak dikirim
+
+TWILIO_API_BASE (default https://api.twilio.com) bisa diarahkan ke stub
+lokal, lihat benchmarks/twilio_stub.py.
+
+    python notifications.py [jumlah_thread]   # dispatcher terpisah
+    python notifications.py status            # jumlah pesan per status
+"""
+import os
+import time
+import random
+import threading
+from datetime import datetime, timedelta
+
+from db import get_db_connection, init_db
+from metrics import describe, inc, register_gauge, span
+
+TIME_FORMAT = "%Y%m%d_%H%M%S"
+
+MAX_ATTEMPTS = int(os.environ.get("NOTIFY_MAX_ATTEMPTS", "5"))
+BACKOFF_SECONDS = float(os.environ.get("NOTIFY_BACKOFF_SECONDS", "5"))
+BACKOFF_MAX_SECONDS = 3600
+
+# pesan SENDING lebih lama dari ini dianggap dispatcher-nya mati
+STALE_AFTER_SECONDS = 120
+
+_new_message_event = threading.Event()
+
+
+def _now():
+    return datetime.now().strftime(TIME_FORMAT)
+
+
+def enqueue_whatsapp(conn, phone, text, kind=None):
+    """
+    Masukkan pesan WhatsApp ke outbox. Memakai koneksi pemanggil supaya satu
+    transaksi dengan perubahan sumbernya; commit oleh pemanggil.
+    phone harus sudah termasuk kode negara, misal +62812xxxxxxx.
+    """
+    now = _now()
+    cur = conn.execute(
+        """
+        INSERT INTO notifications
+            (channel, recipient, body, kind, status, next_attempt_at, created_at)
+        VALUES ('whatsapp', ?, ?, ?, 'QUEUED', ?, ?)
+        """,
+        (phone, text, kind, now, now),
+    )
+    _new_message_event.set()
+    return cur.lastrowid
+
+
+PENDING_MESSAGES_SQL = """
+    SELECT COUNT(*) AS n FROM notifications
+    WHERE status IN ('QUEUED', 'SENDING')
+"""
+
+CLAIM_MESSAGE_SQL = """
+    SELECT * FROM notifications
+    WHERE status = 'QUEUED' AND next_attempt_at <= ?
+    ORDER BY next_attempt_at, id
+    LIMIT 1
+"""
+
+
+def count_pending_notifications():
+    conn = get_db_connection()
+    row = conn.execute(PENDING_MESSAGES_SQL).fetchone()
+    conn.close()
+    return row["n"]
+
+
+describe("notifications_total", "Percobaan kirim notifikasi per hasil")
+register_gauge(
+    "notifications_pending", "Notifikasi QUEUED + SENDING", count_pending_notifications
+)
+
+
+def claim_next_message():
+    """Ambil satu pesan QUEUED yang sudah jatuh tempo, tandai SENDING (atomik)."""
+    conn = get_db_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        msg = conn.execute(CLAIM_MESSAGE_SQL, (_now(),)).fetchone()
+        if msg:
+            conn.execute(
+                """
+                UPDATE notifications
+                SET status = 'SENDING', started_at = ?, attempts = attempts + 1
+                WHERE id = ?
+                """,
+                (_now(), msg["id"]),
+            )
+        conn.commit()
+    finally:
+        conn.close()
+    return msg
+
+
+def requeue_stale_messages(stale_after=STALE_AFTER_SECONDS):
+    """
+    Kembalikan pesan SENDING yang macet (dispatcher crash) ke antrian.
+    Percobaan yang macet sudah terhitung di attempts (dinaikkan saat claim),
+    jadi pesan yang selalu membuat dispatcher crash berhenti di FAILED
+    setelah MAX_ATTEMPTS, tidak diulang terus.
+    """
+    cutoff = (datetime.now() - timedelta(seconds=stale_after)).strftime(TIME_FORMAT)
+    conn = get_db_connection()
+    cur = conn.execute(
+        """
+        UPDATE notifications
+        SET status = CASE WHEN attempts >= ? THEN 'FAILED' ELSE 'QUEUED' END,
+            last_error = 'macet saat dikirim (dispatcher berhenti)',
+            next_attempt_at = ?
+        WHERE status = 'SENDING' AND started_at < ?
+        """,
+        (MAX_ATTEMPTS, _now(), cutoff),
+    )
+    conn.commit()
+    conn.close()
+    return cur.rowcount
+
+
+def _finish(msg_id, status, error=None, provider_id=None, next_attempt_at=None):
+    conn = get_db_connection()
+    conn.execute(
+        """
+        UPDATE notifications
+        SET status = ?, last_error = ?, provider_id = ?,
+            next_attempt_at = COALESCE(?, next_attempt_at),
+            sent_at = CASE WHEN ? = 'SENT' THEN ? ELSE sent_at END
+        WHERE id = ?
+        """,
+        (status, error, provider_id, next_attempt_at, status, _now(), msg_id),
+    )
+    conn.commit()
+    conn.close()
+
+
+def backoff_delay(attempts, retry_after=None):
+    """Detik sebelum percobaan berikutnya: eksponensial + jitter, minimal Retry-After."""
+    delay = min(BACKOFF_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+    delay *= random.uniform(0.5, 1.0)
+    if retry_after:
+        delay = max(delay, retry_after)
+    return delay
+
+
+# ---------- Twilio ----------
+
+
+class SendError(Exception):
+    """Pengiriman gagal; retry=True kalau layak dicoba lagi."""
+
+    def __init__(self, message, retry, retry_after=None, status=None):
+        super().__init__(message)
+        self.retry = retry
+        self.retry_after = retry_after
+        self.status = status  # kode HTTP, None kalau gagal di jaringan
+
+
+class TwilioClient:
+    """REST API Messages Twilio lewat satu requests.Session yang dipakai ulang."""
+
+    def __init__(self, account_sid, auth_token, from_whatsapp, api_base=None,
+                 pool_size=4, timeout=10):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.from_whatsapp = from_whatsapp
+        self.timeout = timeout
+        api_base = (api_base or "https://api.twilio.com").rstrip("/")
+        self.url = f"{api_base}/2010-04-01/Accounts/{account_sid}/Messages.json"
+        self.session = requests.Session()
+        self.session.auth = (account_sid, auth_token)
+        # satu koneksi keep-alive per thread pengirim
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @classmethod
+    def from_env(cls, pool_size=4):
+        """None kalau variabel TWILIO_* belum lengkap."""
+        account_sid = os.environ.get("TWILIO_ACCOUNT_SID")
+        auth_token = os.environ.get("TWILIO_AUTH_TOKEN")
+        from_whatsapp = os.environ.get("TWILIO_WHATSAPP_FROM")
+        if not all([account_sid, auth_token, from_whatsapp]):
+            return None
+        return cls(
+            account_sid,
+            auth_token,
+            from_whatsapp,
+            api_base=os.environ.get("TWILIO_API_BASE"),
+            pool_size=pool_size,
+        )
+
+    def send(self, phone, text):
+        """Kirim satu pesan; return sid pesan dari Twilio, atau lempar SendError."""
+        import requests
+
+        try:
+            resp = self.session.post(
+                self.url,
+                data={"From": self.from_whatsapp, "To": f"whatsapp:{phone}", "Body": text},
+                timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            raise SendError(str(e), retry=True)
+        if resp.status_code in (200, 201):
+            return resp.json().get("sid")
+
+        retry_after = resp.headers.get("Retry-After", "")
+        raise SendError(
+            f"HTTP {resp.status_code}: {resp.text[:200]}",
+            retry=resp.status_code == 429 or resp.status_code >= 500,
+            retry_after=float(retry_after) if retry_after.isdigit() else None,
+            status=resp.status_code,
+        )
+
+
+class RateLimiter:
+    """Maksimal `rate` panggilan acquire() per detik, dibagi rata antar thread."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+# ---------- Dispatcher ----------
+
+
+class NotificationDispatcher:
+    """
+    Thread pengirim yang menguras outbox. Pengambilan pesan atomik, jadi
+    beberapa dispatcher (beberapa proses) boleh berjalan bersamaan.
+    """
+
+    def __init__(self, num_workers=2, rate_per_sec=5.0, poll_interval=1.0, client=None):
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+        self.client = client
+        self.rate_limiter = RateLimiter(rate_per_sec)
+        self._stop = threading.Event()
+        self._threads = []
+        self._stale_lock = threading.Lock()
+        self._last_stale_check = 0.0
+
+    def start(self):
+        if self.client is None:
+            print(
+                "[INFO] WhatsApp belum dikonfigurasi (TWILIO_*); "
+                "notifikasi ditandai SKIPPED tanpa dikirim"
+            )
+        self._requeue_stale()
+        for i in range(self.num_workers):
+            t = threading.Thread(target=self._run, name=f"notify-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        _new_message_event.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def _requeue_stale(self):
+        """requeue_stale_messages paling sering sekali per STALE_AFTER_SECONDS."""
+        now = time.monotonic()
+        with self._stale_lock:
+            if self._last_stale_check and now - self._last_stale_check < STALE_AFTER_SECONDS:
+                return
+            self._last_stale_check = now
+        requeue_stale_messages()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._requeue_stale()
+            msg = claim_next_message()
+            if msg is None:
+                _new_message_event.wait(self.poll_interval)
+                _new_message_event.clear()
+                continue
+            try:
+                self.deliver(msg)
+            except Exception as e:
+                # jangan sampai thread pengirim mati karena satu pesan
+                print(f"[WARN] Notifikasi {msg['id']} gagal diproses:", e)
+                _finish(msg["id"], "FAILED", str(e))
+
+    def deliver(self, msg):
+        if self.client is None:
+            _finish(msg["id"], "SKIPPED", "WhatsApp belum dikonfigurasi")
+            inc("notifications_total", outcome="skipped")
+            return
+
+        self.rate_limiter.acquire()
+        try:
+            with span("notify_send"):
+                sid = self.client.send(msg["recipient"], msg["body"])
+        except SendError as e:
+            # msg dibaca sebelum claim menaikkan attempts
+            attempts = msg["attempts"] + 1
+            if e.retry and attempts < MAX_ATTEMPTS:
+                delay = backoff_delay(attempts, e.retry_after)
+                next_at = (datetime.now() + timedelta(seconds=delay)).strftime(TIME_FORMAT)
+                _finish(msg["id"], "QUEUED", str(e), next_attempt_at=next_at)
+                inc("notifications_total", outcome="retry")
+            else:
+                # isi error bisa memuat nomor tujuan: detailnya hanya di last_error
+                print(
+                    f"[WARN] Notifikasi {msg['id']} gagal dikirim "
+                    f"(HTTP {e.status or '-'}, percobaan {attempts})"
+                )
+                _finish(msg["id"], "FAILED", str(e))
+                inc("notifications_total", outcome="failed")
+            return
+        _finish(msg["id"], "SENT", provider_id=sid)
+        inc("notifications_total", outcome="sent")
+
+
+def make_dispatcher(num_workers):
+    return NotificationDispatcher(
+        num_workers=num_workers,
+        rate_per_sec=float(os.environ.get("NOTIFY_RATE_PER_SEC", "5")),
+        client=TwilioClient.from_env(pool_size=num_workers),
+    )
+
+
+def start_notification_dispatcher(app):
+    """Jalankan dispatcher di proses Flask kalau NOTIFY_WORKERS > 0."""
+    num_workers = app.config.get("NOTIFY_WORKERS", 0)
+    if num_workers <= 0:
+        return None
+    dispatcher = make_dispatcher(num_workers)
+    dispatcher.start()
+    return dispatcher
+
+
+if __name__ == "__main__":
+    import sys
+
+    init_db()
+    if len(sys.argv) > 1 and sys.argv[1] == "status":
+        conn = get_db_connection()
+        for row in conn.execute(
+            "SELECT status, COUNT(*) AS n FROM notifications GROUP BY status ORDER BY status"
+        ):
+            print(f"{row['status']:8s} {row['n']}")
+        conn.close()
+        sys.exit(0)
+
+    num_workers = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    dispatcher = make_dispatcher(num_workers)
+    dispatcher.start()
+    print(f"Dispatcher notifikasi berjalan ({num_workers} thread). Ctrl+C untuk berhenti.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        dispatcher.stop()
@@ -0,0 +1,37 @@
+"""
+Hash password dengan parameter yang bisa diatur.
+
+PASSWORD_HASH_METHOD memakai format method werkzeug, misalnya
+"scrypt:16384:8:1" atau "pbkdf2:sha256:600000" (default "scrypt", yaitu
+scrypt:32768:8:1 bawaan werkzeug). Hash lama tetap bisa dipakai login;
+verify_password memberi tahu kalau hash tersimpan memakai parameter lain,
+lalu login menyimpan ulang hash dengan parameter sekarang (rehash-on-login).
+"""
+import os
+import functools
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from metrics import describe
+
+HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt")
+
+describe("password_rehash_total", "Hash password yang diperbarui saat login")
+
+
+@functools.lru_cache(maxsize=1)
+def _current_prefix():
+    # werkzeug melengkapi parameter default ("scrypt" -> "scrypt:32768:8:1"),
+    # jadi bentuk lengkapnya diambil dari hash sungguhan (sekali per proses)
+    return generate_password_hash("", HASH_METHOD).split("$", 1)[0]
+
+
+def hash_password(password):
+    return generate_password_hash(password, HASH_METHOD)
+
+
+def verify_password(password_hash, password):
+    """Return (cocok, perlu_rehash)."""
+    if not check_password_hash(password_hash, password):
+        return False, False
+    return True, password_hash.split("$", 1)[0] != _current_prefix()
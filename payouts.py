@@ -0,0 +1,258 @@
+"""
+Pembayaran redeem massal per batch.
+
+1. create_batch(): redeem PENDING satu e-wallet yang belum masuk batch
+   dikumpulkan jadi satu batch (kolom reward_redemptions.payout_batch_id).
+2. iter_batch_csv(): file batch untuk diproses di e-wallet, dengan kolom
+   status dan reason kosong. Sel teks dicegah jadi formula spreadsheet,
+   sama seperti export redeem (redemptions._csv_cell).
+3. File yang sama, setelah kolom status diisi PAID / FAILED (atau GAGAL),
+   diterapkan dengan apply_results() dalam satu transaksi: UPDATE lewat
+   executemany dan event ledger lewat ledger.record_events.
+
+Aturan transisi sama seperti admin_update_reward, dicek per baris:
+FAILED hanya dari PENDING (poin dikembalikan), PAID dari status apa pun
+(FAILED -> PAID memotong poin lagi), baris yang sudah berstatus tujuannya
+dilewati, jadi file yang sama aman diterapkan dua kali.
+"""
+import io
+import csv
+from datetime import datetime
+
+from db import get_db_connection
+from ledger import record_events
+from redemptions import _csv_cell
+
+BATCH_MAX_ITEMS = 10000
+
+FILE_COLUMNS = ("id", "wallet_type", "full_name", "phone", "amount", "status", "reason")
+
+# isian kolom status di file rekonsiliasi
+RESULT_STATUSES = {"PAID": "PAID", "FAILED": "FAILED", "GAGAL": "FAILED"}
+
+
+class PayoutFileError(Exception):
+    """File rekonsiliasi tidak bisa dibaca (bukan CSV / kolom wajib tidak ada)."""
+
+
+def _now():
+    return datetime.utcnow().isoformat()
+
+
+def pending_by_wallet(conn):
+    """List (wallet_type, jumlah, total rupiah) redeem PENDING yang belum masuk batch."""
+    return conn.execute(
+        """
+        SELECT wallet_type, COUNT(*) AS n, SUM(amount) AS amount
+        FROM reward_redemptions
+        WHERE status = 'PENDING' AND payout_batch_id IS NULL
+        GROUP BY wallet_type
+        ORDER BY wallet_type
+        """
+    ).fetchall()
+
+
+def recent_batches(conn, limit=20):
+    return conn.execute(
+        "SELECT * FROM payout_batches ORDER BY id DESC LIMIT ?", (limit,)
+    ).fetchall()
+
+
+def get_batch(conn, batch_id):
+    return conn.execute(
+        "SELECT * FROM payout_batches WHERE id = ?", (batch_id,)
+    ).fetchone()
+
+
+def create_batch(conn, wallet_type, created_by, limit=BATCH_MAX_ITEMS):
+    """
+    Masukkan redeem PENDING e-wallet ini (terlama dulu, maksimal `limit`)
+    ke batch baru. Return id batch, atau None kalau tidak ada yang PENDING.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    cur = conn.execute(
+        """
+        INSERT INTO payout_batches
+            (wallet_type, created_by, created_at, num_items, total_amount)
+        VALUES (?, ?, ?, 0, 0)
+        """,
+        (wallet_type, created_by, _now()),
+    )
+    batch_id = cur.lastrowid
+    cur = conn.execute(
+        """
+        UPDATE reward_redemptions SET payout_batch_id = ?
+        WHERE id IN (
+            SELECT id FROM reward_redemptions
+            WHERE status = 'PENDING' AND wallet_type = ? AND payout_batch_id IS NULL
+            ORDER BY id
+            LIMIT ?
+        )
+        """,
+        (batch_id, wallet_type, limit),
+    )
+    if cur.rowcount == 0:
+        conn.rollback()
+        return None
+    conn.execute(
+        """
+        UPDATE payout_batches
+        SET (num_items, total_amount) = (
+            SELECT COUNT(*), SUM(amount) FROM reward_redemptions
+            WHERE payout_batch_id = ?
+        )
+        WHERE id = ?
+        """,
+        (batch_id, batch_id),
+    )
+    conn.commit()
+    return batch_id
+
+
+def iter_batch_csv(batch_id):
+    """Generator isi file batch (CSV) untuk Response streaming."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(FILE_COLUMNS)
+    yield buf.getvalue()
+
+    conn = get_db_connection()
+    try:
+        cur = conn.execute(
+            """
+            SELECT id, wallet_type, full_name, phone, amount
+            FROM reward_redemptions
+            WHERE payout_batch_id = ?
+            ORDER BY id
+            """,
+            (batch_id,),
+        )
+        while True:
+            rows = cur.fetchmany(1000)
+            if not rows:
+                break
+            buf.seek(0)
+            buf.truncate()
+            # nama & nomor HP isian user: dicegah jadi formula spreadsheet
+            writer.writerows([_csv_cell(v) for v in r] + ["", ""] for r in rows)
+            yield buf.getvalue()
+    finally:
+        conn.close()
+
+
+def parse_results(text):
+    """
+    Baca file rekonsiliasi (CSV dengan kolom id dan status, opsional reason).
+    Return (hasil, ditolak): hasil = list (id, status, reason); baris dengan
+    status kosong dilewati (belum diproses).
+    """
+    reader = csv.DictReader(io.StringIO(text))
+    columns = {c.strip().lower() for c in reader.fieldnames or ()}
+    if not {"id", "status"} <= columns:
+        raise PayoutFileError("File harus berupa CSV dengan kolom id dan status.")
+
+    results, rejected = [], []
+    for line, row in enumerate(reader, start=2):
+        row = {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+        if not row["status"]:
+            continue
+        status = RESULT_STATUSES.get(row["status"].upper())
+        if not row["id"].isdigit() or status is None:
+            rejected.append((line, f"id / status tidak valid: {row['id']} {row['status']}"))
+            continue
+        results.append((int(row["id"]), status, row.get("reason") or None))
+    return results, rejected
+
+
+def apply_results(conn, batch_id, results):
+    """
+    Terapkan hasil (id, status, reason) untuk satu batch dalam satu transaksi.
+    Return dict paid, failed, unchanged, rejected (list (id, alasan)).
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            """
+            CREATE TEMP TABLE payout_results (
+                id INTEGER PRIMARY KEY, status TEXT NOT NULL, reason TEXT
+            )
+            """
+        )
+        # id yang muncul dua kali: baris terakhir di file yang berlaku
+        conn.executemany(
+            "INSERT OR REPLACE INTO temp.payout_results (id, status, reason) VALUES (?, ?, ?)",
+            results,
+        )
+        rows = conn.execute(
+            """
+            SELECT t.id, t.status AS new_status, t.reason, r.user_id, r.points,
+                   r.status AS old_status, r.payout_batch_id
+            FROM temp.payout_results t
+            LEFT JOIN reward_redemptions r ON r.id = t.id
+            """
+        ).fetchall()
+        conn.execute("DROP TABLE temp.payout_results")
+
+        paid, failed, events, rejected = [], [], [], []
+        unchanged = 0
+        for row in rows:
+            old, new = row["old_status"], row["new_status"]
+            if row["user_id"] is None:
+                rejected.append((row["id"], "redeem tidak ditemukan"))
+            elif row["payout_batch_id"] != batch_id:
+                rejected.append((row["id"], "bukan bagian dari batch ini"))
+            elif old == new:
+                unchanged += 1
+            elif new == "FAILED":
+                # sama seperti admin_update_reward: FAILED hanya dari PENDING
+                if old != "PENDING":
+                    rejected.append((row["id"], f"tidak bisa FAILED karena status {old}"))
+                    continue
+                failed.append((row["reason"], row["id"]))
+                events.append((row["user_id"], row["points"], "REDEEM_REFUND", row["id"]))
+            else:
+                paid.append((row["id"], old))
+                # FAILED -> PAID: poin yang sudah dikembalikan dipotong lagi
+                if old == "FAILED":
+                    events.append(
+                        (row["user_id"], -row["points"], "REDEEM_REINSTATE", row["id"])
+                    )
+
+        conn.executemany(
+            """
+            UPDATE reward_redemptions SET status = 'PAID', reason = NULL
+            WHERE id = ? AND status = ?
+            """,
+            paid,
+        )
+        conn.executemany(
+            """
+            UPDATE reward_redemptions SET status = 'FAILED', reason = ?
+            WHERE id = ? AND status = 'PENDING'
+            """,
+            failed,
+        )
+        record_events(conn, events)
+        conn.execute(
+            """
+            UPDATE payout_batches
+            SET applied_at = ?,
+                num_paid = (SELECT COUNT(*) FROM reward_redemptions
+                            WHERE payout_batch_id = ? AND status = 'PAID'),
+                num_failed = (SELECT COUNT(*) FROM reward_redemptions
+                              WHERE payout_batch_id = ? AND status = 'FAILED')
+            WHERE id = ?
+            """,
+            (_now(), batch_id, batch_id, batch_id),
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return {
+        "paid": len(paid),
+        "failed": len(failed),
+        "unchanged": unchanged,
+        "rejected": rejected,
+    }
@@ -0,0 +1,191 @@
+"""
+Daftar redeem untuk halaman admin: filter di server, keyset pagination dan
+export CSV yang di-stream.
+
+- Urutan requested_ts DESC, id DESC. Kursor halaman = "requested_ts|id" dari
+  baris terakhir (before, halaman berikutnya) atau pertama (after, halaman
+  sebelumnya), jadi halaman ke-1000 sama murahnya dengan halaman pertama
+  (tanpa OFFSET, memakai index requested_ts / status / wallet_type).
+- Jumlah per status dibaca dari tabel redemption_summary (dijaga trigger,
+  migrasi 9), bukan COUNT(*) ke seluruh reward_redemptions.
+- iter_csv() mengambil baris per potongan dengan kursor yang sama, jadi
+  export berapa pun besarnya tidak pernah menampung semua baris di memori.
+"""
+import io
+import csv
+from datetime import datetime, timedelta
+
+from db import get_db_connection
+
+STATUSES = ("PENDING", "PAID", "FAILED")
+WALLET_TYPES = ("GOPAY", "DANA", "OVO", "SHOPEEPAY", "LINKAJA", "SAKUKU")
+
+PAGE_SIZE = 50
+CSV_CHUNK = 1000
+
+COLUMNS = (
+    "id", "user_id", "wallet_type", "full_name", "phone",
+    "points", "amount", "status", "reason", "requested_at",
+)
+
+
+def _parse_date(text):
+    try:
+        return datetime.strptime(text or "", "%Y-%m-%d")
+    except ValueError:
+        return None
+
+
+def parse_filters(args):
+    """Filter dari query string; nilai yang tidak valid diabaikan (None)."""
+    status = (args.get("status") or "").upper()
+    wallet = (args.get("wallet") or "").upper()
+    date_from = _parse_date(args.get("date_from"))
+    date_to = _parse_date(args.get("date_to"))
+    return {
+        "status": status if status in STATUSES else None,
+        "wallet": wallet if wallet in WALLET_TYPES else None,
+        "date_from": date_from.strftime("%Y-%m-%d") if date_from else None,
+        "date_to": date_to.strftime("%Y-%m-%d") if date_to else None,
+    }
+
+
+def _where(filters):
+    clauses, params = [], []
+    if filters["status"]:
+        clauses.append("status = ?")
+        params.append(filters["status"])
+    if filters["wallet"]:
+        clauses.append("wallet_type = ?")
+        params.append(filters["wallet"])
+    if filters["date_from"]:
+        clauses.append("requested_ts >= ?")
+        params.append(filters["date_from"])
+    if filters["date_to"]:
+        # sampai akhir hari date_to
+        next_day = datetime.strptime(filters["date_to"], "%Y-%m-%d") + timedelta(days=1)
+        clauses.append("requested_ts < ?")
+        params.append(next_day.strftime("%Y-%m-%d"))
+    return clauses, params
+
+
+def _encode_cursor(row):
+    return f"{row['requested_ts']}|{row['id']}"
+
+
+def _decode_cursor(text):
+    ts, _, row_id = (text or "").rpartition("|")
+    if not ts or not row_id.isdigit():
+        return None
+    return ts, int(row_id)
+
+
+def page_query(filters, before=None, after=None, limit=PAGE_SIZE):
+    """
+    (sql, params) satu halaman redeem; before / after berupa tuple
+    (requested_ts, id) hasil _decode_cursor. Mengambil limit + 1 baris
+    untuk tahu ada halaman berikutnya atau tidak.
+    """
+    clauses, params = _where(filters)
+    order = "DESC"
+    if after:
+        clauses.append("(requested_ts, id) > (?, ?)")
+        params.extend(after)
+        order = "ASC"
+    elif before:
+        clauses.append("(requested_ts, id) < (?, ?)")
+        params.extend(before)
+
+    sql = f"SELECT {', '.join(COLUMNS)}, requested_ts FROM reward_redemptions"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += f" ORDER BY requested_ts {order}, id {order} LIMIT ?"
+    return sql, params + [limit + 1]
+
+
+def list_page(conn, filters, before=None, after=None, limit=PAGE_SIZE):
+    """
+    Satu halaman redeem (terbaru dulu).
+    Return (rows, next_cursor, prev_cursor); kursor None kalau tidak ada
+    halaman ke arah itu.
+    """
+    before, after = _decode_cursor(before), _decode_cursor(after)
+    rows = conn.execute(*page_query(filters, before, after, limit)).fetchall()
+
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if after:
+        if not more:
+            # sudah sampai yang terbaru: tampilkan halaman pertama utuh
+            return list_page(conn, filters, limit=limit)
+        rows.reverse()
+        return rows, _encode_cursor(rows[-1]), _encode_cursor(rows[0])
+
+    next_cursor = _encode_cursor(rows[-1]) if more else None
+    prev_cursor = _encode_cursor(rows[0]) if before and rows else None
+    return rows, next_cursor, prev_cursor
+
+
+def counts_query(filters):
+    """(sql, params) baris redemption_summary untuk filter e-wallet + tanggal."""
+    clauses, params = [], []
+    if filters["wallet"]:
+        clauses.append("wallet_type = ?")
+        params.append(filters["wallet"])
+    if filters["date_from"]:
+        clauses.append("day >= ?")
+        params.append(filters["date_from"])
+    if filters["date_to"]:
+        clauses.append("day <= ?")
+        params.append(filters["date_to"])
+    sql = "SELECT status, n, points FROM redemption_summary"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    return sql, params
+
+
+def status_counts(conn, filters):
+    """
+    {status: (jumlah, total poin)} dari redemption_summary untuk filter
+    e-wallet + tanggal (filter status tidak dipakai, supaya semua status
+    tetap terlihat).
+    """
+    # tabel ringkasan kecil (hari x status x e-wallet): dijumlah di Python
+    counts = {}
+    for r in conn.execute(*counts_query(filters)):
+        n, points = counts.get(r["status"], (0, 0))
+        counts[r["status"]] = (n + r["n"], points + r["points"])
+    return {status: total for status, total in counts.items() if total[0]}
+
+
+def _csv_cell(value):
+    # cegah formula spreadsheet dari isian user (nama, alasan, ...)
+    # (nomor HP seperti +62812... dibiarkan)
+    if isinstance(value, str) and (
+        value[:1] in ("=", "@")
+        or (value[:1] in ("+", "-") and not value[1:].replace(" ", "").isdigit())
+    ):
+        return "'" + value
+    return value
+
+
+def iter_csv(filters, chunk=CSV_CHUNK):
+    """Generator baris CSV (sudah berupa teks) untuk Response streaming."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(COLUMNS)
+    yield buf.getvalue()
+
+    conn = get_db_connection()
+    try:
+        cursor = None
+        while True:
+            rows, cursor, _ = list_page(conn, filters, before=cursor, limit=chunk)
+            buf.seek(0)
+            buf.truncate()
+            writer.writerows([_csv_cell(r[c]) for c in COLUMNS] for r in rows)
+            yield buf.getvalue()
+            if cursor is None:
+                break
+    finally:
+        conn.close()
@@ -0,0 +1,495 @@
+"""
+Re-scoring offline seluruh foto bounty (static/upload) dengan model baru,
+misalnya best.pt hasil training ulang, lalu bandingkan dengan hasil
+sekarang sebelum model dipakai di production.
+
+    python rescore.py run --model best_new.pt [--processes 4] [--batch 32]
+    python rescore.py report <versi_model> [--baseline live|<versi>] [--csv diff.csv]
+    python rescore.py runs                  # daftar run + progres
+
+`run` membaca foto BEFORE/AFTER per halaman (urut id bounty), mengirim
+batch path file ke DetectorProcessPool (decode JPEG draft mode + predict
+per batch di proses worker), lalu menulis hasilnya ke rescore_results per
+batch. Tabel itu sekaligus checkpoint: run yang terputus (Ctrl+C, mati
+listrik) cukup dijalankan ulang dengan model yang sama dan melanjutkan
+dari foto yang belum ada hasilnya. Hasil disimpan per versi model
+(detectors.model_version), jadi beberapa kandidat model bisa dibandingkan.
+
+Untuk ~100k foto dalam semalam di satu mesin CPU (~3.5 foto/detik) pakai
+model ONNX (export_model.py, opsional --int8) dengan --backend onnx dan
+beberapa proses; ukur dulu dengan --limit.
+
+`report` membandingkan hasil satu versi dengan hasil production (tabel
+detections, baseline "live") atau versi lain: label yang berubah, poin
+dasar (utils.calculate_base_points) yang berubah, foto BEFORE yang kini
+tidak terdeteksi apa pun, dan bounty COMPLETED yang foto AFTER-nya kini
+akan gagal dicek.
+"""
+import os
+import csv
+import sys
+import json
+import time
+import argparse
+from collections import Counter, deque
+from contextlib import nullcontext
+from datetime import datetime
+
+from db import get_db_connection, init_db
+from detect_settings import DEFAULT_IMGSZ
+from detectors import model_version, resolve_backend
+from jobs import TIME_FORMAT
+from utils import calculate_base_points
+
+UPLOAD_FOLDER = os.path.join("static", "upload")
+
+# jumlah bounty yang dibaca per query saat mencari foto yang belum diproses
+PAGE_SIZE = 1000
+
+# jumlah bounty per query saat membuat report
+REPORT_PAGE_SIZE = 1000
+
+# foto yang sudah punya hasil untuk versi ini (checkpoint, dilewati)
+DONE_RESULTS_SQL = """
+    SELECT bounty_id, phase FROM rescore_results
+    WHERE model_version = ? AND bounty_id BETWEEN ? AND ?
+      AND status != 'ERROR'
+"""
+
+
+def _now():
+    return datetime.now().strftime(TIME_FORMAT)
+
+
+# ---------- run ----------
+
+
+def _pending_items(conn, version, upload_folder, after_id=0):
+    """
+    Generator (bounty_id, phase, filename, path) yang belum punya hasil untuk
+    versi ini. Keyset per PAGE_SIZE bounty, jadi tidak memuat semua sekaligus.
+    """
+    while True:
+        rows = conn.execute(
+            """
+            SELECT id, before_image, after_image FROM bounties
+            WHERE id > ? ORDER BY id LIMIT ?
+            """,
+            (after_id, PAGE_SIZE),
+        ).fetchall()
+        if not rows:
+            return
+        done = {
+            (r["bounty_id"], r["phase"])
+            for r in conn.execute(
+                DONE_RESULTS_SQL, (version, rows[0]["id"], rows[-1]["id"])
+            )
+        }
+        for row in rows:
+            for phase, filename in (
+                ("BEFORE", row["before_image"]),
+                ("AFTER", row["after_image"]),
+            ):
+                if filename and (row["id"], phase) not in done:
+                    yield row["id"], phase, filename, os.path.join(upload_folder, filename)
+        after_id = rows[-1]["id"]
+
+
+def _save_results(conn, version, rows):
+    conn.executemany(
+        """
+        INSERT OR REPLACE INTO rescore_results
+            (model_version, bounty_id, phase, image_filename, status,
+             detections_json, num_objects, points, error, scored_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        [(version, *row) for row in rows],
+    )
+    conn.commit()
+
+
+def _result_rows(items, outcomes):
+    now = _now()
+    rows = []
+    for (bounty_id, phase, filename, _), (detections, error) in zip(items, outcomes):
+        if error:
+            rows.append((bounty_id, phase, filename, "ERROR", None, None, None, error, now))
+            continue
+        rows.append(
+            (
+                bounty_id,
+                phase,
+                filename,
+                "DONE",
+                json.dumps(detections, ensure_ascii=False),
+                len(detections),
+                calculate_base_points(detections),
+                None,
+                now,
+            )
+        )
+    return rows
+
+
+def run(
+    model_path=None,
+    backend=None,
+    processes=1,
+    batch_size=32,
+    imgsz=DEFAULT_IMGSZ,
+    upload_folder=UPLOAD_FOLDER,
+    limit=None,
+):
+    """Re-score semua foto yang belum punya hasil untuk model ini. Return versi model."""
+    from detector_pool import DetectorProcessPool
+
+    backend, model_path = resolve_backend(backend, model_path)
+    version = model_version(backend, model_path)
+
+    init_db()
+    conn = get_db_connection()
+    conn.execute(
+        """
+        INSERT INTO rescore_runs (model_version, backend, model_path, imgsz, started_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(model_version) DO UPDATE SET finished_at = NULL
+        """,
+        (version, backend, model_path, imgsz, _now()),
+    )
+    conn.commit()
+    print(f"[INFO] Re-score dengan {version} ({processes} proses, batch {batch_size})")
+
+    pool = DetectorProcessPool(processes, backend=backend, model_path=model_path)
+    in_flight = deque()
+    scored = missing = failed = 0
+    next_progress = 1000
+    start = time.perf_counter()
+
+    def collect():
+        nonlocal scored, failed, next_progress
+        items, fut = in_flight.popleft()
+        rows = _result_rows(items, fut.result())
+        _save_results(conn, version, rows)
+        errors = sum(1 for row in rows if row[3] == "ERROR")
+        scored += len(rows) - errors
+        failed += errors
+        if scored >= next_progress:
+            rate = scored / (time.perf_counter() - start)
+            print(f"[INFO] {scored} foto ({rate:.1f} foto/detik)")
+            next_progress += 1000
+
+    try:
+        batch, missing_rows = [], []
+        for n, item in enumerate(_pending_items(conn, version, upload_folder)):
+            if limit is not None and n >= limit:
+                break
+            bounty_id, phase, filename, path = item
+            if not os.path.exists(path):
+                missing_rows.append(
+                    (bounty_id, phase, filename, "MISSING", None, None, None, None, _now())
+                )
+                continue
+            batch.append(item)
+            if len(batch) >= batch_size:
+                in_flight.append((batch, pool.submit_batch([i[3] for i in batch], imgsz)))
+                batch = []
+                # batasi batch yang antre supaya memori tetap kecil
+                if len(in_flight) >= processes * 2:
+                    collect()
+            if len(missing_rows) >= batch_size:
+                _save_results(conn, version, missing_rows)
+                missing += len(missing_rows)
+                missing_rows = []
+        if batch:
+            in_flight.append((batch, pool.submit_batch([i[3] for i in batch], imgsz)))
+        if missing_rows:
+            _save_results(conn, version, missing_rows)
+            missing += len(missing_rows)
+        while in_flight:
+            collect()
+
+        conn.execute(
+            "UPDATE rescore_runs SET finished_at = ? WHERE model_version = ?",
+            (_now(), version),
+        )
+        conn.commit()
+    finally:
+        for _, fut in in_flight:
+            fut.cancel()
+        pool.shutdown()
+        conn.close()
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"[INFO] Selesai: {scored} foto dalam {elapsed:.0f} detik "
+        f"({scored / max(elapsed, 1e-9):.1f} foto/detik), "
+        f"{missing} file tidak ada, {failed} gagal"
+    )
+    return version
+
+
+# ---------- report ----------
+
+
+def _live_detections(conn, bounty_ids):
+    """Deteksi production (tabel detections) -> {(bounty_id, phase): [label, ...]}."""
+    out = {}
+    rows = conn.execute(
+        f"""
+        SELECT bounty_id, phase, label FROM detections
+        WHERE bounty_id IN ({', '.join('?' for _ in bounty_ids)})
+        ORDER BY id
+        """,
+        bounty_ids,
+    )
+    for row in rows:
+        out.setdefault((row["bounty_id"], row["phase"]), []).append(row["label"])
+    return out
+
+
+def _version_detections(conn, version, bounty_ids):
+    out = {}
+    rows = conn.execute(
+        f"""
+        SELECT bounty_id, phase, detections_json FROM rescore_results
+        WHERE model_version = ? AND status = 'DONE'
+          AND bounty_id IN ({', '.join('?' for _ in bounty_ids)})
+        """,
+        [version, *bounty_ids],
+    )
+    for row in rows:
+        out[(row["bounty_id"], row["phase"])] = [
+            det["label"] for det in json.loads(row["detections_json"])
+        ]
+    return out
+
+
+def _label_text(labels):
+    return ", ".join(f"{label} x{n}" for label, n in sorted(Counter(labels).items())) or "-"
+
+
+def diff(conn, version, baseline="live"):
+    """
+    Generator satu dict per foto yang labelnya berbeda dari baseline:
+    bounty_id, phase, status bounty, label lama/baru, poin lama/baru,
+    after_fail (bounty COMPLETED yang foto AFTER-nya kini akan gagal).
+    Foto yang belum ada di baseline dilewati.
+    """
+    after_id = 0
+    while True:
+        rows = conn.execute(
+            """
+            SELECT r.bounty_id, r.phase, r.detections_json, b.status
+            FROM rescore_results r
+            JOIN bounties b ON b.id = r.bounty_id
+            WHERE r.model_version = ? AND r.status = 'DONE' AND r.bounty_id > ?
+            ORDER BY r.bounty_id, r.phase
+            LIMIT ?
+            """,
+            (version, after_id, REPORT_PAGE_SIZE),
+        ).fetchall()
+        if not rows:
+            return
+        # halaman berakhir di batas bounty supaya BEFORE/AFTER satu bounty
+        # tidak terpisah
+        if len(rows) == REPORT_PAGE_SIZE and rows[0]["bounty_id"] != rows[-1]["bounty_id"]:
+            last = rows[-1]["bounty_id"]
+            rows = [r for r in rows if r["bounty_id"] != last]
+        bounty_ids = sorted({r["bounty_id"] for r in rows})
+        if baseline == "live":
+            old = _live_detections(conn, bounty_ids)
+        else:
+            old = _version_detections(conn, baseline, bounty_ids)
+
+        for row in rows:
+            key = (row["bounty_id"], row["phase"])
+            new_dets = json.loads(row["detections_json"])
+            new_labels = [det["label"] for det in new_dets]
+            if key in old:
+                old_labels = old[key]
+            elif baseline == "live" and row["phase"] == "AFTER" and row["status"] == "COMPLETED":
+                # AFTER yang lolos memang tidak punya deteksi tersimpan
+                old_labels = []
+            else:
+                continue
+
+            # AFTER yang dulu lolos (tanpa deteksi) kini terdeteksi sampah
+            after_fail = (
+                row["phase"] == "AFTER"
+                and row["status"] == "COMPLETED"
+                and not old_labels
+                and bool(new_labels)
+            )
+            old_points = calculate_base_points([{"label": lb} for lb in old_labels])
+            new_points = calculate_base_points(new_dets)
+            if Counter(old_labels) == Counter(new_labels):
+                continue
+            yield {
+                "bounty_id": row["bounty_id"],
+                "phase": row["phase"],
+                "bounty_status": row["status"],
+                "old_labels": old_labels,
+                "new_labels": new_labels,
+                "old_points": old_points,
+                "new_points": new_points,
+                "after_fail": after_fail,
+            }
+        after_id = bounty_ids[-1]
+
+
+def _summarize(conn, version, baseline, show, writer=None):
+    """Jumlah per kategori + contoh dari diff(); tiap foto ke CSV kalau ada writer."""
+    if writer:
+        writer.writerow(
+            ["bounty_id", "phase", "bounty_status", "old_labels", "new_labels",
+             "old_points", "new_points", "after_fail"]
+        )
+    changed = Counter()
+    label_delta = Counter()
+    points_delta = 0
+    samples = {"labels": [], "points": [], "before_empty": [], "after_fail": []}
+    for d in diff(conn, version, baseline):
+        label_delta.update(d["new_labels"])
+        label_delta.subtract(d["old_labels"])
+        changed["labels"] += 1
+        kinds = ["labels"]
+        if d["phase"] == "BEFORE" and d["old_points"] != d["new_points"]:
+            changed["points"] += 1
+            points_delta += d["new_points"] - d["old_points"]
+            kinds.append("points")
+        if d["phase"] == "BEFORE" and not d["new_labels"]:
+            changed["before_empty"] += 1
+            kinds.append("before_empty")
+        if d["after_fail"]:
+            changed["after_fail"] += 1
+            kinds.append("after_fail")
+        for kind in kinds:
+            if len(samples[kind]) < show:
+                samples[kind].append(d)
+        if writer:
+            writer.writerow(
+                [d["bounty_id"], d["phase"], d["bounty_status"],
+                 _label_text(d["old_labels"]), _label_text(d["new_labels"]),
+                 d["old_points"], d["new_points"], int(d["after_fail"])]
+            )
+    return changed, label_delta, points_delta, samples
+
+
+def report(version, baseline="live", csv_path=None, show=20):
+    init_db()
+    conn = get_db_connection()
+    counts = dict(
+        conn.execute(
+            "SELECT status, COUNT(*) FROM rescore_results WHERE model_version = ? "
+            "GROUP BY status",
+            (version,),
+        ).fetchall()
+    )
+    if not counts:
+        conn.close()
+        sys.exit(f"Belum ada hasil re-score untuk {version} (lihat: python rescore.py runs)")
+
+    f = open(csv_path, "w", newline="", encoding="utf-8") if csv_path else nullcontext()
+    with f:
+        changed, label_delta, points_delta, samples = _summarize(
+            conn, version, baseline, show, csv.writer(f) if csv_path else None
+        )
+    conn.close()
+
+    print(f"Model  : {version}")
+    print(f"Banding: {baseline}")
+    print("Foto   : " + ", ".join(f"{n} {status}" for status, n in sorted(counts.items())))
+    print()
+    print(f"Label berubah             : {changed['labels']} foto")
+    print(f"Poin BEFORE berubah       : {changed['points']} bounty (total {points_delta:+d} poin)")
+    print(f"BEFORE kini tanpa deteksi : {changed['before_empty']} bounty")
+    print(f"AFTER kini gagal          : {changed['after_fail']} bounty COMPLETED")
+
+    moved = sorted(
+        ((label, n) for label, n in label_delta.items() if n), key=lambda x: -abs(x[1])
+    )
+    if moved:
+        print()
+        print(f"{'label':24s} {'selisih':>8s}")
+        for label, n in moved:
+            print(f"{label:24s} {n:+8d}")
+
+    titles = {
+        "points": "Poin berubah",
+        "before_empty": "BEFORE tanpa deteksi",
+        "after_fail": "AFTER kini gagal",
+    }
+    for kind, title in titles.items():
+        if not samples[kind]:
+            continue
+        print()
+        print(f"{title} (maks {show}):")
+        for d in samples[kind]:
+            print(
+                f"  #{d['bounty_id']} {d['phase']:6s} {d['old_points']:>4d} -> "
+                f"{d['new_points']:<4d} [{_label_text(d['old_labels'])}] -> "
+                f"[{_label_text(d['new_labels'])}]"
+            )
+    if csv_path:
+        print()
+        print(f"Detail per foto: {csv_path}")
+
+
+def list_runs():
+    init_db()
+    conn = get_db_connection()
+    rows = conn.execute(
+        """
+        SELECT r.model_version, r.model_path, r.started_at, r.finished_at,
+            SUM(s.status = 'DONE') AS done, SUM(s.status != 'DONE') AS other
+        FROM rescore_runs r
+        LEFT JOIN rescore_results s ON s.model_version = r.model_version
+        GROUP BY r.model_version
+        ORDER BY r.started_at
+        """
+    ).fetchall()
+    conn.close()
+    for row in rows:
+        state = "selesai " + row["finished_at"] if row["finished_at"] else "belum selesai"
+        print(
+            f"{row['model_version']:48s} {row['done'] or 0:8d} foto "
+            f"({row['other'] or 0} gagal/tidak ada), {state}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-score foto bounty dengan model baru")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="jalankan / lanjutkan re-score")
+    p_run.add_argument("--model", help="path model (default DETECTOR_MODEL / best.pt)")
+    p_run.add_argument("--backend", help="ultralytics / onnx (default DETECTOR_BACKEND)")
+    p_run.add_argument("--processes", type=int, default=1, help="jumlah proses detector")
+    p_run.add_argument("--batch", type=int, default=32, help="foto per batch")
+    p_run.add_argument("--imgsz", type=int, default=DEFAULT_IMGSZ)
+    p_run.add_argument("--upload-folder", default=UPLOAD_FOLDER)
+    p_run.add_argument("--limit", type=int, help="berhenti setelah N foto (uji kecepatan)")
+
+    p_report = sub.add_parser("report", help="bandingkan hasil re-score")
+    p_report.add_argument("version", help="versi model (lihat: python rescore.py runs)")
+    p_report.add_argument("--baseline", default="live", help="live (production) atau versi lain")
+    p_report.add_argument("--csv", help="tulis semua foto yang berubah ke file CSV")
+    p_report.add_argument("--show", type=int, default=20, help="contoh per kategori")
+
+    sub.add_parser("runs", help="daftar run re-score")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(
+            args.model,
+            args.backend,
+            processes=args.processes,
+            batch_size=args.batch,
+            imgsz=args.imgsz,
+            upload_folder=args.upload_folder,
+            limit=args.limit,
+        )
+    elif args.command == "report":
+        report(args.version, args.baseline, args.csv, args.show)
+    else:
+        list_runs()
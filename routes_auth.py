@@ -1,49 +1,13 @@
-import os
-from flask import render_template, request, redirect, url_for, flash, session
-from werkzeug.security import generate_password_hash, check_password_hash
+import math
 
-# Twilio optional – kalau tidak mau pakai, import ini boleh dihapus
-from twilio.rest import Client
+from flask import render_template, request, redirect, url_for, flash, session
 
-from utils import get_user
+from user_context import get_user, invalidate_user
 from db import get_db_connection
-
-
-def send_whatsapp_message(phone: str, text: str):
-    """
-    Kirim pesan informasi ke WhatsApp (opsional).
-    phone harus sudah termasuk kode negara, misal: +62812xxxxxxx
-
-    Konfigurasi via environment variable:
-      - TWILIO_ACCOUNT_SID
-      - TWILIO_AUTH_TOKEN
-      - TWILIO_WHATSAPP_FROM  (contoh: 'whatsapp:+14155238886')
-
-    Kalau belum dikonfigurasi atau gagal kirim, fungsi ini TIDAK akan melempar error
-    (supaya pendaftaran tetap jalan).
-    """
-    account_sid = os.environ.get("TWILIO_ACCOUNT_SID")
-    auth_token = os.environ.get("TWILIO_AUTH_TOKEN")
-    from_whatsapp = os.environ.get("TWILIO_WHATSAPP_FROM")
-
-    # Kalau belum diset, cukup print ke console dan selesai
-    if not all([account_sid, auth_token, from_whatsapp]):
-        print("=== WhatsApp (SIMULASI, Twilio belum dikonfigurasi) ===")
-        print(f"Nomor: {phone}")
-        print(f"Pesan: {text}")
-        print("=======================================================")
-        return
-
-    try:
-        client = Client(account_sid, auth_token)
-        client.messages.create(
-            from_=from_whatsapp,
-            to=f"whatsapp:{phone}",
-            body=text,
-        )
-    except Exception as e:
-        # Jangan menghentikan aplikasi hanya karena WA gagal
-        print("[WARN] Gagal mengirim WhatsApp:", e)
+from metrics import inc
+from notifications import enqueue_whatsapp
+from passwords import hash_password, verify_password
+from login_throttle import check_login_attempt, login_succeeded, hashing_slot
 
 
 def init_auth_routes(app):
@@ -76,7 +40,12 @@ def init_auth_routes(app):
                 flash("User ID sudah terdaftar.", "error")
                 return redirect(url_for("register"))
 
-            password_hash = generate_password_hash(password)
+            # hash dibatasi slot yang sama dengan login (login_throttle.hashing_slot)
+            with hashing_slot() as ok:
+                if not ok:
+                    flash("Server sedang sibuk. Silakan coba daftar lagi.", "error")
+                    return redirect(url_for("register"))
+                password_hash = hash_password(password)
 
             # simpan user ke DB dengan is_phone_verified = 0 (BELUM diverifikasi)
             conn = get_db_connection()
@@ -97,15 +66,18 @@ def init_auth_routes(app):
                     password_hash,
                 ),
             )
-            conn.commit()
-            conn.close()
-
-            # Kirim pesan info ke WhatsApp (opsional, best-effort)
-            send_whatsapp_message(
+            # pesan info WhatsApp masuk outbox di transaksi yang sama,
+            # dikirim oleh dispatcher (notifications.py) di background
+            enqueue_whatsapp(
+                conn,
                 phone,
                 "Terima kasih telah mendaftar Smart Waste Detector. "
                 "Nomor WhatsApp Anda saat ini tercatat sebagai BELUM TERVERIFIKASI.",
+                kind="REGISTER",
             )
+            conn.commit()
+            conn.close()
+            invalidate_user(user_id)
 
             flash(
                 "Registrasi berhasil! Nomor WhatsApp Anda BELUM terverifikasi, "
@@ -123,15 +95,52 @@ def init_auth_routes(app):
             user_id = request.form.get("user_id", "").strip()
             password = request.form.get("password", "")
 
-            user = get_user(user_id)
+            # rate limit dicek sebelum query user / hash password
+            conn = get_db_connection()
+            rejected = check_login_attempt(conn, user_id, request.remote_addr)
+            conn.close()
+            if rejected:
+                minutes = math.ceil(rejected[1] / 60)
+                flash(
+                    f"Terlalu banyak percobaan login. Coba lagi dalam {minutes} menit.",
+                    "error",
+                )
+                return redirect(url_for("login"))
+
+            # selalu dari database, bukan cache profil
+            user = get_user(user_id, cached=False)
             if not user or not user["password_hash"]:
+                inc("login_attempts_total", outcome="failed")
                 flash("User ID atau password salah.", "error")
                 return redirect(url_for("login"))
 
-            if not check_password_hash(user["password_hash"], password):
+            with hashing_slot() as ok:
+                if not ok:
+                    flash("Server sedang sibuk. Silakan coba login lagi.", "error")
+                    return redirect(url_for("login"))
+                valid, needs_rehash = verify_password(user["password_hash"], password)
+                new_hash = hash_password(password) if valid and needs_rehash else None
+
+            if not valid:
+                inc("login_attempts_total", outcome="failed")
                 flash("User ID atau password salah.", "error")
                 return redirect(url_for("login"))
 
+            inc("login_attempts_total", outcome="ok")
+            conn = get_db_connection()
+            login_succeeded(conn, user_id)
+            if new_hash:
+                # parameter hash (PASSWORD_HASH_METHOD) berubah sejak hash ini dibuat
+                conn.execute(
+                    "UPDATE users SET password_hash = ? WHERE user_id = ?",
+                    (new_hash, user_id),
+                )
+                inc("password_rehash_total")
+            conn.commit()
+            conn.close()
+            if new_hash:
+                invalidate_user(user_id)
+
             # Di sini kita TIDAK memblokir user yang belum verifikasi HP.
             # Kita hanya memberi informasi di flash message.
             if "is_phone_verified" in user.keys() and user["is_phone_verified"] == 0:
@@ -1,5 +1,5 @@
 import os
-import json
+import csv
 from datetime import datetime
 
 from flask import (
@@ -8,52 +8,166 @@ from flask import (
     redirect,
     url_for,
     flash,
+    jsonify,
+    abort,
+    send_from_directory,
+    Response,
 )
 from db import get_db_connection
-from utils import (
-    allowed_file,
-    calculate_base_points,
-    haversine_m,
-    get_total_points_for_user,
-    current_user,
+from utils import allowed_file, haversine_m
+from user_context import current_user, current_balance, current_redemptions
+from annotate import get_or_render
+from detections import load_detections
+from dedup import save_upload, claim_image_for_bounty
+from uploads import (
+    UPLOAD_MAX_BYTES,
+    UploadRejected,
+    receive_upload,
+    store_async,
+    decode_async,
+    thumb_path,
+    THUMB_DIR,
 )
-from ml import model
+from geo import k_nearest_open_bounties, nearby_open_bounties, MAX_RADIUS_M
+from ledger import (
+    get_balance,
+    record_redemption,
+    record_redemption_refund,
+    record_redemption_reinstated,
+)
+from jobs import enqueue_detection_job, get_job, job_result, count_pending_jobs
+from payouts import (
+    BATCH_MAX_ITEMS,
+    PayoutFileError,
+    apply_results,
+    create_batch,
+    get_batch,
+    iter_batch_csv,
+    parse_results,
+    pending_by_wallet,
+    recent_batches,
+)
+from redemptions import (
+    STATUSES as REDEMPTION_STATUSES,
+    WALLET_TYPES,
+    iter_csv,
+    list_page,
+    parse_filters,
+    status_counts,
+)
+
+
+# jumlah bounty OPEN per halaman di /bounties
+BOUNTIES_PER_PAGE = 20
+
+# kalau radius kosong: jumlah bounty OPEN terdekat (sampai MAX_RADIUS_M)
+# yang ditampilkan sebagai petunjuk arah
+NEAREST_BOUNTIES = 5
+
+# bounty CLAIMED oleh user ini (sedang dikerjakan), di /bounties
+MY_CLAIMED_SQL = """
+    SELECT b.*, u.name AS reporter_name
+    FROM bounties b
+    JOIN users u ON b.reporter_id = u.user_id
+    WHERE b.status = 'CLAIMED' AND b.cleaner_id = ?
+    ORDER BY b.claimed_ts DESC
+"""
 
 
 def init_bounty_routes(app):
-    # Helper: ambil riwayat redeem poin user
-    def _get_user_redemptions(user_id):
-        if not user_id:
-            return []
-        conn = get_db_connection()
-        rows = conn.execute(
-            """
-            SELECT id, wallet_type, full_name, phone, points, amount, status, requested_at
-            FROM reward_redemptions
-            WHERE user_id = ?
-            ORDER BY datetime(requested_at) DESC
-            LIMIT 10
-            """,
-            (user_id,),
-        ).fetchall()
-        conn.close()
-        return rows
+    # Helper: tolak upload baru kalau antrian deteksi sudah terlalu panjang
+    def _detection_busy():
+        return count_pending_jobs() >= app.config["DETECTION_MAX_BACKLOG"]
+
+    def _busy_response():
+        return (
+            "Server deteksi sedang sibuk. Silakan coba lagi beberapa saat lagi.",
+            503,
+            {"Retry-After": "10"},
+        )
+
+    # Body request melebihi MAX_CONTENT_LENGTH (foto terlalu besar)
+    @app.errorhandler(413)
+    def _upload_too_large(e):
+        flash(
+            f"Ukuran file melebihi batas {UPLOAD_MAX_BYTES // (1024 * 1024)} MB.",
+            "error",
+        )
+        return redirect(request.referrer or url_for("index"))
+
+    # Thumbnail untuk daftar bounty (upload lama belum punya thumbnail)
+    @app.template_global()
+    def upload_thumb_url(filename):
+        path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
+        if os.path.exists(thumb_path(path)):
+            return url_for("static", filename=f"upload/{THUMB_DIR}/{filename}")
+        return url_for("static", filename=f"upload/{filename}")
+
+    # Helper: ambil job deteksi milik user (None kalau bukan miliknya)
+    def _get_own_job(job_id, user):
+        if not job_id or not user:
+            return None
+        job = get_job(job_id)
+        if not job or job["user_id"] != user["user_id"]:
+            return None
+        return job
 
     @app.route("/", methods=["GET"])
     def index():
         user = current_user()
-        total_points = get_total_points_for_user(user["user_id"]) if user else 0
-        redemptions = _get_user_redemptions(user["user_id"]) if user else []
+        job = _get_own_job(request.args.get("job", type=int), user)
+
+        last_points = None
+        detections = []
+        image_url = None
+        just_created_bounty = None
+        pending_job = None
+
+        if job and job["phase"] == "BEFORE":
+            outcome = job_result(job)
+            if job["status"] in ("QUEUED", "RUNNING"):
+                pending_job = job["id"]
+            elif job["status"] == "DONE" and outcome.get("passed"):
+                detections = outcome["detections"]
+                points_reporter = outcome["points_reporter"]
+                points_cleaner = outcome["points_cleaner"]
+                just_created_bounty = {
+                    "points_reporter": points_reporter,
+                    "points_cleaner": points_cleaner,
+                }
+                if outcome.get("annotated_image"):
+                    image_url = url_for(
+                        "bounty_annotated_image", bounty_id=job["bounty_id"]
+                    )
+                flash(
+                    f"Bounty berhasil dibuat! Potensi poin: uploader {points_reporter}, cleaner {points_cleaner}.",
+                    "success",
+                )
+            elif job["status"] == "DONE":
+                last_points = 0
+                flash(
+                    "Tidak ada sampah yang terdeteksi pada gambar. "
+                    "Bounty tidak dibuat dan tidak ada reward yang diberikan. "
+                    "Silakan upload foto tumpukan sampah yang lebih jelas.",
+                    "error",
+                )
+            else:
+                flash("Deteksi gambar gagal diproses. Silakan upload ulang.", "error")
+
+        # user, saldo dan riwayat redeem: satu koneksi untuk seluruh request
+        total_points = current_balance()
+        redemptions = current_redemptions()
 
         return render_template(
             "index.html",
             total_points=total_points,
-            last_points=None,
-            detections=[],
-            image_url=None,
+            last_points=last_points,
+            detections=detections,
+            image_url=image_url,
             user=user,
-            just_created_bounty=None,
+            just_created_bounty=just_created_bounty,
             redemptions=redemptions,
+            pending_job=pending_job,
         )
 
 
@@ -98,82 +212,42 @@ def init_bounty_routes(app):
             flash("Format file tidak didukung. Gunakan PNG/JPG/JPEG.", "error")
             return redirect(url_for("index"))
 
-        # simpan BEFORE image
-        ext = file.filename.rsplit(".", 1)[1].lower()
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        before_filename = f"before_{timestamp}.{ext}"
-        upload_path = os.path.join(app.config["UPLOAD_FOLDER"], before_filename)
-        file.save(upload_path)
-
-        # YOLO pada BEFORE
-        results = model.predict(upload_path, imgsz=736, save=False)
-        result = results[0]
-
-        detections = []
-        if result.boxes is not None and len(result.boxes) > 0:
-            classes = result.boxes.cls.tolist()
-            scores = result.boxes.conf.tolist()
-            for cls_id, conf in zip(classes, scores):
-                cls_id = int(cls_id)
-                label = result.names.get(cls_id, str(cls_id))
-                detections.append(
-                    {"label": label, "confidence": round(float(conf) * 100, 2)}
-                )
-
-        if not detections:
-         flash(
-             "Tidak ada sampah yang terdeteksi pada gambar. "
-             "Bounty tidak dibuat dan tidak ada reward yang diberikan. "
-             "Silakan upload foto tumpukan sampah yang lebih jelas.",
-             "error",
-         )
-         total_points = get_total_points_for_user(user["user_id"])
-         redemptions = _get_user_redemptions(user["user_id"])
-         return render_template(
-             "index.html",
-             total_points=total_points,
-             last_points=0,
-             detections=[],
-             image_url=None,
-             user=user,
-             just_created_bounty=None,
-             redemptions=redemptions,
-         )
-
-
-        base_points = calculate_base_points(detections)
-        points_reporter = base_points
-        points_cleaner = base_points * 2
-
-        # gambar annotated (untuk tampilan)
-        annotated_img = result.plot()
-        annotated_filename = f"before_annotated_{timestamp}.{ext}"
-        annotated_path = os.path.join(
-            app.config["RESULT_FOLDER"], annotated_filename
-        )
+        if _detection_busy():
+            return _busy_response()
 
         try:
-            from PIL import Image
-
-            img_rgb = annotated_img[..., ::-1]
-            Image.fromarray(img_rgb).save(annotated_path)
-        except Exception as e:
-            print("Gagal menyimpan gambar hasil deteksi:", e)
-            annotated_filename = None
+            data, image_sha, ext = receive_upload(file)
+        except UploadRejected as e:
+            flash(str(e), "error")
+            return redirect(url_for("index"))
 
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         location_text = user["region"] or ""
 
         conn = get_db_connection()
-        conn.execute(
+
+        # simpan BEFORE image (file dengan konten sama tidak ditulis ulang);
+        # file ditulis + didecode di background, worker di proses yang sama
+        # memakai hasil decode (uploads.keep_decoded)
+        before_filename, image_sha = save_upload(
+            conn, data, "before", ext, app.config["UPLOAD_FOLDER"],
+            sha=image_sha,
+            write=lambda path, d: store_async(path, d, image_sha),
+        )
+        decode_async(image_sha, data)
+
+        # bounty dibuat dengan status PENDING_DETECTION, YOLO dijalankan
+        # oleh detection worker (lihat jobs.py) supaya request tidak tertahan
+        cur = conn.execute(
             """
             INSERT INTO bounties (
                 reporter_id, location, latitude, longitude, created_at,
                 claimed_at, completed_at,
                 before_image, after_image, status,
-                num_objects, points_reporter, points_cleaner, labels_json
+                num_objects, points_reporter, points_cleaner
             )
-            VALUES (?, ?, ?, ?, ?, NULL, NULL, ?, NULL, 'OPEN',
-                    ?, ?, ?, ?)
+            VALUES (?, ?, ?, ?, ?, NULL, NULL, ?, NULL, 'PENDING_DETECTION',
+                    0, 0, 0)
             """,
             (
                 user["user_id"],
@@ -182,42 +256,67 @@ def init_bounty_routes(app):
                 longitude,
                 timestamp,
                 before_filename,
-                len(detections),
-                points_reporter,
-                points_cleaner,
-                json.dumps(detections, ensure_ascii=False),
             ),
         )
+        claim_image_for_bounty(conn, image_sha, cur.lastrowid)
+        job_id = enqueue_detection_job(
+            conn, cur.lastrowid, user["user_id"], "BEFORE", before_filename, image_sha
+        )
         conn.commit()
         conn.close()
 
-        total_points = get_total_points_for_user(user["user_id"])
-        redemptions = _get_user_redemptions(user["user_id"])
+        flash("Foto diterima. Sistem sedang mendeteksi sampah pada gambar...", "info")
+        return redirect(url_for("index", job=job_id))
 
-        image_url = None
-        if annotated_filename:
-            image_url = url_for(
-                "static", filename=f"image/result/{annotated_filename}"
+    # ---------- Gambar annotated (dirender saat pertama dibuka) ----------
+    @app.route("/bounty/<int:bounty_id>/annotated", methods=["GET"])
+    def bounty_annotated_image(bounty_id):
+        conn = get_db_connection()
+        bounty = conn.execute(
+            "SELECT before_image FROM bounties WHERE id = ?", (bounty_id,)
+        ).fetchone()
+        detections = load_detections(conn, bounty_id, "BEFORE")
+        conn.close()
+        if not bounty or not bounty["before_image"]:
+            abort(404)
+
+        path = get_or_render(
+            app.config["UPLOAD_FOLDER"],
+            app.config["RESULT_FOLDER"],
+            bounty["before_image"],
+            detections,
+        )
+        if path is None:
+            # belum ada kotak deteksi: tampilkan foto aslinya saja
+            return redirect(
+                url_for("static", filename=f"upload/{bounty['before_image']}")
             )
-
-        flash(
-            f"Bounty berhasil dibuat! Potensi poin: uploader {points_reporter}, cleaner {points_cleaner}.",
-            "success",
+        return send_from_directory(
+            app.config["RESULT_FOLDER"], os.path.basename(path), max_age=86400
         )
 
-        return render_template(
-            "index.html",
-            total_points=total_points,
-            last_points=None,
-            detections=detections,
-            image_url=image_url,
-            user=user,
-            just_created_bounty={
-                "points_reporter": points_reporter,
-                "points_cleaner": points_cleaner,
-            },
-            redemptions=redemptions,
+    # ---------- Status Job Deteksi (dipolling client) ----------
+    @app.route("/jobs/<int:job_id>", methods=["GET"])
+    def detection_job_status(job_id):
+        user = current_user()
+        if not user:
+            return jsonify({"error": "unauthorized"}), 401
+
+        job = get_job(job_id)
+        if not job or job["user_id"] != user["user_id"]:
+            return jsonify({"error": "not found"}), 404
+
+        return jsonify(
+            {
+                "id": job["id"],
+                "bounty_id": job["bounty_id"],
+                "phase": job["phase"],
+                "status": job["status"],
+                "result": job_result(job),
+                "error": job["error"],
+            }
         )
+
     # ---------- Halaman Reward ----------
     @app.route("/rewards", methods=["GET"])
     def rewards_page():
@@ -226,8 +325,8 @@ def init_bounty_routes(app):
             flash("Silakan login terlebih dahulu untuk mengakses menu reward.", "error")
             return redirect(url_for("login"))
 
-        total_points = get_total_points_for_user(user["user_id"])
-        redemptions = _get_user_redemptions(user["user_id"])
+        total_points = current_balance()
+        redemptions = current_redemptions()
 
         return render_template(
             "rewards.html",
@@ -249,9 +348,7 @@ def init_bounty_routes(app):
         phone = (request.form.get("phone") or "").strip()
         amount_str = (request.form.get("amount") or "").strip()
 
-        allowed_wallets = ["GOPAY", "DANA", "OVO", "SHOPEEPAY", "LINKAJA", "SAKUKU"]
-
-        if wallet_type not in allowed_wallets:
+        if wallet_type not in WALLET_TYPES:
             flash("Pilih jenis e-wallet yang valid.", "error")
             return redirect(url_for("rewards_page"))
 
@@ -263,32 +360,39 @@ def init_bounty_routes(app):
             flash("Nomor HP e-wallet tidak boleh kosong.", "error")
             return redirect(url_for("rewards_page"))
 
-        total_points = get_total_points_for_user(user["user_id"])
-
-        if total_points <= 0:
-            flash("Poin kamu belum cukup untuk diredeem.", "error")
-            return redirect(url_for("rewards_page"))
-
+        amount = None  # kosong = redeem semua poin
         if amount_str:
             try:
                 amount = int(amount_str)
             except ValueError:
                 flash("Jumlah poin yang ingin ditukar harus berupa angka.", "error")
                 return redirect(url_for("rewards_page"))
-        else:
-            # kalau kosong, redeem semua poin
-            amount = total_points
 
-        if amount <= 0:
-            flash("Jumlah poin yang ingin ditukar harus lebih dari 0.", "error")
-            return redirect(url_for("rewards_page"))
+            if amount <= 0:
+                flash("Jumlah poin yang ingin ditukar harus lebih dari 0.", "error")
+                return redirect(url_for("rewards_page"))
+
+        # cek saldo + insert dalam satu transaksi BEGIN IMMEDIATE, supaya dua
+        # request redeem bersamaan tidak memakai saldo yang sama
+        conn = get_db_connection()
+        conn.execute("BEGIN IMMEDIATE")
+        total_points = max(0, get_balance(conn, user["user_id"]))
+
+        error = None
+        if total_points <= 0:
+            error = "Poin kamu belum cukup untuk diredeem."
+        elif amount is None:
+            amount = total_points
+        elif amount > total_points:
+            error = "Jumlah poin yang ingin ditukar melebihi saldo poin kamu."
 
-        if amount > total_points:
-            flash("Jumlah poin yang ingin ditukar melebihi saldo poin kamu.", "error")
+        if error:
+            conn.rollback()
+            conn.close()
+            flash(error, "error")
             return redirect(url_for("rewards_page"))
 
-        conn = get_db_connection()
-        conn.execute(
+        cur = conn.execute(
             """
             INSERT INTO reward_redemptions
                 (user_id, wallet_type, full_name, phone, points, amount, status, requested_at)
@@ -305,6 +409,7 @@ def init_bounty_routes(app):
                 datetime.utcnow().isoformat(),
             ),
         )
+        record_redemption(conn, cur.lastrowid, user["user_id"], amount)
         conn.commit()
         conn.close()
 
@@ -329,59 +434,58 @@ def init_bounty_routes(app):
 
         user_lat = request.args.get("lat", type=float)
         user_lon = request.args.get("lon", type=float)
+        radius_m = request.args.get("radius", default=100.0, type=float)
+        radius_m = min(max(radius_m, 1.0), MAX_RADIUS_M)
+        page = max(request.args.get("page", default=1, type=int), 1)
 
         conn = get_db_connection()
 
-        # bounty OPEN untuk radius 100 m
-        open_rows = conn.execute(
-            """
-            SELECT b.*, u.name AS reporter_name
-            FROM bounties b
-            JOIN users u ON b.reporter_id = u.user_id
-            WHERE b.status = 'OPEN' AND b.reporter_id != ?
-            """,
-            (user["user_id"],),
-        ).fetchall()
+        # bounty OPEN dalam radius (default 100 m), lewat index spasial
+        open_bounties = []
+        total_open = 0
+        if user_lat is not None and user_lon is not None:
+            open_bounties, total_open = nearby_open_bounties(
+                conn,
+                user_lat,
+                user_lon,
+                radius_m,
+                exclude_reporter=user["user_id"],
+                limit=BOUNTIES_PER_PAGE,
+                offset=(page - 1) * BOUNTIES_PER_PAGE,
+            )
+
+        # tidak ada bounty di radius: k bounty OPEN terdekat di luar radius
+        nearest_bounties = []
+        if user_lat is not None and user_lon is not None and total_open == 0:
+            nearest_bounties = k_nearest_open_bounties(
+                conn,
+                user_lat,
+                user_lon,
+                NEAREST_BOUNTIES,
+                exclude_reporter=user["user_id"],
+                start_radius_m=min(radius_m * 2, MAX_RADIUS_M),
+                max_radius_m=MAX_RADIUS_M,
+            )
 
         # bounty CLAIMED oleh user ini (sedang dikerjakan)
-        my_claimed_rows = conn.execute(
-            """
-            SELECT b.*, u.name AS reporter_name
-            FROM bounties b
-            JOIN users u ON b.reporter_id = u.user_id
-            WHERE b.status = 'CLAIMED' AND b.cleaner_id = ?
-            ORDER BY b.claimed_at DESC
-            """,
-            (user["user_id"],),
-        ).fetchall()
+        my_claimed_rows = conn.execute(MY_CLAIMED_SQL, (user["user_id"],)).fetchall()
 
         conn.close()
 
-        open_bounties = []
-        if user_lat is not None and user_lon is not None:
-            for r in open_rows:
-                lat = r["latitude"]
-                lon = r["longitude"]
-                if lat is None or lon is None:
-                    continue
-                dist_m = haversine_m(user_lat, user_lon, lat, lon)
-                if dist_m <= 100.0:
-                    d = dict(r)
-                    d["distance_m"] = dist_m
-                    open_bounties.append(d)
-            open_bounties.sort(key=lambda x: x["distance_m"])
-        else:
-            open_bounties = []
-
         my_claimed = [dict(r) for r in my_claimed_rows]
 
         return render_template(
             "bounties.html",
             user=user,
             open_bounties=open_bounties,
+            nearest_bounties=nearest_bounties,
             my_claimed=my_claimed,
             user_lat=user_lat,
             user_lon=user_lon,
+            radius_m=radius_m,
+            page=page,
+            total_open=total_open,
+            has_next_page=page * BOUNTIES_PER_PAGE < total_open,
         )
 
     # ---------- Claim Bounty ----------
@@ -439,17 +543,23 @@ def init_bounty_routes(app):
 
         now = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-        conn.execute(
+        # hanya berhasil kalau bounty masih OPEN saat UPDATE dijalankan,
+        # jadi dua cleaner yang claim bersamaan tidak bisa sama-sama menang
+        cur = conn.execute(
             """
             UPDATE bounties
             SET cleaner_id = ?, status = 'CLAIMED', claimed_at = ?
-            WHERE id = ?
+            WHERE id = ? AND status = 'OPEN' AND reporter_id != ?
             """,
-            (user["user_id"], now, bounty_id),
+            (user["user_id"], now, bounty_id, user["user_id"]),
         )
         conn.commit()
         conn.close()
 
+        if cur.rowcount != 1:
+            flash("Bounty sudah diambil atau selesai.", "error")
+            return redirect(url_for("bounty_list"))
+
         flash(
             "Bounty berhasil kamu ambil. Bersihkan dan upload foto AFTER.",
             "success",
@@ -478,6 +588,29 @@ def init_bounty_routes(app):
             flash("Bounty ini bukan milikmu sebagai cleaner.", "error")
             return redirect(url_for("bounty_list"))
 
+        job = _get_own_job(request.args.get("job", type=int), user)
+        if job and (job["bounty_id"] != bounty_id or job["phase"] != "AFTER"):
+            job = None
+
+        pending_job = None
+        if job and job["status"] in ("QUEUED", "RUNNING"):
+            pending_job = job["id"]
+        elif job and job["status"] == "DONE":
+            if job_result(job).get("passed"):
+                flash(
+                    f"Bounty selesai! Kamu mendapatkan {bounty['points_cleaner']} poin sebagai cleaner.",
+                    "success",
+                )
+                return redirect(url_for("index"))
+            if bounty["status"] != "COMPLETED":
+                flash(
+                    "Sistem masih mendeteksi objek sampah pada foto AFTER. "
+                    "Bounty belum bisa diselesaikan. Bersihkan lagi dan upload ulang.",
+                    "error",
+                )
+        elif job:
+            flash("Foto AFTER gagal diproses. Silakan upload ulang.", "error")
+
         if bounty["status"] == "COMPLETED":
             flash("Bounty ini sudah selesai.", "info")
             return redirect(url_for("bounty_list"))
@@ -532,58 +665,34 @@ def init_bounty_routes(app):
                 flash("Format file tidak didukung.", "error")
                 return redirect(url_for("bounty_complete", bounty_id=bounty_id))
 
-            ext = file.filename.rsplit(".", 1)[1].lower()
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            after_filename = f"after_{timestamp}.{ext}"
-            after_path = os.path.join(app.config["UPLOAD_FOLDER"], after_filename)
-            file.save(after_path)
-
-            # YOLO untuk AFTER
-            results_after = model.predict(after_path, imgsz=736, save=False)
-            result_after = results_after[0]
-
-            after_detections = []
-            if result_after.boxes is not None and len(result_after.boxes) > 0:
-                classes = result_after.boxes.cls.tolist()
-                scores = result_after.boxes.conf.tolist()
-                for cls_id, conf in zip(classes, scores):
-                    cls_id = int(cls_id)
-                    label = result_after.names.get(cls_id, str(cls_id))
-                    after_detections.append(
-                        {
-                            "label": label,
-                            "confidence": round(float(conf) * 100, 2),
-                        }
-                    )
+            if _detection_busy():
+                return _busy_response()
 
-            if after_detections:
-                flash(
-                    "Sistem masih mendeteksi objek sampah pada foto AFTER. "
-                    "Bounty belum bisa diselesaikan. Bersihkan lagi dan upload ulang.",
-                    "error",
-                )
+            try:
+                data, image_sha, ext = receive_upload(file)
+            except UploadRejected as e:
+                flash(str(e), "error")
                 return redirect(url_for("bounty_complete", bounty_id=bounty_id))
 
-            # kalau lolos semua, tandai COMPLETED
-            now = datetime.now().strftime("%Y%m%d_%H%M%S")
-
             conn = get_db_connection()
-            conn.execute(
-                """
-                UPDATE bounties
-                SET after_image = ?, status = 'COMPLETED', completed_at = ?
-                WHERE id = ?
-                """,
-                (after_filename, now, bounty_id),
+            after_filename, image_sha = save_upload(
+                conn, data, "after", ext, app.config["UPLOAD_FOLDER"],
+                sha=image_sha,
+                write=lambda path, d: store_async(path, d, image_sha),
+            )
+            decode_async(image_sha, data)
+            claim_image_for_bounty(conn, image_sha, bounty_id)
+
+            # YOLO untuk AFTER dijalankan detection worker; bounty ditandai
+            # COMPLETED oleh worker kalau tidak ada sampah tersisa
+            job_id = enqueue_detection_job(
+                conn, bounty_id, user["user_id"], "AFTER", after_filename, image_sha
             )
             conn.commit()
             conn.close()
 
-            flash(
-                f"Bounty selesai! Kamu mendapatkan {bounty['points_cleaner']} poin sebagai cleaner.",
-                "success",
-            )
-            return redirect(url_for("index"))
+            flash("Foto AFTER diterima. Sistem sedang memeriksa gambar...", "info")
+            return redirect(url_for("bounty_complete", bounty_id=bounty_id, job=job_id))
 
         # GET: tampilkan halaman complete
         before_url = url_for("static", filename=f"upload/{bounty['before_image']}")
@@ -593,6 +702,7 @@ def init_bounty_routes(app):
             user=user,
             bounty=bounty,
             before_url=before_url,
+            pending_job=pending_job,
         )
     @app.route("/admin/rewards", methods=["GET"])
     def admin_rewards():
@@ -602,19 +712,66 @@ def init_bounty_routes(app):
             flash("Akses ditolak. Halaman ini hanya untuk admin.", "error")
             return redirect(url_for("index"))
 
+        # filter + keyset pagination di server (lihat redemptions.py)
+        filters = parse_filters(request.args)
+        conn = get_db_connection()
+        rows, next_cursor, prev_cursor = list_page(
+            conn,
+            filters,
+            before=request.args.get("before"),
+            after=request.args.get("after"),
+        )
+        counts = status_counts(conn, filters)
+        conn.close()
+
+        return render_template(
+            "admin_rewards.html",
+            redemptions=rows,
+            user=user,
+            filters=filters,
+            counts=counts,
+            statuses=REDEMPTION_STATUSES,
+            wallet_types=WALLET_TYPES,
+            next_cursor=next_cursor,
+            prev_cursor=prev_cursor,
+        )
+
+    @app.route("/admin/rewards/export.csv", methods=["GET"])
+    def admin_rewards_export():
+        user = current_user()
+
+        if not user or user["role"] != "admin":
+            flash("Akses ditolak. Halaman ini hanya untuk admin.", "error")
+            return redirect(url_for("index"))
+
+        # baris di-stream per potongan, tidak ditampung semua di memori
+        filename = f"redeem_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        return Response(
+            iter_csv(parse_filters(request.args)),
+            mimetype="text/csv",
+            headers={"Content-Disposition": f"attachment; filename={filename}"},
+        )
+
+    @app.route("/admin/fraud-flags", methods=["GET"])
+    def admin_fraud_flags():
+        user = current_user()
+
+        if not user or user["role"] != "admin":
+            return jsonify({"error": "forbidden"}), 403
+
         conn = get_db_connection()
         rows = conn.execute(
             """
-            SELECT id, user_id, wallet_type, full_name, phone,
-                points, amount, status, reason, requested_at
-            FROM reward_redemptions
-            ORDER BY datetime(requested_at) DESC
+            SELECT id, bounty_id, user_id, phase, kind, matched_bounty_id,
+                distance, created_at
+            FROM fraud_flags
+            ORDER BY id DESC
+            LIMIT 200
             """
         ).fetchall()
         conn.close()
 
-        return render_template("admin_rewards.html", redemptions=rows, user=user)
-
+        return jsonify([dict(r) for r in rows])
 
     @app.route("/admin/rewards/update/<int:reward_id>", methods=["POST"])
     def admin_update_reward(reward_id):
@@ -644,16 +801,19 @@ def init_bounty_routes(app):
         if new_status == "FAILED":
             # Hanya bisa dikembalikan jika status sebelumnya masih pending
             if row["status"] == "PENDING":
-                conn.execute(
+                cur = conn.execute(
                     """
                     UPDATE reward_redemptions
                     SET status = 'FAILED', reason = ?
-                    WHERE id = ?
+                    WHERE id = ? AND status = 'PENDING'
                     """,
                     (reason, reward_id),
                 )
-                # Tidak perlu update poin di tabel bounty.
-                # Poin otomatis kembali karena redeemed tidak dihitung lagi.
+                # Poin dikembalikan lewat ledger, di transaksi yang sama
+                if cur.rowcount == 1:
+                    record_redemption_refund(
+                        conn, reward_id, row["user_id"], row["points"]
+                    )
             else:
                 flash("Status tidak bisa diubah ke FAILED karena bukan PENDING.", "error")
                 conn.close()
@@ -661,22 +821,146 @@ def init_bounty_routes(app):
 
         # Jika admin memilih PAID
         elif new_status == "PAID":
-            conn.execute(
+            # status sebelumnya ikut dicek, supaya potong ulang poin di bawah
+            # tidak jalan dua kali kalau ada update lain di antaranya
+            cur = conn.execute(
                 """
                 UPDATE reward_redemptions
                 SET status = 'PAID', reason = NULL
-                WHERE id = ?
+                WHERE id = ? AND status = ? AND status != 'PAID'
                 """,
-                (reward_id,),
+                (reward_id, row["status"]),
             )
+            # FAILED -> PAID: poin yang sudah dikembalikan dipotong lagi
+            if cur.rowcount == 1 and row["status"] == "FAILED":
+                record_redemption_reinstated(
+                    conn, reward_id, row["user_id"], row["points"]
+                )
         else:
             flash("Status tidak valid.", "error")
             conn.close()
             return redirect(url_for("admin_rewards"))
 
+        if cur.rowcount != 1:
+            # sudah PAID, atau status berubah (admin lain / file batch) sejak dibaca
+            conn.rollback()
+            conn.close()
+            flash("Status reward tidak diubah: reward sudah PAID atau statusnya berubah.", "error")
+            return redirect(request.referrer or url_for("admin_rewards"))
+
         conn.commit()
         conn.close()
 
         flash("Status reward berhasil diperbarui.", "success")
-        return redirect(url_for("admin_rewards"))
+        # kembali ke halaman + filter yang sedang dibuka admin
+        return redirect(request.referrer or url_for("admin_rewards"))
+
+
+    # ---------- Pembayaran Massal (batch per e-wallet) ----------
+    @app.route("/admin/payouts", methods=["GET"])
+    def admin_payouts():
+        user = current_user()
+
+        if not user or user["role"] != "admin":
+            flash("Akses ditolak. Halaman ini hanya untuk admin.", "error")
+            return redirect(url_for("index"))
+
+        conn = get_db_connection()
+        pending = pending_by_wallet(conn)
+        batches = recent_batches(conn)
+        conn.close()
+
+        return render_template(
+            "admin_payouts.html",
+            user=user,
+            pending=pending,
+            batches=batches,
+            batch_max_items=BATCH_MAX_ITEMS,
+        )
+
+    @app.route("/admin/payouts/create", methods=["POST"])
+    def admin_create_payout():
+        user = current_user()
+
+        if not user or user["role"] != "admin":
+            flash("Akses ditolak.", "error")
+            return redirect(url_for("index"))
+
+        wallet_type = (request.form.get("wallet_type") or "").upper()
+        limit = request.form.get("limit", type=int) or BATCH_MAX_ITEMS
+        if wallet_type not in WALLET_TYPES:
+            flash("Pilih jenis e-wallet yang valid.", "error")
+            return redirect(url_for("admin_payouts"))
+
+        conn = get_db_connection()
+        batch_id = create_batch(
+            conn, wallet_type, user["user_id"], min(max(limit, 1), BATCH_MAX_ITEMS)
+        )
+        conn.close()
+
+        if batch_id is None:
+            flash(f"Tidak ada redeem PENDING {wallet_type} yang belum masuk batch.", "error")
+        else:
+            flash(f"Batch #{batch_id} ({wallet_type}) dibuat. Unduh file batch-nya.", "success")
+        return redirect(url_for("admin_payouts"))
+
+    @app.route("/admin/payouts/<int:batch_id>/file.csv", methods=["GET"])
+    def admin_payout_file(batch_id):
+        user = current_user()
 
+        if not user or user["role"] != "admin":
+            flash("Akses ditolak.", "error")
+            return redirect(url_for("index"))
+
+        conn = get_db_connection()
+        batch = get_batch(conn, batch_id)
+        conn.close()
+        if not batch:
+            abort(404)
+
+        filename = f"payout_{batch_id}_{batch['wallet_type'].lower()}.csv"
+        return Response(
+            iter_batch_csv(batch_id),
+            mimetype="text/csv",
+            headers={"Content-Disposition": f"attachment; filename={filename}"},
+        )
+
+    @app.route("/admin/payouts/<int:batch_id>/apply", methods=["POST"])
+    def admin_apply_payout(batch_id):
+        user = current_user()
+
+        if not user or user["role"] != "admin":
+            flash("Akses ditolak.", "error")
+            return redirect(url_for("index"))
+
+        file = request.files.get("file")
+        if not file or not file.filename:
+            flash("Pilih file rekonsiliasi (CSV) terlebih dahulu.", "error")
+            return redirect(url_for("admin_payouts"))
+
+        try:
+            results, invalid = parse_results(file.read().decode("utf-8-sig"))
+        except (UnicodeDecodeError, csv.Error, PayoutFileError) as e:
+            flash(f"File rekonsiliasi tidak bisa dibaca: {e}", "error")
+            return redirect(url_for("admin_payouts"))
+
+        conn = get_db_connection()
+        if not get_batch(conn, batch_id):
+            conn.close()
+            abort(404)
+        # semua baris dalam satu transaksi (executemany), aturan status per baris
+        outcome = apply_results(conn, batch_id, results)
+        conn.close()
+
+        flash(
+            f"Batch #{batch_id}: {outcome['paid']} PAID, {outcome['failed']} GAGAL, "
+            f"{outcome['unchanged']} tidak berubah.",
+            "success",
+        )
+        rejected = [f"baris {line}: {why}" for line, why in invalid] + [
+            f"#{rid}: {why}" for rid, why in outcome["rejected"]
+        ]
+        if rejected:
+            more = f" (+{len(rejected) - 10} lainnya)" if len(rejected) > 10 else ""
+            flash(f"{len(rejected)} baris ditolak: " + "; ".join(rejected[:10]) + more, "error")
+        return redirect(url_for("admin_payouts"))
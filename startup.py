@@ -0,0 +1,100 @@
+"""
+Catatan biaya startup: berapa lama import dan tiap tahap inisialisasi.
+
+    python startup.py               # laporan startup app (model belum dimuat)
+    python startup.py --with-model  # + load model & satu inference dummy
+
+Di app, set STARTUP_REPORT=1 supaya laporan dicetak setelah create_app().
+"""
+import sys
+import time
+import threading
+import subprocess
+from contextlib import contextmanager
+
+_timings = []
+_lock = threading.Lock()
+
+
+def record(stage, seconds):
+    with _lock:
+        _timings.append((stage, seconds))
+
+
+@contextmanager
+def timed(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def timings():
+    with _lock:
+        return list(_timings)
+
+
+def format_report(title="Startup report"):
+    lines = [f"=== {title} ==="]
+    for stage, seconds in timings():
+        lines.append(f"  {stage:36s} {seconds * 1000:9.1f} ms")
+    return "\n".join(lines)
+
+
+def import_costs(module, top=15):
+    """
+    Jalankan `python -X importtime -c "import <module>"` di proses baru dan
+    jumlahkan waktu import (self) per package top-level: list (nama, ms).
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    costs = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        try:
+            self_us = int(self_us.strip())
+        except ValueError:
+            continue  # baris header
+        package = name.strip().split(".")[0]
+        costs[package] = costs.get(package, 0) + self_us
+    ranked = sorted(costs.items(), key=lambda kv: kv[1], reverse=True)[:top]
+    return [(name, us / 1000) for name, us in ranked]
+
+
+def main(argv):
+    # dipanggil lewat modul `startup` (bukan __main__) supaya catatan
+    # dari app/ml masuk ke list _timings yang sama
+    with_model = "--with-model" in argv
+
+    print("=== Import paling mahal per package (import app) ===")
+    for name, ms in import_costs("app"):
+        print(f"  {name:36s} {ms:9.1f} ms")
+
+    with timed("import app (total)"):
+        import app  # noqa: F401
+
+    if with_model:
+        import numpy as np
+        import ml
+
+        with timed("inference dummy pertama"):
+            ml.get_model().predict(
+                np.zeros((736, 736, 3), dtype=np.uint8),
+                imgsz=736,
+                save=False,
+                verbose=False,
+            )
+
+    print(format_report())
+
+
+if __name__ == "__main__":
+    import startup
+
+    startup.main(sys.argv[1:])
@@ -0,0 +1,119 @@
+"""
+Fixture bersama: app Flask dengan database sementara per test.
+
+Worker deteksi & dispatcher notifikasi tidak dijalankan, hash password
+memakai parameter ringan supaya test cepat.
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ["DETECTION_WORKERS"] = "0"
+os.environ["NOTIFY_WORKERS"] = "0"
+os.environ["PASSWORD_HASH_METHOD"] = "pbkdf2:sha256:1000"
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    # app.py membuat waste.db dan folder static/ di direktori kerja
+    workdir = tmp_path_factory.mktemp("app")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        from app import app as flask_app
+    finally:
+        os.chdir(cwd)
+    flask_app.config["TESTING"] = True
+    return flask_app
+
+
+@pytest.fixture
+def conn(app, tmp_path):
+    """Koneksi ke database baru (skema terbaru) yang dipakai app selama test ini."""
+    import db
+    import login_throttle
+    import user_context
+
+    old_path = db.DB_PATH
+    db.DB_PATH = str(tmp_path / "waste.db")
+    db.init_db()
+    user_context._users.clear()
+    login_throttle._blocked.clear()
+    login_throttle._last_cleanup = 0.0
+
+    conn = db.get_db_connection()
+    yield conn
+    conn.close()
+    db.close_all_connections()
+    db.DB_PATH = old_path
+
+
+@pytest.fixture
+def make_user(conn):
+    from passwords import hash_password
+
+    def make_user(user_id, password="rahasia", role=None, password_hash=None):
+        conn.execute(
+            """
+            INSERT INTO users (user_id, name, region, phone, password_hash, role)
+            VALUES (?, ?, 'X', '+6281200000000', ?, ?)
+            """,
+            (user_id, user_id.title(), password_hash or hash_password(password), role),
+        )
+        conn.commit()
+        return user_id
+
+    return make_user
+
+
+@pytest.fixture
+def make_bounty(conn):
+    import ledger
+
+    def make_bounty(reporter_id, status="OPEN", cleaner_id=None,
+                    points_reporter=0, points_cleaner=0):
+        """Bounty di (0, 0); poin bounty COMPLETED langsung dicatat di ledger."""
+        cur = conn.execute(
+            """
+            INSERT INTO bounties
+                (reporter_id, cleaner_id, status, latitude, longitude, location,
+                 before_image, points_reporter, points_cleaner, created_at)
+            VALUES (?, ?, ?, 0, 0, 'x', 'b.jpg', ?, ?, '20250101_000000')
+            """,
+            (reporter_id, cleaner_id, status, points_reporter, points_cleaner),
+        )
+        if status == "COMPLETED":
+            ledger.record_bounty_completed(conn, cur.lastrowid)
+        conn.commit()
+        return cur.lastrowid
+
+    return make_bounty
+
+
+@pytest.fixture
+def client_for(app, conn):
+    """client_for(user_id): test client yang sudah login sebagai user itu."""
+
+    def client_for(user_id, ip="127.0.0.1"):
+        client = app.test_client()
+        client.environ_base["REMOTE_ADDR"] = ip
+        with client.session_transaction() as sess:
+            sess["user_id"] = user_id
+        return client
+
+    return client_for
+
+
+def flashes(client):
+    """Pesan flash terakhir di session client, list (kategori, pesan)."""
+    with client.session_transaction() as sess:
+        return sess.pop("_flashes", [])
+
+
+@pytest.fixture
+def get_flashes():
+    return flashes
@@ -0,0 +1,95 @@
+"""Claim bounty dan redeem poin dari banyak request bersamaan."""
+from concurrent.futures import ThreadPoolExecutor
+
+import ledger
+
+
+def run_parallel(funcs, workers=8):
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda f: f(), funcs))
+
+
+def test_each_bounty_claimed_once(conn, make_user, make_bounty, client_for):
+    make_user("reporter")
+    cleaners = [make_user(f"cleaner{i}") for i in range(6)]
+    bounty_ids = [make_bounty("reporter") for _ in range(10)]
+
+    def claim(cleaner, bounty_id):
+        def run():
+            response = client_for(cleaner).post(f"/bounty/{bounty_id}/claim?lat=0&lon=0")
+            return cleaner, bounty_id, response.location.endswith("/complete")
+        return run
+
+    results = run_parallel(
+        [claim(c, b) for b in bounty_ids for c in cleaners], workers=len(cleaners)
+    )
+
+    winners = {}
+    for cleaner, bounty_id, won in results:
+        if won:
+            assert bounty_id not in winners, "bounty diklaim dua kali"
+            winners[bounty_id] = cleaner
+    assert set(winners) == set(bounty_ids)
+
+    rows = conn.execute("SELECT id, status, cleaner_id FROM bounties").fetchall()
+    for row in rows:
+        assert row["status"] == "CLAIMED"
+        assert row["cleaner_id"] == winners[row["id"]]
+
+
+def test_reporter_cannot_claim_own_bounty(conn, make_user, make_bounty, client_for, get_flashes):
+    make_user("reporter")
+    bounty_id = make_bounty("reporter")
+
+    client = client_for("reporter")
+    response = client.post(f"/bounty/{bounty_id}/claim?lat=0&lon=0")
+
+    assert response.location.endswith("/bounties")
+    assert get_flashes(client)[0][0] == "error"
+    status = conn.execute("SELECT status FROM bounties WHERE id = ?", (bounty_id,)).fetchone()[0]
+    assert status == "OPEN"
+
+
+def test_parallel_redeem_never_overdraws(conn, make_user, make_bounty, client_for):
+    users = [make_user(f"user{i}") for i in range(4)]
+    for user_id in users:
+        make_bounty(user_id, status="COMPLETED", points_reporter=1000)
+
+    def redeem(user_id):
+        def run():
+            client_for(user_id).post(
+                "/rewards/redeem",
+                data={
+                    "wallet_type": "DANA",
+                    "full_name": user_id,
+                    "phone": "+6281200000000",
+                    "amount": "300",
+                },
+            )
+        return run
+
+    # 5 x 300 poin per user, saldo hanya cukup untuk 3
+    run_parallel([redeem(u) for u in users for _ in range(5)])
+
+    for user_id in users:
+        redeemed = conn.execute(
+            "SELECT COUNT(*), SUM(points) FROM reward_redemptions WHERE user_id = ?",
+            (user_id,),
+        ).fetchone()
+        assert tuple(redeemed) == (3, 900)
+        assert ledger.get_balance(conn, user_id) == 100
+    assert ledger.find_drift(conn) == []
+
+
+def test_redeem_all_points(conn, make_user, make_bounty, client_for):
+    make_user("alice")
+    make_bounty("alice", status="COMPLETED", points_reporter=250)
+
+    client = client_for("alice")
+    data = {"wallet_type": "OVO", "full_name": "Alice", "phone": "+62812"}
+    client.post("/rewards/redeem", data=data)
+    client.post("/rewards/redeem", data=data)
+
+    rows = conn.execute("SELECT points FROM reward_redemptions").fetchall()
+    assert [r["points"] for r in rows] == [250]
+    assert ledger.get_balance(conn, "alice") == 0
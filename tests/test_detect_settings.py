@@ -0,0 +1,52 @@
+"""Mode adaptif: hanya temuan pasti di pass low-res yang menghentikan deteksi."""
+from detect_settings import DetectSettings, detect_with_settings
+
+
+def fake_detect(results_by_imgsz):
+    calls = []
+
+    def detect(image, imgsz, **options):
+        calls.append(imgsz)
+        return results_by_imgsz[imgsz]
+
+    return detect, calls
+
+
+def box(confidence):
+    return {"label": "plastic", "confidence": confidence}
+
+
+def settings():
+    return DetectSettings(imgsz=736, low_imgsz=416, adaptive=True, early_exit=True)
+
+
+def test_empty_low_res_is_checked_at_full_resolution():
+    detect, calls = fake_detect({416: [], 736: [box(40.0)]})
+
+    detections, outcome = detect_with_settings(detect, "img", settings())
+
+    assert calls == [416, 736]
+    assert (detections, outcome) == ([box(40.0)], "clean_check")
+
+
+def test_clean_only_after_full_resolution_pass():
+    detect, calls = fake_detect({416: [], 736: []})
+
+    assert detect_with_settings(detect, "img", settings()) == ([], "clean_check")
+    assert calls == [416, 736]
+
+
+def test_sure_hit_short_circuits():
+    detect, calls = fake_detect({416: [box(90.0), box(20.0)]})
+
+    assert detect_with_settings(detect, "img", settings()) == ([box(90.0)], "early_exit")
+    assert calls == [416]
+
+
+def test_borderline_is_rerun():
+    detect, calls = fake_detect({416: [box(30.0)], 736: [box(35.0)]})
+    after = settings()
+    after.early_exit = False
+
+    assert detect_with_settings(detect, "img", after) == ([box(35.0)], "high")
+    assert calls == [416, 736]
@@ -0,0 +1,47 @@
+"""Jalur satu gambar dan batch di proses detector memakai decode yang sama."""
+import numpy as np
+import pytest
+from PIL import Image
+
+import detector_pool
+
+
+class FakeResult:
+    boxes = None
+
+    def __init__(self, image):
+        self.orig_shape = image.shape[:2]
+
+
+class FakeModel:
+    def __init__(self):
+        self.inputs = []
+
+    def predict(self, source, **kwargs):
+        images = source if isinstance(source, list) else [source]
+        self.inputs.extend(images)
+        return [FakeResult(image) for image in images]
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(detector_pool, "_worker_model", model)
+    return model
+
+
+def test_single_and_batch_decode_alike(tmp_path, model):
+    # foto miring (EXIF orientation 6) lebih besar dari INFER_MAX_SIDE
+    path = tmp_path / "miring.jpg"
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    Image.new("RGB", (2000, 1000), (0, 200, 0)).save(path, exif=exif)
+
+    detector_pool._worker_detect(str(path), 736, {})
+    detector_pool._worker_detect(path.read_bytes(), 736, {})
+    detector_pool._worker_detect_batch([str(path)], 736, {})
+
+    single, from_bytes, batched = model.inputs
+    assert single.shape == batched.shape == (736, 368, 3)
+    assert np.array_equal(single, batched)
+    assert np.array_equal(from_bytes, batched)
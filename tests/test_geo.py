@@ -0,0 +1,63 @@
+"""Bounty OPEN di sekitar lokasi: radius, k terdekat, dan halaman /bounties."""
+from geo import k_nearest_open_bounties, nearby_open_bounties
+
+# ~111 m per 0.001 derajat lintang
+METERS_PER_MILLIDEGREE = 111.2
+
+
+def add_bounty(conn, reporter_id, lat, status="OPEN"):
+    cur = conn.execute(
+        """
+        INSERT INTO bounties
+            (reporter_id, status, latitude, longitude, location, before_image,
+             points_reporter, points_cleaner, created_at)
+        VALUES (?, ?, ?, 0, 'x', 'b.jpg', 10, 20, '20250101_000000')
+        """,
+        (reporter_id, status, lat),
+    )
+    conn.commit()
+    return cur.lastrowid
+
+
+def test_nearby_sorted_and_paged(conn, make_user):
+    make_user("reporter")
+    ids = [add_bounty(conn, "reporter", lat) for lat in (0.0004, 0.0001, 0.0003, 0.0002)]
+    add_bounty(conn, "reporter", 0.0001, status="CLAIMED")
+    add_bounty(conn, "reporter", 0.01)  # ~1.1 km
+
+    rows, total = nearby_open_bounties(conn, 0, 0, 100, limit=2, offset=1)
+
+    assert total == 4
+    assert [r["id"] for r in rows] == [ids[3], ids[2]]
+    assert rows[0]["distance_m"] < rows[1]["distance_m"]
+
+
+def test_k_nearest_expands_radius(conn, make_user):
+    make_user("reporter")
+    make_user("alice")
+    far = [add_bounty(conn, "reporter", lat) for lat in (0.02, 0.005, 0.04)]
+    add_bounty(conn, "alice", 0.001)  # milik sendiri: tidak ikut
+
+    rows = k_nearest_open_bounties(conn, 0, 0, 2, exclude_reporter="alice")
+
+    assert [r["id"] for r in rows] == [far[1], far[0]]
+    assert abs(rows[0]["distance_m"] - 5 * METERS_PER_MILLIDEGREE) < 5
+
+
+def test_k_nearest_stops_at_max_radius(conn, make_user):
+    make_user("reporter")
+    add_bounty(conn, "reporter", 0.5)  # ~55 km
+
+    assert k_nearest_open_bounties(conn, 0, 0, 3, max_radius_m=5000) == []
+
+
+def test_bounty_page_shows_nearest_outside_radius(conn, make_user, client_for):
+    make_user("reporter")
+    make_user("alice")
+    bounty_id = add_bounty(conn, "reporter", 0.01)
+
+    page = client_for("alice").get("/bounties?lat=0&lon=0").get_data(as_text=True)
+
+    assert "Tidak ada bounty OPEN dalam radius 100 m" in page
+    assert "Bounty OPEN terdekat" in page
+    assert f"Bounty #{bounty_id}" in page
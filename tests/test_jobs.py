@@ -0,0 +1,33 @@
+"""Antrian job deteksi: job RUNNING milik worker yang mati kembali ke antrian."""
+import jobs
+
+
+def running_job(conn, started_at):
+    job_id = jobs.enqueue_detection_job(conn, 1, "alice", "BEFORE", "before_1.jpg")
+    conn.execute(
+        "UPDATE detection_jobs SET status = 'RUNNING', started_at = ? WHERE id = ?",
+        (started_at, job_id),
+    )
+    conn.commit()
+    return job_id
+
+
+def status(conn, job_id):
+    return conn.execute("SELECT status FROM detection_jobs WHERE id = ?", (job_id,)).fetchone()[0]
+
+
+def test_pool_requeues_stale_jobs_while_running(conn, monkeypatch):
+    pool = jobs.DetectionWorkerPool("upload", "result")
+    pool._requeue_stale()  # seperti saat start()
+
+    stale = running_job(conn, "20200101_000000")
+    fresh = running_job(conn, jobs._now())
+
+    # belum STALE_AFTER_SECONDS sejak cek terakhir: belum dicek lagi
+    pool._requeue_stale()
+    assert status(conn, stale) == "RUNNING"
+
+    monkeypatch.setattr(jobs, "STALE_AFTER_SECONDS", 0)
+    pool._requeue_stale()
+    assert status(conn, stale) == "QUEUED"
+    assert status(conn, fresh) == "RUNNING"
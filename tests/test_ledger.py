@@ -0,0 +1,61 @@
+"""Ledger poin: saldo = jumlah event, idempoten, rebuild dari data sumber."""
+import ledger
+
+
+def test_balance_equals_sum_of_events(conn, make_user, make_bounty):
+    make_user("alice")
+    make_user("bob")
+    make_bounty("alice", status="COMPLETED", cleaner_id="bob",
+                points_reporter=100, points_cleaner=40)
+    make_bounty("bob", status="COMPLETED", points_reporter=70)
+    ledger.record_redemption(conn, 1, "alice", 30)
+    conn.commit()
+
+    events = dict(conn.execute(
+        "SELECT user_id, SUM(delta) FROM point_events GROUP BY user_id"
+    ).fetchall())
+    balances = dict(conn.execute("SELECT user_id, balance FROM user_balances").fetchall())
+    assert balances == events == {"alice": 70, "bob": 110}
+
+
+def test_record_event_is_idempotent(conn, make_user, make_bounty):
+    make_user("alice")
+    bounty_id = make_bounty("alice", status="COMPLETED", points_reporter=100)
+
+    ledger.record_bounty_completed(conn, bounty_id)
+    assert ledger.record_events(conn, [("alice", 100, "BOUNTY_REPORTER", bounty_id)]) == 0
+    conn.commit()
+
+    assert ledger.get_balance(conn, "alice") == 100
+    assert ledger.find_drift(conn) == []
+
+
+def test_rebuild_fixes_drift(conn, make_user, make_bounty):
+    make_user("alice")
+    make_bounty("alice", status="COMPLETED", points_reporter=100)
+    conn.execute("UPDATE user_balances SET balance = 5 WHERE user_id = 'alice'")
+    conn.commit()
+    assert ledger.find_drift(conn) == [("alice", 5, 100, 100)]
+
+    ledger.rebuild(conn)
+    conn.commit()
+    assert ledger.find_drift(conn) == []
+
+
+def test_failed_redemption_is_refunded(conn, make_user, make_bounty):
+    make_user("alice")
+    make_bounty("alice", status="COMPLETED", points_reporter=100)
+    cur = conn.execute(
+        """
+        INSERT INTO reward_redemptions
+            (user_id, wallet_type, full_name, phone, points, amount, status, requested_at)
+        VALUES ('alice', 'DANA', 'A', '+62812', 60, 60, 'FAILED', '2025-01-01T00:00:00')
+        """
+    )
+    ledger.record_redemption(conn, cur.lastrowid, "alice", 60)
+    ledger.record_redemption_refund(conn, cur.lastrowid, "alice", 60)
+    conn.commit()
+
+    assert ledger.get_balance(conn, "alice") == 100
+    assert ledger.expected_balances(conn) == {"alice": 100}
+    assert ledger.find_drift(conn) == []
@@ -0,0 +1,148 @@
+"""Rate limit login (sebelum hash password) dan rehash-on-login."""
+import threading
+
+import pytest
+
+import login_throttle
+import routes_auth
+from passwords import verify_password
+
+
+@pytest.fixture
+def verify_calls(monkeypatch):
+    """Hitung berapa kali password benar-benar di-hash."""
+    calls = []
+
+    def counting_verify(password_hash, password):
+        calls.append(password)
+        return verify_password(password_hash, password)
+
+    monkeypatch.setattr(routes_auth, "verify_password", counting_verify)
+    return calls
+
+
+def login(app, user_id, password, ip="10.0.0.1"):
+    client = app.test_client()
+    client.environ_base["REMOTE_ADDR"] = ip
+    response = client.post("/login", data={"user_id": user_id, "password": password})
+    with client.session_transaction() as sess:
+        return response, sess.get("user_id"), sess.get("_flashes", [])
+
+
+def test_user_throttled_before_hashing(app, make_user, verify_calls):
+    make_user("alice", password="benar")
+
+    for _ in range(login_throttle.MAX_PER_USER):
+        _, logged_in, _ = login(app, "alice", "salah")
+        assert logged_in is None
+    assert len(verify_calls) == login_throttle.MAX_PER_USER
+
+    # password benar pun ditolak selama window, tanpa hash
+    _, logged_in, flashes = login(app, "alice", "benar")
+    assert logged_in is None
+    assert "Terlalu banyak percobaan login" in flashes[-1][1]
+    assert len(verify_calls) == login_throttle.MAX_PER_USER
+
+
+def test_ip_limit(app, make_user, monkeypatch):
+    monkeypatch.setattr(login_throttle, "MAX_PER_IP", 3)
+    for i in range(4):
+        make_user(f"user{i}", password="benar")
+
+    for i in range(3):
+        assert login(app, f"user{i}", "salah")[1] is None
+    _, logged_in, flashes = login(app, "user3", "benar")
+    assert logged_in is None
+    assert "Terlalu banyak percobaan login" in flashes[-1][1]
+
+    # IP lain tidak ikut terblokir
+    assert login(app, "user3", "benar", ip="10.0.0.2")[1] == "user3"
+
+
+def test_success_clears_user_window(app, conn, make_user):
+    make_user("alice", password="benar")
+
+    for _ in range(login_throttle.MAX_PER_USER - 1):
+        login(app, "alice", "salah")
+    assert login(app, "alice", "benar")[1] == "alice"
+
+    count = conn.execute(
+        "SELECT COUNT(*) FROM login_attempts WHERE key = 'user:alice'"
+    ).fetchone()[0]
+    assert count == 0
+    assert login(app, "alice", "salah")[1] is None
+    assert login(app, "alice", "benar")[1] == "alice"
+
+
+def test_rehash_on_login(app, conn, make_user):
+    from werkzeug.security import generate_password_hash
+
+    old_hash = generate_password_hash("benar", "pbkdf2:sha256:2000")
+    make_user("alice", password_hash=old_hash)
+
+    assert login(app, "alice", "benar")[1] == "alice"
+
+    new_hash = conn.execute(
+        "SELECT password_hash FROM users WHERE user_id = 'alice'"
+    ).fetchone()[0]
+    assert new_hash != old_hash
+    assert new_hash.startswith("pbkdf2:sha256:1000$")
+    assert verify_password(new_hash, "benar") == (True, False)
+    # hash baru tetap bisa dipakai login
+    assert login(app, "alice", "benar")[1] == "alice"
+
+
+def test_wrong_password_keeps_old_hash(app, conn, make_user):
+    from werkzeug.security import generate_password_hash
+
+    old_hash = generate_password_hash("benar", "pbkdf2:sha256:2000")
+    make_user("alice", password_hash=old_hash)
+
+    assert login(app, "alice", "salah")[1] is None
+
+    stored = conn.execute("SELECT password_hash FROM users WHERE user_id = 'alice'").fetchone()[0]
+    assert stored == old_hash
+
+
+def test_hashing_slot_busy(app, make_user, monkeypatch, verify_calls):
+    make_user("alice", password="benar")
+    slots = threading.BoundedSemaphore(1)
+    monkeypatch.setattr(login_throttle, "_hash_slots", slots)
+    monkeypatch.setattr(login_throttle, "HASH_WAIT_SECONDS", 0.01)
+
+    slots.acquire()
+    try:
+        _, logged_in, flashes = login(app, "alice", "benar")
+    finally:
+        slots.release()
+
+    assert logged_in is None
+    assert "Server sedang sibuk" in flashes[-1][1]
+    assert verify_calls == []
+    assert login(app, "alice", "benar")[1] == "alice"
+
+
+def test_register_waits_for_hashing_slot(app, conn, monkeypatch):
+    slots = threading.BoundedSemaphore(1)
+    monkeypatch.setattr(login_throttle, "_hash_slots", slots)
+    monkeypatch.setattr(login_throttle, "HASH_WAIT_SECONDS", 0.01)
+    form = {
+        "user_id": "bob",
+        "name": "Bob",
+        "phone": "+6281200000000",
+        "password": "rahasia",
+        "password_confirm": "rahasia",
+    }
+    client = app.test_client()
+
+    slots.acquire()
+    try:
+        client.post("/register", data=form)
+    finally:
+        slots.release()
+    with client.session_transaction() as sess:
+        assert "Server sedang sibuk" in sess["_flashes"][-1][1]
+    assert conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0
+
+    client.post("/register", data=form)
+    assert conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 1
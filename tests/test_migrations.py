@@ -0,0 +1,20 @@
+"""Skema terbaru dan query plan query yang sering dijalankan."""
+import migrations
+
+
+def test_schema_is_latest(conn):
+    assert migrations.schema_version(conn) == migrations.LATEST_VERSION
+    assert migrations.migrate(conn) == []
+
+
+def test_hot_queries_use_indexes(conn):
+    assert migrations.check_query_plans(conn) == {}
+
+
+def test_plan_problems_detects_scan_and_temp_btree(conn):
+    plan = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM reward_redemptions ORDER BY full_name"
+    ).fetchall()
+    problems = migrations._plan_problems(plan)
+    assert any(p.startswith("SCAN") for p in problems)
+    assert any("USE TEMP B-TREE" in p for p in problems)
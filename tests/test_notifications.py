@@ -0,0 +1,133 @@
+"""Outbox notifikasi: TwilioClient + dispatcher terhadap stub lokal (benchmarks/twilio_stub.py)."""
+import threading
+import time
+
+import pytest
+
+import notifications
+from benchmarks.twilio_stub import make_server
+from notifications import (
+    NotificationDispatcher,
+    SendError,
+    TwilioClient,
+    claim_next_message,
+    enqueue_whatsapp,
+    requeue_stale_messages,
+)
+
+
+@pytest.fixture
+def stub():
+    server = make_server()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(stub):
+    return TwilioClient(
+        "AC123", "token", "whatsapp:+14155238886",
+        api_base=f"http://127.0.0.1:{stub.server_port}",
+    )
+
+
+def message(conn, msg_id):
+    return conn.execute("SELECT * FROM notifications WHERE id = ?", (msg_id,)).fetchone()
+
+
+def test_send(stub, client):
+    sid = client.send("+6281200000000", "halo")
+
+    assert sid.startswith("SM")
+    assert stub.state.messages[0]["to"] == "whatsapp:+6281200000000"
+    assert stub.state.messages[0]["body"] == "halo"
+
+
+def test_rate_limited_send_is_retryable(stub, client):
+    stub.state.rate_limit = 1
+    client.send("+62812", "satu")
+
+    with pytest.raises(SendError) as e:
+        client.send("+62812", "dua")
+    assert (e.value.status, e.value.retry, e.value.retry_after) == (429, True, 1.0)
+
+
+def test_retry_with_backoff_then_sent(conn, stub, client):
+    dispatcher = NotificationDispatcher(rate_per_sec=0, client=client)
+    msg_id = enqueue_whatsapp(conn, "+62812", "halo")
+    conn.commit()
+
+    stub.state.fail_rate = 1.0
+    dispatcher.deliver(claim_next_message())
+    row = message(conn, msg_id)
+    assert (row["status"], row["attempts"]) == ("QUEUED", 1)
+    assert row["last_error"].startswith("HTTP 500")
+    # belum jatuh tempo: backoff minimal BACKOFF_SECONDS / 2
+    assert row["next_attempt_at"] > notifications._now()
+    assert claim_next_message() is None
+
+    stub.state.fail_rate = 0.0
+    conn.execute("UPDATE notifications SET next_attempt_at = ? WHERE id = ?", (notifications._now(), msg_id))
+    conn.commit()
+    dispatcher.deliver(claim_next_message())
+    row = message(conn, msg_id)
+    assert (row["status"], row["attempts"]) == ("SENT", 2)
+    assert row["provider_id"] == stub.state.messages[0]["sid"]
+
+
+def test_gives_up_after_max_attempts(conn, stub, client, monkeypatch):
+    monkeypatch.setattr(notifications, "MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(notifications, "BACKOFF_SECONDS", 0)
+    dispatcher = NotificationDispatcher(rate_per_sec=0, client=client)
+    msg_id = enqueue_whatsapp(conn, "+62812", "halo")
+    conn.commit()
+    stub.state.fail_rate = 1.0
+
+    for _ in range(2):
+        dispatcher.deliver(claim_next_message())
+
+    row = message(conn, msg_id)
+    assert (row["status"], row["attempts"]) == ("FAILED", 2)
+    assert claim_next_message() is None
+
+
+def test_dispatcher_threads_deliver_everything(conn, stub, client, monkeypatch):
+    monkeypatch.setattr(notifications, "BACKOFF_SECONDS", 0)
+    monkeypatch.setattr(notifications, "MAX_ATTEMPTS", 50)
+    stub.state.fail_rate = 0.3
+    for i in range(10):
+        enqueue_whatsapp(conn, f"+6281200000{i:03d}", f"pesan {i}")
+    conn.commit()
+
+    dispatcher = NotificationDispatcher(num_workers=3, rate_per_sec=0, poll_interval=0.05, client=client)
+    dispatcher.start()
+    try:
+        deadline = time.monotonic() + 20
+        while time.monotonic() < deadline:
+            sent = conn.execute(
+                "SELECT COUNT(*) FROM notifications WHERE status = 'SENT'"
+            ).fetchone()[0]
+            if sent == 10:
+                break
+            time.sleep(0.05)
+    finally:
+        dispatcher.stop(timeout=5)
+
+    assert sent == 10
+    assert sorted(m["body"] for m in stub.state.messages) == sorted(f"pesan {i}" for i in range(10))
+
+
+def test_stale_sending_requeued_until_max_attempts(conn, monkeypatch):
+    monkeypatch.setattr(notifications, "MAX_ATTEMPTS", 2)
+    msg_id = enqueue_whatsapp(conn, "+62812", "halo")
+    conn.commit()
+
+    for expected in ("QUEUED", "FAILED"):
+        assert claim_next_message()["id"] == msg_id
+        conn.execute("UPDATE notifications SET started_at = '20200101_000000' WHERE id = ?", (msg_id,))
+        conn.commit()
+        assert requeue_stale_messages() == 1
+        assert message(conn, msg_id)["status"] == expected
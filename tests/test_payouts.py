@@ -0,0 +1,177 @@
+"""Batch pembayaran redeem, file rekonsiliasi, dan update status oleh admin."""
+import csv
+import io
+
+import pytest
+
+import ledger
+from payouts import (
+    PayoutFileError,
+    apply_results,
+    create_batch,
+    iter_batch_csv,
+    parse_results,
+)
+
+
+@pytest.fixture
+def redeem(conn, make_user, make_bounty):
+    """redeem(user_id, points, wallet): redeem PENDING dari saldo bounty yang cukup."""
+    funded = set()
+
+    def redeem(user_id, points=100, wallet="DANA"):
+        if user_id not in funded:
+            make_user(user_id)
+            make_bounty(user_id, status="COMPLETED", points_reporter=10000)
+            funded.add(user_id)
+        cur = conn.execute(
+            """
+            INSERT INTO reward_redemptions
+                (user_id, wallet_type, full_name, phone, points, amount, status, requested_at)
+            VALUES (?, ?, 'N', '+62812', ?, ?, 'PENDING', '2025-01-01T00:00:00')
+            """,
+            (user_id, wallet, points, points),
+        )
+        ledger.record_redemption(conn, cur.lastrowid, user_id, points)
+        conn.commit()
+        return cur.lastrowid
+
+    return redeem
+
+
+def statuses(conn):
+    return dict(conn.execute("SELECT id, status FROM reward_redemptions").fetchall())
+
+
+def test_create_batch_takes_pending_of_one_wallet(conn, redeem):
+    dana = [redeem("alice"), redeem("bob")]
+    ovo = redeem("alice", wallet="OVO")
+
+    batch_id = create_batch(conn, "DANA", "admin")
+
+    in_batch = [r["id"] for r in conn.execute(
+        "SELECT id FROM reward_redemptions WHERE payout_batch_id = ? ORDER BY id", (batch_id,)
+    )]
+    assert in_batch == dana
+    batch = conn.execute("SELECT num_items, total_amount FROM payout_batches").fetchone()
+    assert tuple(batch) == (2, 200)
+    # sudah masuk batch: tidak diambil lagi
+    assert create_batch(conn, "DANA", "admin") is None
+    ovo_batch = create_batch(conn, "OVO", "admin")
+    assert ovo_batch is not None
+    row = conn.execute(
+        "SELECT payout_batch_id FROM reward_redemptions WHERE id = ?", (ovo,)
+    ).fetchone()
+    assert row["payout_batch_id"] == ovo_batch
+
+
+def test_batch_file_escapes_formulas(conn, redeem):
+    reward_id = redeem("alice")
+    conn.execute(
+        "UPDATE reward_redemptions SET full_name = ?, phone = ? WHERE id = ?",
+        ('=HYPERLINK("http://evil.example","klik")', "+62812", reward_id),
+    )
+    conn.commit()
+    batch_id = create_batch(conn, "DANA", "admin")
+
+    rows = list(csv.reader(io.StringIO("".join(iter_batch_csv(batch_id)))))
+
+    assert rows[1][:5] == [
+        str(reward_id), "DANA", '\'=HYPERLINK("http://evil.example","klik")', "+62812", "100",
+    ]
+
+
+def test_parse_results():
+    results, rejected = parse_results(
+        "id,status,reason\n"
+        "1,PAID,\n"
+        "2,gagal,nomor salah\n"
+        "3,,\n"
+        "abc,PAID,\n"
+        "4,DIBATALKAN,\n"
+    )
+    assert results == [(1, "PAID", None), (2, "FAILED", "nomor salah")]
+    assert [line for line, _ in rejected] == [5, 6]
+
+
+def test_parse_results_requires_columns():
+    with pytest.raises(PayoutFileError):
+        parse_results("nomor,hasil\n1,PAID\n")
+
+
+def test_apply_results_rules(conn, redeem):
+    paid, failed, was_paid, was_failed = (redeem("alice") for _ in range(4))
+    other_batch = redeem("bob", wallet="OVO")
+    batch_id = create_batch(conn, "DANA", "admin")
+    create_batch(conn, "OVO", "admin")
+    conn.execute("UPDATE reward_redemptions SET status = 'PAID' WHERE id = ?", (was_paid,))
+    conn.execute("UPDATE reward_redemptions SET status = 'FAILED' WHERE id = ?", (was_failed,))
+    ledger.record_redemption_refund(conn, was_failed, "alice", 100)
+    conn.commit()
+
+    results = [
+        (paid, "PAID", None),
+        (failed, "FAILED", "nomor salah"),
+        (was_paid, "FAILED", None),
+        (was_failed, "PAID", None),
+        (other_batch, "PAID", None),
+        (999, "PAID", None),
+    ]
+    outcome = apply_results(conn, batch_id, results)
+
+    assert (outcome["paid"], outcome["failed"], outcome["unchanged"]) == (2, 1, 0)
+    assert sorted(rid for rid, _ in outcome["rejected"]) == [was_paid, other_batch, 999]
+    assert statuses(conn) == {
+        paid: "PAID",
+        failed: "FAILED",
+        was_paid: "PAID",
+        was_failed: "PAID",
+        other_batch: "PENDING",
+    }
+    # 4 x 100 diredeem, yang FAILED dikembalikan
+    assert ledger.get_balance(conn, "alice") == 10000 - 300
+    assert ledger.find_drift(conn) == []
+    batch = conn.execute(
+        "SELECT num_paid, num_failed FROM payout_batches WHERE id = ?", (batch_id,)
+    ).fetchone()
+    assert tuple(batch) == (3, 1)
+
+    # file yang sama diterapkan lagi: tidak ada yang berubah
+    again = apply_results(conn, batch_id, results)
+    assert (again["paid"], again["failed"], again["unchanged"]) == (0, 0, 3)
+    assert len(again["rejected"]) == 3
+    assert ledger.get_balance(conn, "alice") == 10000 - 300
+    assert ledger.find_drift(conn) == []
+
+
+def test_admin_update_reward(conn, make_user, redeem, client_for, get_flashes):
+    make_user("admin", role="admin")
+    reward_id = redeem("alice")
+    admin = client_for("admin")
+
+    admin.post(f"/admin/rewards/update/{reward_id}", data={"status": "FAILED", "reason": "x"})
+    assert get_flashes(admin)[-1][0] == "success"
+    assert ledger.get_balance(conn, "alice") == 10000
+
+    admin.post(f"/admin/rewards/update/{reward_id}", data={"status": "PAID"})
+    assert get_flashes(admin)[-1][0] == "success"
+    assert ledger.get_balance(conn, "alice") == 10000 - 100
+
+    # sudah PAID: tidak ada baris yang berubah, jadi bukan pesan sukses
+    admin.post(f"/admin/rewards/update/{reward_id}", data={"status": "PAID"})
+    assert get_flashes(admin)[-1][0] == "error"
+    admin.post(f"/admin/rewards/update/{reward_id}", data={"status": "FAILED"})
+    assert get_flashes(admin)[-1][0] == "error"
+
+    assert statuses(conn) == {reward_id: "PAID"}
+    assert ledger.find_drift(conn) == []
+
+
+def test_admin_routes_require_admin(conn, make_user, redeem, client_for, get_flashes):
+    reward_id = redeem("alice")
+    client = client_for("alice")
+
+    client.post(f"/admin/rewards/update/{reward_id}", data={"status": "PAID"})
+
+    assert get_flashes(client)[-1] == ("error", "Akses ditolak.")
+    assert statuses(conn) == {reward_id: "PENDING"}
@@ -0,0 +1,34 @@
+"""Decode gambar upload dari path / bytes."""
+import os
+
+import pytest
+from PIL import Image
+
+import uploads
+
+
+def test_decode_image_closes_file(tmp_path):
+    if not os.path.isdir("/proc/self/fd"):
+        pytest.skip("butuh /proc/self/fd")
+    path = tmp_path / "a.jpg"
+    Image.new("RGB", (2000, 1500), (200, 10, 10)).save(path)
+
+    before = len(os.listdir("/proc/self/fd"))
+    for _ in range(20):
+        image = uploads.decode_image(str(path))
+    assert len(os.listdir("/proc/self/fd")) == before
+
+    # diperkecil ke INFER_MAX_SIDE, BGR (JPEG: warna kira-kira)
+    assert max(image.shape[:2]) == uploads.INFER_MAX_SIDE
+    blue, _, red = (int(v) for v in image[0, 0])
+    assert blue < 40 and red > 170
+
+
+def test_decode_image_bytes_and_path_match(tmp_path):
+    path = tmp_path / "a.png"
+    Image.new("RGB", (900, 600), (0, 128, 255)).save(path)
+
+    from_path = uploads.decode_image(str(path))
+    from_bytes = uploads.decode_image(path.read_bytes())
+
+    assert (from_path == from_bytes).all()
@@ -0,0 +1,41 @@
+"""Cache baris users per proses."""
+import user_context
+from user_context import get_user, invalidate_user
+
+
+def set_role(conn, user_id, role):
+    # seperti proses lain yang mengubah users: cache proses ini tidak tahu
+    conn.execute("UPDATE users SET role = ? WHERE user_id = ?", (role, user_id))
+    conn.commit()
+
+
+def test_invalidate_user(conn, make_user):
+    make_user("alice")
+    assert get_user("alice")["role"] is None
+
+    set_role(conn, "alice", "admin")
+    assert get_user("alice")["role"] is None
+    assert get_user("alice", cached=False)["role"] == "admin"
+
+    set_role(conn, "alice", "cleaner")
+    invalidate_user("alice")
+    assert get_user("alice")["role"] == "cleaner"
+
+
+def test_cache_expires_after_ttl(conn, make_user, monkeypatch):
+    make_user("alice")
+    get_user("alice")
+    set_role(conn, "alice", "admin")
+    assert get_user("alice")["role"] is None
+
+    later = user_context.time.monotonic() + user_context.USER_CACHE_TTL + 1
+    monkeypatch.setattr(user_context.time, "monotonic", lambda: later)
+    assert get_user("alice")["role"] == "admin"
+
+
+def test_ttl_zero_disables_cache(conn, make_user, monkeypatch):
+    make_user("alice")
+    monkeypatch.setattr(user_context, "USER_CACHE_TTL", 0)
+    get_user("alice")
+
+    assert "alice" not in user_context._users
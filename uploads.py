@@ -0,0 +1,326 @@
+"""
+Pipeline upload foto bounty.
+
+- Body request dibaca per chunk dengan batas ukuran (MAX_CONTENT_LENGTH di
+  app + UPLOAD_MAX_BYTES per file), sambil dihitung sha256-nya.
+- Header gambar divalidasi (magic bytes + header PIL, batas jumlah piksel)
+  sebelum upload diterima; ekstensi file diambil dari isi, bukan nama file.
+- Di thread background gambar didecode SEKALI (JPEG draft mode, orientasi
+  EXIF diterapkan) lalu dibuat salinan display berukuran terbatas (file yang
+  disimpan), thumbnail, dan array BGR seukuran input model. Worker deteksi
+  di proses yang sama memakai array itu langsung (take_decoded), tanpa
+  membaca ulang file dan decode kedua kalinya. Array itu hanya disimpan
+  kalau ada worker di proses ini (keep_decoded, dipanggil oleh
+  jobs.DetectionWorkerPool); worker di proses lain selalu membaca file.
+"""
+import io
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import span
+
+# batas ukuran satu file upload (byte)
+UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_MB", "15")) * 1024 * 1024
+
+# batas resolusi (mencegah decompression bomb)
+UPLOAD_MAX_PIXELS = int(os.environ.get("UPLOAD_MAX_PIXELS", str(50_000_000)))
+
+# jumlah gambar hasil decode yang disimpan di memori menunggu worker
+DECODED_CACHE_SIZE = int(os.environ.get("UPLOAD_DECODED_CACHE", "16"))
+
+# ukuran turunan gambar (sisi terpanjang, piksel; 0 = ukuran asli):
+# - INFER: input detector (model me-letterbox ke imgsz, default sama)
+# - DISPLAY: file yang disimpan di static/upload dan ditampilkan
+# - THUMB: thumbnail untuk daftar bounty (static/upload/thumb)
+INFER_MAX_SIDE = int(os.environ.get("IMAGE_INFER_MAX_SIDE", "736"))
+DISPLAY_MAX_SIDE = int(os.environ.get("IMAGE_DISPLAY_MAX_SIDE", "1600"))
+THUMB_MAX_SIDE = int(os.environ.get("IMAGE_THUMB_MAX_SIDE", "320"))
+JPEG_QUALITY = int(os.environ.get("IMAGE_JPEG_QUALITY", "85"))
+
+# IMAGE_KEEP_ORIGINAL=1: file asli juga disimpan (static/upload/original)
+KEEP_ORIGINAL = os.environ.get("IMAGE_KEEP_ORIGINAL") == "1"
+
+THUMB_DIR = "thumb"
+ORIGINAL_DIR = "original"
+
+CHUNK_SIZE = 64 * 1024
+
+_SIGNATURES = {
+    b"\xff\xd8\xff": "jpg",
+    b"\x89PNG\r\n\x1a\n": "png",
+}
+
+_writer = ThreadPoolExecutor(max_workers=2, thread_name_prefix="upload-writer")
+
+_lock = threading.Lock()
+_decoded = OrderedDict()  # sha256 -> Future(array BGR)
+_keep_decoded = False  # True kalau ada worker deteksi di proses ini
+_pending_writes = {}  # path -> Future
+
+
+class UploadRejected(Exception):
+    """Upload ditolak; pesan exception ditampilkan ke user."""
+
+
+def read_upload(file, max_bytes=None):
+    """Baca FileStorage per chunk dengan batas ukuran. Return (bytes, sha256)."""
+    max_bytes = UPLOAD_MAX_BYTES if max_bytes is None else max_bytes
+    h = hashlib.sha256()
+    buf = io.BytesIO()
+    while True:
+        chunk = file.stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        if buf.tell() + len(chunk) > max_bytes:
+            raise UploadRejected(
+                f"Ukuran file melebihi batas {max_bytes // (1024 * 1024)} MB."
+            )
+        h.update(chunk)
+        buf.write(chunk)
+    if buf.tell() == 0:
+        raise UploadRejected("File gambar kosong.")
+    return buf.getvalue(), h.hexdigest()
+
+
+def inspect_image(data):
+    """
+    Validasi header gambar tanpa decode penuh.
+    Return ekstensi sesuai isi file ('jpg' / 'png').
+    """
+    from PIL import Image
+
+    ext = next(
+        (ext for sig, ext in _SIGNATURES.items() if data.startswith(sig)), None
+    )
+    if ext is None:
+        raise UploadRejected("File bukan gambar PNG/JPG yang valid.")
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            width, height = img.size
+            fmt = img.format
+    except Exception:
+        raise UploadRejected("File gambar rusak atau tidak bisa dibaca.")
+    if fmt not in ("JPEG", "PNG"):
+        raise UploadRejected("File bukan gambar PNG/JPG yang valid.")
+    if width * height > UPLOAD_MAX_PIXELS:
+        raise UploadRejected("Resolusi gambar terlalu besar.")
+    return ext
+
+
+def receive_upload(file):
+    """read_upload + inspect_image. Return (bytes, sha256, ext)."""
+    with span("upload_read"):
+        data, sha = read_upload(file)
+    with span("upload_validate"):
+        ext = inspect_image(data)
+    return data, sha, ext
+
+
+# tag EXIF Orientation -> transpose PIL yang mengembalikannya ke posisi tegak
+_EXIF_ORIENTATION = 0x0112
+_ORIENTATION_TRANSPOSE = {
+    2: "FLIP_LEFT_RIGHT",
+    3: "ROTATE_180",
+    4: "FLIP_TOP_BOTTOM",
+    5: "TRANSPOSE",
+    6: "ROTATE_270",
+    7: "TRANSVERSE",
+    8: "ROTATE_90",
+}
+
+
+def _open_reduced(source, max_side):
+    """
+    Buka gambar (bytes atau path) dengan decode JPEG skala kecil (draft mode,
+    kelipatan 1/2..1/8) yang masih >= max_side. Return (PIL RGB, orientasi EXIF).
+    """
+    from PIL import Image
+
+    # with: file (kalau source path) ditutup; convert() mengembalikan salinan
+    with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as img:
+        orientation = img.getexif().get(_EXIF_ORIENTATION, 1)
+        width, height = img.size
+        if max_side and max(width, height) > max_side:
+            # draft() memilih skala terkecil yang kedua sisinya masih >= ukuran
+            # yang diminta, jadi minta ukuran dengan rasio gambar itu sendiri
+            scale = max_side / max(width, height)
+            img.draft("RGB", (max(1, int(width * scale)), max(1, int(height * scale))))
+        return img.convert("RGB"), orientation
+
+
+def _shrink(img, max_side):
+    """img dengan sisi terpanjang <= max_side (0 = tidak diubah)."""
+    from PIL import Image
+
+    width, height = img.size
+    if not max_side or max(width, height) <= max_side:
+        return img
+    scale = max_side / max(width, height)
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return img.resize(size, Image.BILINEAR, reducing_gap=2.0)
+
+
+def _upright(img, orientation):
+    from PIL import Image
+
+    if orientation in _ORIENTATION_TRANSPOSE:
+        img = img.transpose(getattr(Image.Transpose, _ORIENTATION_TRANSPOSE[orientation]))
+    return img
+
+
+def preprocess(data):
+    """
+    Decode upload SEKALI lalu buat tiga turunan:
+    (gambar display PIL, thumbnail PIL, array BGR untuk inference).
+    Orientasi EXIF diterapkan setelah diperkecil (lebih murah).
+    """
+    import numpy as np
+
+    with span("decode"):
+        sides = (DISPLAY_MAX_SIDE, INFER_MAX_SIDE)
+        img, orientation = _open_reduced(data, max(sides) if all(sides) else 0)
+        display = _upright(_shrink(img, DISPLAY_MAX_SIDE), orientation)
+        thumb = _shrink(display, THUMB_MAX_SIDE)
+        infer = _shrink(display, INFER_MAX_SIDE)
+        # BGR, konvensi ultralytics/cv2 (lihat detectors._read_image)
+        return display, thumb, np.asarray(infer)[..., ::-1]
+
+
+def decode_image(source):
+    """
+    bytes / path -> array BGR siap inference (sudah diperkecil + orientasi
+    EXIF). Hanya didecode seukuran INFER_MAX_SIDE, tanpa salinan display.
+    """
+    import numpy as np
+
+    with span("decode"):
+        img, orientation = _open_reduced(source, INFER_MAX_SIDE)
+        img = _upright(_shrink(img, INFER_MAX_SIDE), orientation)
+        return np.asarray(img)[..., ::-1]
+
+
+def thumb_path(path):
+    """static/upload/x.jpg -> static/upload/thumb/x.jpg"""
+    folder, name = os.path.split(path)
+    return os.path.join(folder, THUMB_DIR, name)
+
+
+# ---------- Penulisan + decode di background ----------
+
+
+def _save_image(img, path, ext):
+    tmp = path + ".part"
+    with span("pil_save"):
+        if ext == "png":
+            img.save(tmp, "PNG", optimize=True)
+        else:
+            img.save(tmp, "JPEG", quality=JPEG_QUALITY, optimize=True)
+    os.replace(tmp, path)
+
+
+def _write_file(path, data):
+    tmp = path + ".part"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _store(path, data):
+    display, thumb, infer = preprocess(data)
+    folder, name = os.path.split(path)
+    ext = name.rsplit(".", 1)[-1].lower()
+
+    if KEEP_ORIGINAL:
+        os.makedirs(os.path.join(folder, ORIGINAL_DIR), exist_ok=True)
+        _write_file(os.path.join(folder, ORIGINAL_DIR, name), data)
+    os.makedirs(os.path.join(folder, THUMB_DIR), exist_ok=True)
+    _save_image(thumb, thumb_path(path), ext)
+    # file utama (yang dipakai halaman & fallback worker) ditulis terakhir
+    _save_image(display, path, ext)
+    return infer
+
+
+def store_async(path, data, sha):
+    """
+    Di thread background: decode + simpan salinan display (di `path`),
+    thumbnail, dan opsional file asli; array inference disimpan untuk
+    take_decoded(sha). Return Future.
+    """
+    fut = _writer.submit(_store, path, data)
+    with _lock:
+        _pending_writes[path] = fut
+        if _keep_decoded:
+            _remember_decoded(sha, fut)
+    fut.add_done_callback(lambda _: _forget_write(path, fut))
+    return fut
+
+
+def _forget_write(path, fut):
+    with _lock:
+        if _pending_writes.get(path) is fut:
+            del _pending_writes[path]
+
+
+def write_pending(path):
+    """True kalau store_async masih menulis file ini."""
+    with _lock:
+        return path in _pending_writes
+
+
+def wait_written(path, timeout=30):
+    """Tunggu file yang sedang ditulis store_async (kalau ada) selesai."""
+    with _lock:
+        fut = _pending_writes.get(path)
+    if fut is not None:
+        try:
+            fut.result(timeout)
+        except Exception as e:
+            print("[WARN] Gagal menyimpan gambar upload:", e)
+
+
+def keep_decoded(enabled=True):
+    """Simpan hasil decode upload untuk take_decoded (ada worker di proses ini)."""
+    global _keep_decoded
+    _keep_decoded = enabled
+
+
+def _remember_decoded(sha, fut):
+    _decoded[sha] = fut
+    _decoded.move_to_end(sha)
+    while len(_decoded) > DECODED_CACHE_SIZE:
+        _decoded.popitem(last=False)
+
+
+def decode_async(sha, data):
+    """
+    Decode gambar di background untuk take_decoded (kalau store_async
+    belum melakukannya, misalnya upload duplikat yang tidak ditulis ulang).
+    Tidak melakukan apa-apa (return None) kalau tidak ada worker di proses ini.
+    """
+    if not _keep_decoded:
+        return None
+    with _lock:
+        if sha in _decoded:
+            return _decoded[sha]
+        fut = _writer.submit(decode_image, data)
+        _remember_decoded(sha, fut)
+    return fut
+
+
+def take_decoded(sha, timeout=30):
+    """
+    Ambil (dan hapus) array hasil decode untuk sha ini.
+    Return None kalau tidak ada (misalnya worker di proses lain).
+    """
+    with _lock:
+        fut = _decoded.pop(sha, None)
+    if fut is None:
+        return None
+    try:
+        return fut.result(timeout)
+    except Exception as e:
+        print("[WARN] Decode gambar upload gagal:", e)
+        return None
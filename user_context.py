@@ -0,0 +1,146 @@
+"""
+User yang sedang login, dimuat paling banyak sekali per request.
+
+- current_user(), current_balance(), current_redemptions(): hasilnya
+  disimpan di flask.g, semuanya memakai satu koneksi per request
+  (request_connection, dikembalikan ke pool di teardown).
+- Baris users di-cache per proses selama USER_CACHE_TTL_SECONDS (default 5)
+  supaya request biasa tidak perlu query users sama sekali. Setiap penulisan
+  ke tabel users wajib memanggil invalidate_user(user_id).
+- invalidate_user hanya membersihkan cache proses yang memanggilnya. Dengan
+  beberapa proses (misalnya worker gunicorn), perubahan baris users seperti
+  role atau nama baru terlihat di proses lain setelah TTL habis, karena itu
+  TTL default dibuat pendek. USER_CACHE_TTL_SECONDS=0 mematikan cache.
+  Login selalu membaca database (get_user(cached=False)).
+- Saldo dan riwayat redeem tidak di-cache antar request (bisa berubah dari
+  worker deteksi / admin kapan saja).
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+
+from flask import g, session
+
+from db import get_db_connection
+from ledger import get_balance
+
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL_SECONDS", "5"))
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", "10000"))
+
+# jumlah riwayat redeem yang ditampilkan di / dan /rewards
+RECENT_REDEMPTIONS = 10
+
+RECENT_REDEMPTIONS_SQL = """
+    SELECT id, wallet_type, full_name, phone, points, amount, status,
+           requested_at
+    FROM reward_redemptions
+    WHERE user_id = ?
+    ORDER BY requested_ts DESC
+    LIMIT ?
+"""
+
+_lock = threading.Lock()
+_users = OrderedDict()  # user_id -> (kedaluwarsa, baris users)
+
+
+def _cached(user_id):
+    with _lock:
+        entry = _users.get(user_id)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del _users[user_id]
+            return None
+        _users.move_to_end(user_id)
+        return entry[1]
+
+
+def _remember(user_id, row):
+    with _lock:
+        _users[user_id] = (time.monotonic() + USER_CACHE_TTL, row)
+        _users.move_to_end(user_id)
+        while len(_users) > USER_CACHE_SIZE:
+            _users.popitem(last=False)
+
+
+def invalidate_user(user_id):
+    """Buang baris user dari cache (panggil setelah UPDATE / INSERT users)."""
+    with _lock:
+        _users.pop(user_id, None)
+
+
+def get_user(user_id, conn=None, cached=True):
+    """
+    Baris users (atau None). cached=False selalu membaca database, misalnya
+    untuk cek password saat login.
+    """
+    if cached:
+        row = _cached(user_id)
+        if row is not None:
+            return row
+
+    own = conn is None
+    if own:
+        conn = get_db_connection()
+    row = conn.execute("SELECT * FROM users WHERE user_id = ?", (user_id,)).fetchone()
+    if own:
+        conn.close()
+    # user yang tidak ada tidak di-cache (bisa saja baru mendaftar)
+    if row is not None and USER_CACHE_TTL > 0:
+        _remember(user_id, row)
+    return row
+
+
+# ---------- Konteks per request ----------
+
+
+def request_connection():
+    """Satu koneksi pool per request, dikembalikan saat teardown."""
+    if "user_conn" not in g:
+        g.user_conn = get_db_connection()
+    return g.user_conn
+
+
+def current_user():
+    if "user" not in g:
+        uid = session.get("user_id")
+        user = None
+        if uid:
+            # koneksi request baru diambil kalau user tidak ada di cache
+            user = _cached(uid) or get_user(uid, conn=request_connection(), cached=False)
+        g.user = user
+    return g.user
+
+
+def current_balance():
+    """Saldo poin user yang login yang masih bisa diredeem (0 kalau belum login)."""
+    if "balance" not in g:
+        user = current_user()
+        g.balance = 0
+        if user:
+            g.balance = max(0, get_balance(request_connection(), user["user_id"]))
+    return g.balance
+
+
+def current_redemptions():
+    """RECENT_REDEMPTIONS permintaan redeem terakhir user yang login."""
+    if "redemptions" not in g:
+        user = current_user()
+        rows = []
+        if user:
+            rows = request_connection().execute(
+                RECENT_REDEMPTIONS_SQL, (user["user_id"], RECENT_REDEMPTIONS)
+            ).fetchall()
+        g.redemptions = rows
+    return g.redemptions
+
+
+def _release_connection(exc):
+    conn = g.pop("user_conn", None)
+    if conn is not None:
+        conn.close()
+
+
+def init_user_context(app):
+    app.teardown_appcontext(_release_connection)
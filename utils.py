@@ -1,6 +1,6 @@
 import math
-from flask import session
 from db import get_db_connection
+from ledger import get_balance
 
 
 def allowed_file(filename: str) -> bool:
@@ -11,21 +11,56 @@ def allowed_file(filename: str) -> bool:
     }
 
 
+# poin per label sampah (label lain DEFAULT_LABEL_POINTS)
+LABEL_POINTS = {
+    "PET_Bottles": 3,
+    "Aluminium_Cans": 3,
+    "HDPE_Milk_Bottles": 2,
+}
+DEFAULT_LABEL_POINTS = 1
+
+
 def calculate_base_points(detections):
     """
     Hitung poin dasar dari list detections.
     """
-    score_map = {
-        "PET_Bottles": 3,
-        "Aluminium_Cans": 3,
-        "HDPE_Milk_Bottles": 2,
-    }
     total = 0
     for det in detections:
-        total += score_map.get(det["label"], 1)
+        total += LABEL_POINTS.get(det["label"], DEFAULT_LABEL_POINTS)
     return total
 
 
+def parse_detections(result):
+    """
+    Ubah satu hasil YOLO menjadi list {label, class_id, confidence, box}.
+    confidence dalam %, box = [x1, y1, x2, y2] ternormalisasi 0..1 terhadap
+    ukuran gambar (dipakai untuk render gambar annotated, lihat annotate.py).
+    """
+    detections = []
+    if result.boxes is not None and len(result.boxes) > 0:
+        classes = result.boxes.cls.tolist()
+        scores = result.boxes.conf.tolist()
+        boxes = result.boxes.xyxy.tolist()
+        h, w = result.orig_shape[:2]
+        for cls_id, conf, (x1, y1, x2, y2) in zip(classes, scores, boxes):
+            cls_id = int(cls_id)
+            label = result.names.get(cls_id, str(cls_id))
+            detections.append(
+                {
+                    "label": label,
+                    "class_id": cls_id,
+                    "confidence": round(float(conf) * 100, 2),
+                    "box": [
+                        round(x1 / w, 4),
+                        round(y1 / h, 4),
+                        round(x2 / w, 4),
+                        round(y2 / h, 4),
+                    ],
+                }
+            )
+    return detections
+
+
 def haversine_m(lat1, lon1, lat2, lon2):
     """
     Hitung jarak (meter) antara dua titik lat/lon.
@@ -43,66 +78,54 @@ def haversine_m(lat1, lon1, lat2, lon2):
     return R * c
 
 
-def get_total_points_for_user(user_id: str | None):
+def haversine_many(lat, lon, lats, lons):
     """
-    Total poin yang MASIH BISA diredeem.
-    Hitung semua poin dari bounty COMPLETED milik user,
-    lalu dikurangi total poin yang sudah diredeem.
+    Versi vektor (NumPy) dari haversine_m: jarak (meter) dari titik
+    (lat, lon) ke banyak titik sekaligus. lat/lon boleh skalar atau array
+    yang bisa di-broadcast dengan lats/lons. Return numpy array.
     """
-    if not user_id:
-        return 0
+    import numpy as np
 
-    conn = get_db_connection()
+    R = 6371000.0
+    phi1 = np.radians(np.asarray(lat, dtype=np.float64))
+    phi2 = np.radians(np.asarray(lats, dtype=np.float64))
+    dphi = phi2 - phi1
+    dlambda = np.radians(
+        np.asarray(lons, dtype=np.float64) - np.asarray(lon, dtype=np.float64)
+    )
 
-    # total poin yang pernah didapat
-    earned_row = conn.execute(
-        """
-        SELECT
-            COALESCE(SUM(
-                CASE WHEN reporter_id = ? THEN points_reporter ELSE 0 END
-            ), 0)
-            +
-            COALESCE(SUM(
-                CASE WHEN cleaner_id = ? THEN points_cleaner ELSE 0 END
-            ), 0) AS total_points
-        FROM bounties
-        WHERE status = 'COMPLETED'
-        """,
-        (user_id, user_id),
-    ).fetchone()
-
-    # total poin yang sudah diredeem (pending & selesai sama-sama
-    # mengurangi saldo agar tidak bisa dobel redeem)
-    redeemed_row = conn.execute(
-        """
-        SELECT COALESCE(SUM(points), 0) AS redeemed_points
-        FROM reward_redemptions
-        WHERE user_id = ?
-          AND status IN ('PENDING', 'APPROVED', 'PAID')
-        """,
-        (user_id,),
-    ).fetchone()
+    a = np.sin(dphi / 2.0) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(
+        dlambda / 2.0
+    ) ** 2
+    return R * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
 
-    conn.close()
 
-    earned = earned_row["total_points"] if earned_row else 0
-    redeemed = redeemed_row["redeemed_points"] if redeemed_row else 0
-    return max(0, earned - redeemed)
+def within_radius(lat, lon, lats, lons, radius_m):
+    """
+    Hitung jarak sekaligus filter radius.
+    Return (distances, mask, order): order = index titik di dalam radius,
+    urut dari yang terdekat.
+    """
+    import numpy as np
+
+    distances = haversine_many(lat, lon, lats, lons)
+    mask = distances <= radius_m
+    inside = np.flatnonzero(mask)
+    order = inside[np.argsort(distances[inside], kind="stable")]
+    return distances, mask, order
 
 
+def get_total_points_for_user(user_id: str | None):
+    """
+    Total poin yang MASIH BISA diredeem.
+    Dibaca dari saldo ledger (user_balances), yang diperbarui di transaksi
+    yang sama dengan bounty COMPLETED, redeem, dan refund redeem FAILED.
+    """
+    if not user_id:
+        return 0
 
-def get_user(user_id: str):
     conn = get_db_connection()
-    row = conn.execute(
-        "SELECT * FROM users WHERE user_id = ?",
-        (user_id,),
-    ).fetchone()
+    balance = get_balance(conn, user_id)
     conn.close()
-    return row
-
 
-def current_user():
-    uid = session.get("user_id")
-    if not uid:
-        return None
-    return get_user(uid)
+    return max(0, balance)